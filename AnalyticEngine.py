@@ -0,0 +1,140 @@
+import numpy as np
+from scipy.linalg import expm
+
+from InputData import HealthStates
+
+
+def get_generator(rate_matrix):
+    """
+    :param rate_matrix: transition rate matrix (the diagonal elements are ignored)
+    :return: (array) generator of the continuous-time Markov chain (rows sum to 0)
+    """
+
+    generator = np.array(rate_matrix, dtype=float)
+    np.fill_diagonal(generator, 0)
+    np.fill_diagonal(generator, -generator.sum(axis=1))
+    return generator
+
+
+def get_state_occupancy(generator, initial_state_index, sim_length, discount_rate):
+    """ calculates the distribution of states at the end of the simulation and the expected (discounted)
+    time spent in each state over the simulation length
+    :param generator: generator of the continuous-time Markov chain
+    :param initial_state_index: index of the initial state
+    :param sim_length: simulation length
+    :param discount_rate: discount rate (continuously compounded)
+    :return: (probs, occupancy) where probs[i] is the probability of being in state i at the end of
+             the simulation and occupancy[i] is the integral of exp(-discount_rate*t)*P(state i at t)
+             over [0, sim_length]
+    """
+
+    n = len(generator)
+
+    # the top right block of expm([[A, I], [0, 0]]*T) is the integral of expm(A*t) over [0, T]
+    block = np.zeros((2 * n, 2 * n))
+    block[:n, :n] = generator - discount_rate * np.identity(n)
+    block[:n, n:] = np.identity(n)
+    exp_block = expm(block * sim_length)
+
+    # the top left block is expm((Q - rI)*T), so undo the discounting to get the state probabilities
+    probs = exp_block[initial_state_index, :n] * np.exp(discount_rate * sim_length)
+    occupancy = exp_block[initial_state_index, n:]
+
+    return probs, occupancy
+
+
+def get_expected_outcomes(parameters, sim_length):
+    """ calculates the expected outcomes of a patient over the simulation length
+    :param parameters: an instance of the parameters class
+    :param sim_length: simulation length
+    :return: a dictionary with keys 'survival probability', 'mean survival time' (among patients who die
+             during the simulation), 'life years', 'number of COVID', 'cost' and 'utility'
+    """
+
+    generator = get_generator(parameters.transRateMatrix)
+    rates = generator - np.diag(np.diag(generator))     # rate matrix with zero diagonal
+    if_absorbing = np.diag(generator) == 0
+    initial_state_index = parameters.initialHealthState.value
+
+    # state probabilities at the end of the simulation and expected time in each state (undiscounted)
+    probs, occupancy = get_state_occupancy(generator=generator,
+                                           initial_state_index=initial_state_index,
+                                           sim_length=sim_length,
+                                           discount_rate=0)
+    # expected discounted time in each state
+    if parameters.discountRate == 0:
+        discounted_occupancy = occupancy
+    else:
+        discounted_occupancy = get_state_occupancy(generator=generator,
+                                                   initial_state_index=initial_state_index,
+                                                   sim_length=sim_length,
+                                                   discount_rate=parameters.discountRate)[1]
+
+    # costs and utilities do not accrue after the patient reaches an absorbing state
+    annual_costs = np.array(parameters.annualStateCosts, dtype=float) + parameters.annualTreatmentCost
+    annual_costs[if_absorbing] = 0
+    annual_utilities = np.array(parameters.annualStateUtilities, dtype=float)
+    annual_utilities[if_absorbing] = 0
+
+    # probability of being alive at the end of the simulation and expected life years
+    prob_survival = probs[~if_absorbing].sum()
+    life_years = occupancy[~if_absorbing].sum()
+
+    # E[T | T <= sim_length] = (integral of S(t) - sim_length*S(sim_length)) / (1 - S(sim_length))
+    if prob_survival < 1:
+        mean_survival_time = (life_years - sim_length * prob_survival) / (1 - prob_survival)
+    else:
+        mean_survival_time = np.nan
+
+    # expected number of transitions into the COVID states
+    covid_rates = rates[:, HealthStates.COVID.value] + rates[:, HealthStates.COVID_DEATH.value]
+
+    return {'survival probability': prob_survival,
+            'mean survival time': mean_survival_time,
+            'life years': life_years,
+            'number of COVID': occupancy @ covid_rates,
+            'cost': discounted_occupancy @ annual_costs,
+            'utility': discounted_occupancy @ annual_utilities}
+
+
+def get_expected_controls(parameters, sim_length):
+    """ calculates the expected control variates of a patient simulated by VectorizedEngine.simulate_cohort
+    :param parameters: an instance of the parameters class
+    :param sim_length: simulation length
+    :return: (array) expected discounted number of COVID episodes and expected discounted life years
+    """
+
+    generator = get_generator(parameters.transRateMatrix)
+    rates = generator - np.diag(np.diag(generator))     # rate matrix with zero diagonal
+    if_absorbing = np.diag(generator) == 0
+
+    discounted_occupancy = get_state_occupancy(generator=generator,
+                                               initial_state_index=parameters.initialHealthState.value,
+                                               sim_length=sim_length,
+                                               discount_rate=parameters.discountRate)[1]
+
+    # (the discounted number of transitions into the COVID states is the integral of the discounted rate of these
+    # transitions)
+    covid_rates = rates[:, HealthStates.COVID.value] + rates[:, HealthStates.COVID_DEATH.value]
+
+    return np.array([discounted_occupancy @ covid_rates, discounted_occupancy[~if_absorbing].sum()])
+
+
+def get_expected_survival_curve(parameters, time_grid):
+    """ calculates the probability of being alive over the simulation length
+    :param parameters: an instance of the parameters class
+    :param time_grid: (array) equally spaced time points starting at 0
+    :return: (array) probability of being alive at the time points
+    """
+
+    generator = get_generator(parameters.transRateMatrix)
+    if_absorbing = np.diag(generator) == 0
+
+    # propagate the state distribution one step at a time
+    step_matrix = expm(generator * (time_grid[1] - time_grid[0]))
+    dists = np.zeros((len(time_grid), len(generator)))
+    dists[0, parameters.initialHealthState.value] = 1
+    for k in range(len(time_grid) - 1):
+        dists[k + 1] = dists[k] @ step_matrix
+
+    return dists[:, ~if_absorbing].sum(axis=1)
@@ -0,0 +1,103 @@
+import json
+import pickle
+import sqlite3
+
+# maximum number of ids in one query (SQLite limits the number of variables of a statement)
+MAX_QUERY_IDS = 900
+
+
+class CheckpointStore:
+    """ on-disk (SQLite) store of the summaries of simulated cohorts so that an interrupted
+    multi-cohort simulation can be resumed without simulating the completed cohorts again """
+
+    def __init__(self, file_name, run_settings):
+        """
+        :param file_name: name of the SQLite file (created if it does not exist)
+        :param run_settings: (dictionary) settings of the run (e.g. therapy, population size and
+                             simulation length); a file can only be resumed with the same settings
+        """
+
+        self.fileName = file_name
+        self._connection = sqlite3.connect(file_name)
+
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS cohorts ('
+                'id INTEGER PRIMARY KEY, '
+                'parameters TEXT, '
+                'mean_survival_time REAL, '
+                'mean_num_of_covid REAL, '
+                'mean_cost REAL, '
+                'mean_utility REAL, '
+                'summary BLOB)')
+
+        self._check_settings(run_settings=run_settings)
+
+    def _check_settings(self, run_settings):
+        """ stores the settings of the run or, if the file already has settings, checks that they match
+        :param run_settings: (dictionary) settings of the run
+        """
+
+        settings = {name: json.dumps(value, default=str) for name, value in run_settings.items()}
+        stored = dict(self._connection.execute('SELECT name, value FROM settings').fetchall())
+
+        if len(stored) == 0:
+            with self._connection:
+                self._connection.executemany('INSERT INTO settings VALUES (?, ?)', settings.items())
+        elif stored != settings:
+            self.close()
+            raise ValueError('Checkpoint file {} was created by a run with different settings '
+                             '({} instead of {}).'.format(self.fileName, stored, settings))
+
+    def get_completed_ids(self):
+        """
+        :return: (set) ids of the cohorts already stored
+        """
+        return {row[0] for row in self._connection.execute('SELECT id FROM cohorts')}
+
+    def save(self, cohort_summary, parameters):
+        """ stores the summary of a simulated cohort (committed immediately)
+        :param cohort_summary: (CohortSummary) summary of a simulated cohort
+        :param parameters: parameters the cohort was simulated with
+        """
+
+        param_values = {
+            'transRateMatrix': [list(map(float, row)) for row in parameters.transRateMatrix],
+            'annualStateCosts': list(map(float, parameters.annualStateCosts)),
+            'annualStateUtilities': list(map(float, parameters.annualStateUtilities)),
+            'annualTreatmentCost': float(parameters.annualTreatmentCost),
+            'discountRate': float(parameters.discountRate)}
+
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO cohorts VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (int(cohort_summary.id),
+                 json.dumps(param_values),
+                 float(cohort_summary.meanSurvivalTime),
+                 float(cohort_summary.meanNumOfCOVID),
+                 float(cohort_summary.meanCost),
+                 float(cohort_summary.meanUtility),
+                 pickle.dumps(cohort_summary)))
+
+    def load_summaries(self, ids):
+        """
+        :param ids: (list) ids of cohorts
+        :return: (list) summaries of these cohorts (in the order of ids)
+        """
+
+        ids = [int(cohort_id) for cohort_id in ids]
+
+        # only the summaries of these cohorts are read (in chunks of ids)
+        summaries = {}
+        for start in range(0, len(ids), MAX_QUERY_IDS):
+            chunk = ids[start:start + MAX_QUERY_IDS]
+            query = 'SELECT id, summary FROM cohorts WHERE id IN ({})'.format(', '.join('?' * len(chunk)))
+            for cohort_id, summary in self._connection.execute(query, chunk):
+                summaries[cohort_id] = pickle.loads(summary)
+
+        return [summaries[cohort_id] for cohort_id in ids]
+
+    def close(self):
+        self._connection.close()
@@ -2,24 +2,22 @@
 import InputData as D
 import ParameterClasses as P
 import MarkovModelClasses as Cls
+import ResultCacheClasses as Cache
 import Support as Support
 
+# outcomes of cohorts simulated by earlier runs
+cache = Cache.ResultCache(directory=D.RESULT_CACHE_DIR)
 
-# simulating mono therapy
-# create a cohort
-cohort_mono = Cls.Cohort(id=0,
-                         pop_size=D.POP_SIZE,
-                         parameters=P.Parameters(therapy=P.Therapies.WITHOUT))
-# simulate the cohort
-cohort_mono.simulate(sim_length=D.SIMULATION_LENGTH)
-
-# simulating combination therapy
-# create a cohort
-cohort_combo = Cls.Cohort(id=1,
-                          pop_size=D.POP_SIZE,
-                          parameters=P.Parameters(therapy=P.Therapies.WITH))
-# simulate the cohort
-cohort_combo.simulate(sim_length=D.SIMULATION_LENGTH)
+# simulating the same patients without and with vaccine (common random numbers)
+# create a paired cohort
+paired_cohort = Cls.PairedCohort(id=0,
+                                 pop_size=D.POP_SIZE,
+                                 parameters_ref=P.Parameters(therapy=P.Therapies.WITHOUT),
+                                 parameters=P.Parameters(therapy=P.Therapies.WITH))
+# simulate both arms
+paired_cohort.simulate(sim_length=D.SIMULATION_LENGTH, cache=cache)
+cohort_mono = paired_cohort.cohortRef
+cohort_combo = paired_cohort.cohort
 
 # print the estimates for the mean survival time and mean time to AIDS
 Support.print_outcomes(sim_outcomes=cohort_mono.cohortOutcomes,
@@ -33,8 +31,9 @@ Support.plot_survival_curves_and_histograms(sim_outcomes_without=cohort_mono.coh
 Support.print_comparative_outcomes(sim_outcomes_without=cohort_mono.cohortOutcomes,
                                    sim_outcomes_with=cohort_combo.cohortOutcomes)
 
-# report the CEA results
+# report the CEA results (the arms are paired)
 Support.report_CEA_CBA(sim_outcomes_without=cohort_mono.cohortOutcomes,
-                       sim_outcomes_with=cohort_combo.cohortOutcomes)
+                       sim_outcomes_with=cohort_combo.cohortOutcomes,
+                       if_paired=True)
 
 print('At level of willingness-to-pay = $225.94, we will recommend taking the vaccine.')
\ No newline at end of file
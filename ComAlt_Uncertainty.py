@@ -5,40 +5,41 @@ import ProbilisticParamClasses as P
 
 N_COHORTS = 200  # number of cohorts
 POP_SIZE = 300 # population size of each cohort
-
-# create a multi-cohort to simulate under mono therapy
-multiCohortWITHOUT = Cls.MultiCohort(
-    ids=range(N_COHORTS),
-    pop_size=POP_SIZE,
-    therapy=P.Therapies.WITHOUT
-)
-
-multiCohortWITHOUT.simulate(sim_length=D.SIMULATION_LENGTH)
-
-# create a multi-cohort to simulate under combo therapy
-multiCohortWITH = Cls.MultiCohort(
-    ids=range(N_COHORTS, 2*N_COHORTS),
-    pop_size=POP_SIZE,
-    therapy=P.Therapies.WITH
-)
-
-multiCohortWITH.simulate(sim_length=D.SIMULATION_LENGTH)
-
-# print the estimates for the mean survival time and mean time to AIDS
-Support.print_outcomes(multi_cohort_outcomes=multiCohortWITHOUT.multiCohortOutcomes,
-                       therapy_name=P.Therapies.WITHOUT)
-Support.print_outcomes(multi_cohort_outcomes=multiCohortWITH.multiCohortOutcomes,
-                       therapy_name=P.Therapies.WITH)
-
-# draw survival curves and histograms
-Support.plot_survival_curves_and_histograms(multi_cohort_outcomes_without=multiCohortWITHOUT.multiCohortOutcomes,
-                                            multi_cohort_outcomes_with=multiCohortWITH.multiCohortOutcomes)
-
-# print comparative outcomes
-Support.print_comparative_outcomes(multi_cohort_outcomes_without=multiCohortWITHOUT.multiCohortOutcomes,
-                                   multi_cohort_outcomes_with=multiCohortWITH.multiCohortOutcomes)
-
-# report the CEA results
-Support.report_CEA_CBA(multi_cohort_outcomes_without=multiCohortWITHOUT.multiCohortOutcomes,
-                       multi_cohort_outcomes_with=multiCohortWITH.multiCohortOutcomes)
-
+N_WORKERS = 4  # number of processes to simulate the cohorts with
+
+# the processes that simulate cohorts import this script, so the simulation only runs in the main process
+if __name__ == '__main__':
+
+    # create multi-cohorts to simulate under mono and combo therapy (cohorts with the same id in both arms
+    # use common random numbers)
+    pairedMultiCohort = Cls.PairedMultiCohort(
+        ids=range(N_COHORTS),
+        pop_size=POP_SIZE,
+        therapy_ref=P.Therapies.WITHOUT,
+        therapy=P.Therapies.WITH
+    )
+
+    pairedMultiCohort.simulate(sim_length=D.SIMULATION_LENGTH, n_workers=N_WORKERS)
+    multiCohortWITHOUT = pairedMultiCohort.multiCohortRef
+    multiCohortWITH = pairedMultiCohort.multiCohort
+
+    # print the estimates for the mean survival time and mean time to AIDS
+    Support.print_outcomes(multi_cohort_outcomes=multiCohortWITHOUT.multiCohortOutcomes,
+                           therapy_name=P.Therapies.WITHOUT)
+    Support.print_outcomes(multi_cohort_outcomes=multiCohortWITH.multiCohortOutcomes,
+                           therapy_name=P.Therapies.WITH)
+
+    # draw survival curves and histograms
+    Support.plot_survival_curves_and_histograms(multi_cohort_outcomes_without=multiCohortWITHOUT.multiCohortOutcomes,
+                                                multi_cohort_outcomes_with=multiCohortWITH.multiCohortOutcomes)
+
+    # print comparative outcomes
+    Support.print_comparative_outcomes(multi_cohort_outcomes_without=multiCohortWITHOUT.multiCohortOutcomes,
+                                       multi_cohort_outcomes_with=multiCohortWITH.multiCohortOutcomes)
+
+    # report the CEA results
+    Support.report_CEA_CBA(multi_cohort_outcomes_without=multiCohortWITHOUT.multiCohortOutcomes,
+                           multi_cohort_outcomes_with=multiCohortWITH.multiCohortOutcomes)
+
+    # report the expected value of (partial) perfect information
+    Support.report_VOI(multi_cohort_without=multiCohortWITHOUT, multi_cohort_with=multiCohortWITH)
@@ -0,0 +1,169 @@
+import numpy as np
+from scipy import stats
+
+import InputData as D
+
+
+def get_outcome_arrays(list_of_multi_cohort_outcomes):
+    """
+    :param list_of_multi_cohort_outcomes: (list) outcomes of multi-cohorts simulated under each strategy
+                                          (cohort i of each multi-cohort uses parameter draw i)
+    :return: (costs, qalys) arrays of size (number of cohorts x number of strategies)
+    """
+    costs = np.column_stack([outcomes.meanCosts for outcomes in list_of_multi_cohort_outcomes])
+    qalys = np.column_stack([outcomes.meanQALYs for outcomes in list_of_multi_cohort_outcomes])
+    return costs, qalys
+
+
+def get_nmb_tensor(costs, qalys, wtps):
+    """
+    :param costs: (array) costs of each cohort (or parameter draw) under each strategy (cohorts x strategies)
+    :param qalys: (array) QALYs of each cohort (or parameter draw) under each strategy (cohorts x strategies)
+    :param wtps: (array) willingness-to-pay values
+    :return: (array) net monetary benefits (cohorts x strategies x WTP values)
+    """
+    wtps = np.asarray(wtps, dtype=float)
+    return np.asarray(qalys, dtype=float)[:, :, np.newaxis] * wtps - np.asarray(costs, dtype=float)[:, :, np.newaxis]
+
+
+def get_incremental_nmb_intervals(nmbs, ref_index=0, interval_type='p', alpha=D.ALPHA):
+    """ calculates the mean and interval of the incremental net monetary benefit of each strategy
+    with respect to the reference strategy (the cohorts of all strategies are paired)
+    :param nmbs: (array) net monetary benefits (cohorts x strategies x WTP values)
+    :param ref_index: index of the reference strategy
+    :param interval_type: 'p' for percentile (projection) intervals and 'c' for t-based confidence intervals
+    :param alpha: significance level
+    :return: (mean, lower, upper) arrays of size (strategies x WTP values)
+    """
+
+    incremental_nmbs = nmbs - nmbs[:, [ref_index], :]
+    mean = incremental_nmbs.mean(axis=0)
+
+    if interval_type == 'p':
+        lower, upper = np.percentile(incremental_nmbs, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+    elif interval_type == 'c':
+        n = len(incremental_nmbs)
+        half_width = stats.t.ppf(1 - alpha / 2, n - 1) * incremental_nmbs.std(axis=0, ddof=1) / np.sqrt(n)
+        lower, upper = mean - half_width, mean + half_width
+    else:
+        raise ValueError("Invalid interval type '{}' (use 'p' or 'c').".format(interval_type))
+
+    return mean, lower, upper
+
+
+def get_ceac(nmbs):
+    """ calculates the cost-effectiveness acceptability curves
+    :param nmbs: (array) net monetary benefits (cohorts x strategies x WTP values)
+    :return: (array) probability that each strategy has the highest net monetary benefit (strategies x WTP values)
+    """
+
+    n_strategies = nmbs.shape[1]
+    optimal_indices = nmbs.argmax(axis=1)   # cohorts x WTP values
+
+    return (optimal_indices[:, np.newaxis, :] == np.arange(n_strategies)[:, np.newaxis]).mean(axis=0)
+
+
+def get_ceaf(nmbs, ceac=None):
+    """ calculates the cost-effectiveness acceptability frontier
+    :param nmbs: (array) net monetary benefits (cohorts x strategies x WTP values)
+    :param ceac: (array) cost-effectiveness acceptability curves (calculated if not provided)
+    :return: (optimal indices, probabilities) where optimal indices are the indices of the strategies with the
+             highest expected net monetary benefit at each WTP value and probabilities are the probabilities
+             that these strategies have the highest net monetary benefit
+    """
+
+    if ceac is None:
+        ceac = get_ceac(nmbs=nmbs)
+
+    optimal_indices = nmbs.mean(axis=0).argmax(axis=0)
+
+    return optimal_indices, ceac[optimal_indices, np.arange(len(optimal_indices))]
+
+
+class CostBenefitAnalysis:
+    """ cost-benefit analysis of strategies over a range of willingness-to-pay values
+    (all results are calculated from one net monetary benefit array) """
+
+    def __init__(self, strategy_names, costs, qalys, wtps, ref_index=0, interval_type='p', alpha=D.ALPHA):
+        """
+        :param strategy_names: (list) names of the strategies
+        :param costs: (array) costs of each cohort (or parameter draw) under each strategy (cohorts x strategies)
+        :param qalys: (array) QALYs of each cohort (or parameter draw) under each strategy (cohorts x strategies)
+        :param wtps: (array) willingness-to-pay values
+        :param ref_index: index of the reference strategy of the incremental net monetary benefits
+        :param interval_type: 'p' for percentile (projection) intervals and 'c' for confidence intervals
+        :param alpha: significance level
+        """
+
+        self.strategyNames = list(strategy_names)
+        self.wtps = np.asarray(wtps, dtype=float)
+        self.refIndex = ref_index
+
+        self.nmbs = get_nmb_tensor(costs=costs, qalys=qalys, wtps=self.wtps)
+        self.expectedNMBs = self.nmbs.mean(axis=0)
+        self.incrementalNMBs, self.incrementalNMBsLower, self.incrementalNMBsUpper = \
+            get_incremental_nmb_intervals(nmbs=self.nmbs, ref_index=ref_index,
+                                          interval_type=interval_type, alpha=alpha)
+        self.ceac = get_ceac(nmbs=self.nmbs)
+        self.optimalIndices, self.ceaf = get_ceaf(nmbs=self.nmbs, ceac=self.ceac)
+
+    @staticmethod
+    def from_multi_cohort_outcomes(list_of_multi_cohort_outcomes, strategy_names, wtps,
+                                   ref_index=0, interval_type='p', alpha=D.ALPHA):
+        """
+        :param list_of_multi_cohort_outcomes: (list) outcomes of multi-cohorts simulated under each strategy
+                                              (cohort i of each multi-cohort uses parameter draw i)
+        :return: (CostBenefitAnalysis) analysis of the mean costs and QALYs of the cohorts
+        """
+        costs, qalys = get_outcome_arrays(list_of_multi_cohort_outcomes)
+        return CostBenefitAnalysis(
+            strategy_names=strategy_names, costs=costs, qalys=qalys, wtps=wtps,
+            ref_index=ref_index, interval_type=interval_type, alpha=alpha)
+
+    def get_arrays(self):
+        """
+        :return: (dictionary) results of the analysis (the arrays have one row per strategy and
+                 one column per WTP value, except the frontier arrays that have one value per WTP value)
+        """
+        return {'strategy names': np.array(self.strategyNames),
+                'wtps': self.wtps,
+                'expected NMBs': self.expectedNMBs,
+                'incremental NMBs': self.incrementalNMBs,
+                'incremental NMBs lower': self.incrementalNMBsLower,
+                'incremental NMBs upper': self.incrementalNMBsUpper,
+                'CEAC': self.ceac,
+                'CEAF optimal indices': self.optimalIndices,
+                'CEAF': self.ceaf}
+
+    def export_to_npz(self, file_name, if_include_nmbs=False):
+        """ saves the results (and optionally the full net monetary benefit array) to a .npz file
+        :param file_name: name of the file
+        :param if_include_nmbs: set to True to also save the net monetary benefits of all cohorts
+        """
+
+        arrays = {name.replace(' ', '_'): values for name, values in self.get_arrays().items()}
+        if if_include_nmbs:
+            arrays['nmbs'] = self.nmbs
+        np.savez_compressed(file_name, **arrays)
+
+    def export_to_csv(self, file_name):
+        """ saves the results to a csv file with one row per WTP value
+        :param file_name: name of the file
+        """
+
+        header = ['WTP']
+        columns = [self.wtps]
+        for i, name in enumerate(self.strategyNames):
+            header.extend(['{}: expected NMB'.format(name), '{}: incremental NMB'.format(name),
+                           '{}: incremental NMB lower'.format(name), '{}: incremental NMB upper'.format(name),
+                           '{}: CEAC'.format(name)])
+            columns.extend([self.expectedNMBs[i], self.incrementalNMBs[i],
+                            self.incrementalNMBsLower[i], self.incrementalNMBsUpper[i], self.ceac[i]])
+        header.extend(['optimal strategy', 'CEAF'])
+
+        optimal_names = np.array(self.strategyNames)[self.optimalIndices]
+        with open(file_name, 'w') as file:
+            file.write(','.join(header) + '\n')
+            for row, optimal_name, ceaf in zip(np.column_stack(columns), optimal_names, self.ceaf):
+                file.write(','.join('{:.10g}'.format(value) for value in row)
+                           + ',{},{:.10g}\n'.format(optimal_name, ceaf))
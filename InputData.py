@@ -1,3 +1,4 @@
+import os
 from enum import Enum
 
 import numpy as np
@@ -7,6 +8,12 @@ POP_SIZE = 1000        # cohort population size 10000
 SIMULATION_LENGTH = 50   # length of simulation (years) 50
 ALPHA = 0.05        # significance level for calculating confidence intervals
 DISCOUNT = 0.03     # annual discount rate
+RESULT_CACHE_DIR = '.result_cache'  # directory to store the outcomes of simulated cohorts in
+
+# plotting settings (can be set with the environment variables HEADLESS=1 and FIGURE_DIR=<directory>)
+HEADLESS = os.environ.get('HEADLESS', '0').lower() in ('1', 'true', 'yes')  # True to not draw figures
+FIGURE_DIR = os.environ.get('FIGURE_DIR') or None   # directory to save figures in (instead of showing them)
+FIGURE_FORMAT = 'png'   # file format of the saved figures
 
 ANNUAL_PROB_ALL_CAUSE_MORT = 0.0104
 ANNUAL_PROB_COVID_MORT = 111.4 / 100000
@@ -54,38 +61,66 @@ class HealthStates(Enum):
     NATUAL_DEATH = 4
 
 
-def get_trans_rate_matrix(with_treatment):
+# names of the model inputs that scenarios can change (see get_inputs)
+INPUT_NAMES = ('ANNUAL_PROB_ALL_CAUSE_MORT', 'ANNUAL_PROB_COVID_MORT', 'ANNUAL_PROB_FIRST_COVID',
+               'PROB_SURVIVE_FIRST_COVID', 'PROB_SURVIVE_RECURRENT_COVID', 'PROB_RECURRENT_COVID', 'COVID_DURATION',
+               'VAX_COVID_REDUCTION', 'ANNUAL_STATE_COST', 'ANNUAL_STATE_UTILITY', 'VAX_COST', 'DISCOUNT')
+
+
+def get_inputs(overrides=None):
+    """
+    :param overrides: (dictionary) values of the model inputs to change (by name, see INPUT_NAMES)
+    :return: (dictionary) values of the model inputs (the values in this module unless they are overridden)
+    """
+
+    inputs = {name: globals()[name] for name in INPUT_NAMES}
+
+    if overrides is not None:
+        unknown_names = sorted(set(overrides) - set(INPUT_NAMES))
+        if len(unknown_names) > 0:
+            raise ValueError('Unknown model inputs: {} (valid inputs are {}).'.format(
+                ', '.join(unknown_names), ', '.join(INPUT_NAMES)))
+        inputs.update(overrides)
+
+    return inputs
+
+
+def get_trans_rate_matrix(with_treatment, inputs=None):
     """
     :param with_treatment: set to True to calculate the transition rate matrix when the anticoagulation is used
     in the post-stroke state
+    :param inputs: (dictionary) values of the model inputs to change (see get_inputs); the values in this module
+                   are used for the other inputs
     :return: transition rate matrix
     """
 
+    inputs = get_inputs(overrides=inputs)
+
     # Part 1: find the annual probability of non-stroke death
-    annual_prob_non_covid_mort = (ANNUAL_PROB_ALL_CAUSE_MORT - ANNUAL_PROB_COVID_MORT)
+    annual_prob_non_covid_mort = (inputs['ANNUAL_PROB_ALL_CAUSE_MORT'] - inputs['ANNUAL_PROB_COVID_MORT'])
     lambda0 = -np.log(1-annual_prob_non_covid_mort)
 
     # Part 2: lambda 1 + lambda 2
-    lambda1_plus2 = -np.log(1 - ANNUAL_PROB_FIRST_COVID)
+    lambda1_plus2 = -np.log(1 - inputs['ANNUAL_PROB_FIRST_COVID'])
 
     # Part 3
-    lambda1 = lambda1_plus2*PROB_SURVIVE_FIRST_COVID
-    lambda2 = lambda1_plus2*(1-PROB_SURVIVE_FIRST_COVID)
+    lambda1 = lambda1_plus2*inputs['PROB_SURVIVE_FIRST_COVID']
+    lambda2 = lambda1_plus2*(1-inputs['PROB_SURVIVE_FIRST_COVID'])
 
     # Part 4
-    lambda3_plus4 = -np.log(1-PROB_RECURRENT_COVID)
+    lambda3_plus4 = -np.log(1-inputs['PROB_RECURRENT_COVID'])
 
     # Part 5
-    lambda3 = lambda3_plus4*PROB_SURVIVE_RECURRENT_COVID
-    lambda4 = lambda3_plus4*(1-PROB_SURVIVE_RECURRENT_COVID)
+    lambda3 = lambda3_plus4*inputs['PROB_SURVIVE_RECURRENT_COVID']
+    lambda4 = lambda3_plus4*(1-inputs['PROB_SURVIVE_RECURRENT_COVID'])
 
     # Part 6
-    lambda5 = 1/COVID_DURATION
+    lambda5 = 1/inputs['COVID_DURATION']
 
     # find multipliers to adjust the rates out of "Post-Stroke" depending on whether the patient
     # is receiving anticoagulation or not
     if with_treatment:
-        r1 = 1-VAX_COVID_REDUCTION #0.15
+        r1 = 1-inputs['VAX_COVID_REDUCTION'] #0.15
         #r2 = 1+ANTICOAG_BLEEDING_DEATH_INCREASE
     else:
         r1 = 1
@@ -0,0 +1,108 @@
+from collections import defaultdict
+from time import perf_counter
+
+import numpy as np
+
+# set to True (or call enable()) to count transitions and time the stages of simulations
+# (when False, the instrumented functions only check this flag)
+ENABLED = False
+
+_transitionCounts = defaultdict(int)    # number of transitions between each pair of states
+_stageTimes = defaultdict(float)        # total time spent in each stage (seconds)
+_stageCalls = defaultdict(int)          # number of times each stage was run
+
+
+def enable():
+    """ turns on the instrumentation (and clears the counts and times recorded so far) """
+    global ENABLED
+    reset()
+    ENABLED = True
+
+
+def disable():
+    """ turns off the instrumentation (the counts and times recorded so far are kept) """
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    """ clears the counts and times recorded so far """
+    _transitionCounts.clear()
+    _stageTimes.clear()
+    _stageCalls.clear()
+
+
+def get_time():
+    """
+    :return: current time of the performance counter (to pass to record_stage at the end of the stage)
+    """
+    return perf_counter()
+
+
+def record_stage(name, start):
+    """ records the time spent in a stage
+    :param name: name of the stage
+    :param start: time the stage started (from get_time)
+    """
+    _stageTimes[name] += perf_counter() - start
+    _stageCalls[name] += 1
+
+
+def count_transition(from_state, to_state):
+    """ counts a transition (a transition to the same state is the end of the simulation)
+    :param from_state: (HealthStates) state before the transition
+    :param to_state: (HealthStates) state after the transition
+    """
+    _transitionCounts[(from_state.name, to_state.name)] += 1
+
+
+def count_transitions(from_states, to_states, state_names):
+    """ counts a batch of transitions
+    :param from_states: (array) indices of the states before the transitions
+    :param to_states: (array) indices of the states after the transitions
+    :param state_names: (list) names of the states
+    """
+    n_states = len(state_names)
+    counts = np.bincount(np.asarray(from_states) * n_states + np.asarray(to_states), minlength=n_states ** 2)
+    for k in np.flatnonzero(counts):
+        _transitionCounts[(state_names[k // n_states], state_names[k % n_states])] += int(counts[k])
+
+
+def get_transition_counts():
+    """
+    :return: (dictionary) number of transitions for each (from-state, to-state) pair of state names
+    """
+    return dict(_transitionCounts)
+
+
+def get_stage_times():
+    """
+    :return: (dictionary) (total time in seconds, number of calls) of each stage
+    """
+    return {name: (_stageTimes[name], _stageCalls[name]) for name in _stageTimes}
+
+
+def get_report():
+    """
+    :return: (string) report of the time spent in each stage and the number of transitions between states
+    (the times of stages that run inside other stages are also included in the times of those stages)
+    """
+
+    lines = ['Time spent in each stage:',
+             '    {:<45} {:>12} {:>12} {:>14}'.format('stage', 'total (s)', 'calls', 'per call (us)')]
+    for name, (total, calls) in sorted(get_stage_times().items(), key=lambda item: -item[1][0]):
+        lines.append('    {:<45} {:>12.4f} {:>12,} {:>14.2f}'.format(name, total, calls, 1e6 * total / calls))
+
+    lines.append('Number of transitions:')
+    total_count = sum(_transitionCounts.values())
+    for (from_state, to_state), count in sorted(_transitionCounts.items()):
+        label = '{} -> {}'.format(from_state, to_state) if from_state != to_state \
+            else '{} (end of simulation)'.format(from_state)
+        lines.append('    {:<45} {:>12,} {:>12.2%}'.format(label, count, count / total_count))
+
+    return '\n'.join(lines)
+
+
+def print_report():
+    """ prints the report of the time spent in each stage and the number of transitions between states """
+    print(get_report())
@@ -1,13 +1,38 @@
+import csv
+from enum import Enum
+
 import numpy as np
 
-import SimPy.EconEval as Econ
-import SimPy.Markov as Markov
 import SimPy.SamplePath as Path
 import SimPy.Statistics as Stat
+import AnalyticEngine as Analytic
+import Instrumentation as Inst
+import StreamingStatClasses as Streaming
+import SurvivalCurveClasses as Curves
+import VectorizedEngine as Vec
+import InputData as Data
 from InputData import HealthStates
+from ResultCacheClasses import get_cache_key
+
+
+class Engines(Enum):
+    """ engines to simulate a cohort """
+    PATIENT = 0     # patients are simulated one at a time (one Gillespie algorithm per patient)
+    VECTORIZED = 1  # all living patients are advanced together using NumPy arrays
+    EXPECTED_VALUE = 2  # expected outcomes are calculated exactly (no Monte Carlo, see ExpectedValueCohort)
+
+
+class Outcomes(Enum):
+    """ outcomes whose precision can be targeted """
+    SURVIVAL_TIME = 0
+    NUM_OF_COVID = 1
+    COST = 2
+    UTILITY = 3
 
 
 class Patient:
+    __slots__ = ('id', 'params', 'stateMonitor')
+
     def __init__(self, id, parameters):
         """ initiates a patient
         :param id: ID of the patient
@@ -20,10 +45,12 @@ class Patient:
     def simulate(self, sim_length):
         """ simulate the patient over the specified simulation length """
 
+        start = Inst.get_time() if Inst.ENABLED else None
+
         # random number generator for this patient
         rng = np.random.RandomState(seed=self.id)
-        # gillespie algorithm
-        gillespie = Markov.Gillespie(transition_rate_matrix=self.params.transRateMatrix)
+        # compiled gillespie algorithm (shared by all patients with these parameters)
+        sampler = self.params.get_sampler()
 
         t = 0  # simulation time
         if_stop = False
@@ -33,7 +60,7 @@ class Patient:
             # (note that the gillespie algorithm returns None for dt if the process
             # is in an absorbing state)
 
-            dt, new_state_index = gillespie.get_next_state(
+            dt, new_state_index = sampler.get_next_state(
                 current_state_index=self.stateMonitor.currentState.value,
                 rng=rng)
 
@@ -55,9 +82,14 @@ class Patient:
                 # update health state
                 self.stateMonitor.update(time=t, new_state=HealthStates(new_state_index))
 
+        if start is not None:
+            Inst.record_stage(name='Patient.simulate', start=start)
+
 
 class PatientStateMonitor:
     """ to update patient outcomes (years survived, cost, etc.) throughout the simulation """
+    __slots__ = ('currentState', 'survivalTime', 'nCOVID', 'costUtilityMonitor')
+
     def __init__(self, parameters):
 
         self.currentState = parameters.initialHealthState   # initial health state
@@ -73,12 +105,16 @@ class PatientStateMonitor:
         :param new_state: new state
         """
 
+        if Inst.ENABLED:
+            start = Inst.get_time()
+            Inst.count_transition(from_state=self.currentState, to_state=new_state)
+
         # update survival time
         if new_state in (HealthStates.COVID_DEATH, HealthStates.NATUAL_DEATH):
             self.survivalTime = time
 
-        # update covid counts
-        if new_state in (HealthStates.COVID, HealthStates.COVID_DEATH):
+        # update covid counts (the state does not change when the simulation ends before the next event)
+        if new_state != self.currentState and new_state in (HealthStates.COVID, HealthStates.COVID_DEATH):
             self.nCOVID += 1
 
         # update cost and utility
@@ -89,8 +125,14 @@ class PatientStateMonitor:
         # update current health state
         self.currentState = new_state
 
+        if Inst.ENABLED:
+            Inst.record_stage(name='PatientStateMonitor.update', start=start)
+
 
 class PatientCostUtilityMonitor:
+    """ records the periods the patient spends in each state (the discounted cost and utility of these
+    periods are calculated together for all patients of a cohort) """
+    __slots__ = ('tLastRecorded', 'params', 'sojournStates', 'sojournStarts', 'sojournEnds', '_discountedOutcomes')
 
     def __init__(self, parameters):
 
@@ -99,58 +141,423 @@ class PatientCostUtilityMonitor:
         # model parameters for this patient
         self.params = parameters
 
-        # total cost and utility
-        self.totalDiscountedCost = 0
-        self.totalDiscountedUtility = 0
+        # state, start and end of each period spent in a state
+        self.sojournStates = []
+        self.sojournStarts = []
+        self.sojournEnds = []
+        self._discountedOutcomes = None     # (cost, utility) calculated after the last update
 
     def update(self, time, current_state):
-        """ updates the discounted total cost and health utility
+        """ records the period spent in the current state since the last recording
         :param time: simulation time
         :param current_state: current health state
         """
 
-        cost = self.params.annualStateCosts[current_state.value] + self.params.annualTreatmentCost
-        utility = self.params.annualStateUtilities[current_state.value]
-
-        # discounted cost and utility (continuously compounded)
-        discounted_cost = Econ.pv_continuous_payment(payment=cost,
-                                                     discount_rate=self.params.discountRate,
-                                                     discount_period=(self.tLastRecorded, time))
-        discounted_utility = Econ.pv_continuous_payment(payment=utility,
-                                                        discount_rate=self.params.discountRate,
-                                                        discount_period=(self.tLastRecorded, time))
+        start = Inst.get_time() if Inst.ENABLED else None
 
-        # if next_state == HealthStates.COVID:
-        #    discounted_cost += Econ.pv_single_payment(payment=5000, discount_rate=0.03, discount_period=time,
-        #                                             discount_continuously=True)
-
-        # update total discounted cost and utility
-        self.totalDiscountedCost += discounted_cost
-        self.totalDiscountedUtility += discounted_utility
+        self.sojournStates.append(current_state.value)
+        self.sojournStarts.append(self.tLastRecorded)
+        self.sojournEnds.append(time)
 
         # update the time since last recording to the current time
         self.tLastRecorded = time
+        self._discountedOutcomes = None
+
+        if start is not None:
+            Inst.record_stage(name='PatientCostUtilityMonitor.update', start=start)
+
+    def get_discounted_outcomes(self):
+        """
+        :return: (cost, utility) total discounted cost and utility of this patient (calculated once after the
+                 last update)
+        """
+        if self._discountedOutcomes is None:
+            costs, utilities = Vec.get_discounted_outcomes(parameters=self.params,
+                                                           patients=np.zeros(len(self.sojournStates), dtype=int),
+                                                           states=np.array(self.sojournStates, dtype=int),
+                                                           t0=np.array(self.sojournStarts, dtype=float),
+                                                           t1=np.array(self.sojournEnds, dtype=float),
+                                                           n_patients=1)
+            self._discountedOutcomes = (costs[0], utilities[0])
+        return self._discountedOutcomes
+
+    @property
+    def totalDiscountedCost(self):
+        return self.get_discounted_outcomes()[0]
+
+    @property
+    def totalDiscountedUtility(self):
+        return self.get_discounted_outcomes()[1]
+
+
+class _SojournRecords:
+    """ periods spent in each state by the patients of a cohort (to calculate their discounted cost and
+    utility in one vectorized pass) """
+
+    def __init__(self):
+        self.params = None      # parameters of the patients
+        self.patients = []      # index of the patient of each period
+        self.states = []        # state of each period
+        self.starts = []        # start of each period
+        self.ends = []          # end of each period
+        self.finalStates = []   # state of each patient at the end of the simulation
+        self.finalTimes = []    # end of the last period of each patient (time of death if the patient died)
+        self._arrays = None     # the periods as arrays (calculated when needed)
+
+    def clear(self):
+        """ removes all records """
+        self.patients.clear()
+        self.states.clear()
+        self.starts.clear()
+        self.ends.clear()
+        self.finalStates.clear()
+        self.finalTimes.clear()
+        self._arrays = None
+
+    def append(self, patient_index, simulated_patient):
+        """ appends the periods spent in each state by a simulated patient
+        :param patient_index: index of the patient
+        :param simulated_patient: a simulated patient
+        """
+        monitor = simulated_patient.stateMonitor.costUtilityMonitor
+        self.params = simulated_patient.params
+        self.patients.extend([patient_index] * len(monitor.sojournStates))
+        self.states.extend(monitor.sojournStates)
+        self.starts.extend(monitor.sojournStarts)
+        self.ends.extend(monitor.sojournEnds)
+        self.finalStates.append(simulated_patient.stateMonitor.currentState.value)
+        self.finalTimes.append(monitor.sojournEnds[-1] if len(monitor.sojournEnds) > 0 else 0)
+        self._arrays = None
+
+    def get_arrays(self):
+        """
+        :return: (patients, states, starts, ends) arrays of the recorded periods
+        """
+        if self._arrays is None:
+            self._arrays = (np.array(self.patients, dtype=int), np.array(self.states, dtype=int),
+                            np.array(self.starts, dtype=float), np.array(self.ends, dtype=float))
+        return self._arrays
+
+    def pop_discounted_outcomes(self, n_patients, if_occupancy=False):
+        """ calculates the discounted cost and utility of the recorded patients and clears the records
+        :param n_patients: number of patients
+        :param if_occupancy: set to True to also calculate the discounted time each patient spent in each state
+        :return: (costs, utilities, occupancy) where costs and utilities are arrays of size n_patients and
+                 occupancy is an array of size n_patients x number of states (None if if_occupancy is False)
+        """
+
+        n_states = len(HealthStates)
+        if self.params is None:
+            return np.zeros(n_patients), np.zeros(n_patients), \
+                np.zeros((n_patients, n_states)) if if_occupancy else None
+
+        patients, states, t0, t1 = self.get_arrays()
+
+        costs, utilities = Vec.get_discounted_outcomes(parameters=self.params, patients=patients, states=states,
+                                                       t0=t0, t1=t1, n_patients=n_patients)
+        occupancy = None
+        if if_occupancy:
+            occupancy = Vec.get_discounted_occupancy(patients=patients, states=states, t0=t0, t1=t1,
+                                                     n_patients=n_patients, n_states=n_states,
+                                                     discount_rate=self.params.discountRate)
+        self.clear()
+
+        return costs, utilities, occupancy
+
+
+class EventHistory:
+    """ times at which the patients of a cohort enter each state (the outcomes over any horizon up to the simulation
+    length and with any discount rate are calculated from these times, and are the same as the outcomes of a
+    cohort simulated over that horizon with that discount rate) """
+
+    def __init__(self, parameters, sim_length):
+        """
+        :param parameters: parameters of the patients
+        :param sim_length: simulation length (the longest horizon)
+        """
+        self.params = parameters
+        self.simLength = sim_length
+        self.nPatients = 0
+        self._patients = []     # (list of arrays) index of the patient of each event
+        self._times = []        # (list of arrays) time of each event
+        self._states = []       # (list of arrays) state the patient enters
+        self._events = None     # events sorted by patient and time (calculated when needed)
+
+    def append_sojourns(self, first_index, sojourns):
+        """ appends the events of a block of patients simulated by the patient engine
+        :param first_index: index of the first patient of the block
+        :param sojourns: (_SojournRecords) periods spent in each state by the patients of the block
+        """
+
+        # patients enter the state of each recorded period at its start (and the absorbing state they end in)
+        patients, states, starts, _ = sojourns.get_arrays()
+        final_states = np.array(sojourns.finalStates, dtype=int)
+        final_times = np.array(sojourns.finalTimes, dtype=float)
+        if_absorbing = self.params.get_sampler().ifAbsorbing[final_states]
+
+        self._patients.extend((patients + first_index, np.flatnonzero(if_absorbing) + first_index))
+        self._times.extend((starts, final_times[if_absorbing]))
+        self._states.extend((states, final_states[if_absorbing]))
+        self.nPatients = max(self.nPatients, first_index + len(final_states))
+        self._events = None
+
+    def append_batch(self, first_index, events):
+        """ appends the events of a batch of patients simulated by the vectorized engine
+        :param first_index: index of the first patient of the batch
+        :param events: (list) of (patients, times, states) arrays (see VectorizedEngine.simulate_cohort)
+        """
+
+        for patients, times, states in events:
+            self._patients.append(patients + first_index)
+            self._times.append(times)
+            self._states.append(states)
+        self.nPatients = max(self.nPatients, first_index + len(events[0][0]))
+        self._events = None
+
+    def _get_events(self):
+        """
+        :return: (patients, times, states, exit times) arrays of the events sorted by patient and time, where exit
+                 times are the times the patients leave the states they enter (inf if they never leave)
+        """
+
+        if self._events is None:
+            patients = np.concatenate(self._patients)
+            times = np.concatenate(self._times)
+            states = np.concatenate(self._states)
+            order = np.lexsort((times, patients))
+            patients, times, states = patients[order], times[order], states[order]
+
+            exit_times = np.full(len(times), np.inf)
+            if_same_patient = patients[1:] == patients[:-1]
+            exit_times[:-1][if_same_patient] = times[1:][if_same_patient]
+
+            self._events = (patients, times, states, exit_times)
+
+        return self._events
+
+    def get_patient_outcomes(self, horizon, discount_rate):
+        """
+        :param horizon: horizon (years, not longer than the simulation length)
+        :param discount_rate: discount rate
+        :return: a dictionary of arrays of size number of patients with keys 'survival times' (NaN for patients
+                 alive at the horizon), 'number of COVID', 'costs' and 'utilities'
+        """
+
+        if horizon > self.simLength:
+            raise ValueError('The horizon ({}) is longer than the simulation length ({}).'.format(
+                horizon, self.simLength))
+
+        patients, times, states, exit_times = self._get_events()
+        if_absorbing = self.params.get_sampler().ifAbsorbing[states]
+        in_horizon = times <= horizon
+        # (all events except the initial states at time 0 are transitions)
+        if_transition = in_horizon & (times > 0)
+
+        # survival times and numbers of COVID
+        survival_times = np.full(self.nPatients, np.nan)
+        if_death = if_transition & if_absorbing
+        survival_times[patients[if_death]] = times[if_death]
+        if_covid = if_transition & np.isin(states, [HealthStates.COVID.value, HealthStates.COVID_DEATH.value])
+        n_covid = np.bincount(patients[if_covid], minlength=self.nPatients)
+
+        # periods spent in non-absorbing states before the horizon
+        if_period = in_horizon & ~if_absorbing
+        pv_factors = Vec.get_pv_continuous_factors(t0=times[if_period],
+                                                   t1=np.minimum(exit_times[if_period], horizon),
+                                                   discount_rate=discount_rate)
+        annual_costs = np.array(self.params.annualStateCosts, dtype=float) + self.params.annualTreatmentCost
+        annual_utilities = np.array(self.params.annualStateUtilities, dtype=float)
+        period_states = states[if_period]
+
+        return {'survival times': survival_times,
+                'number of COVID': n_covid,
+                'costs': np.bincount(patients[if_period], weights=pv_factors * annual_costs[period_states],
+                                     minlength=self.nPatients),
+                'utilities': np.bincount(patients[if_period], weights=pv_factors * annual_utilities[period_states],
+                                         minlength=self.nPatients)}
+
+    def get_outcome_table(self, horizons, discount_rates):
+        """
+        :param horizons: (list) horizons (years, not longer than the simulation length)
+        :param discount_rates: (list) discount rates
+        :return: (list) of rows (dictionaries) with the mean outcomes for each horizon and discount rate
+        """
+
+        rows = []
+        for horizon in horizons:
+            for discount_rate in discount_rates:
+                outcomes = self.get_patient_outcomes(horizon=horizon, discount_rate=discount_rate)
+                if_died = ~np.isnan(outcomes['survival times'])
+                rows.append({'horizon': horizon,
+                             'discount rate': discount_rate,
+                             'probability alive': float(1 - if_died.mean()),
+                             'mean survival time': float(outcomes['survival times'][if_died].mean())
+                             if if_died.any() else np.nan,
+                             'mean number of COVID': float(outcomes['number of COVID'].mean()),
+                             'mean cost': float(outcomes['costs'].mean()),
+                             'mean QALY': float(outcomes['utilities'].mean())})
+
+        return rows
+
+    def export_to_csv(self, file_name, horizons, discount_rates):
+        """ saves the mean outcomes for each horizon and discount rate to a csv file
+        :param file_name: name of the file
+        :param horizons: (list) horizons (years, not longer than the simulation length)
+        :param discount_rates: (list) discount rates
+        """
+
+        rows = self.get_outcome_table(horizons=horizons, discount_rates=discount_rates)
+        with open(file_name, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
 
 
 class Cohort:
-    def __init__(self, id, pop_size, parameters):
+    def __init__(self, id, pop_size, parameters, engine=Engines.PATIENT, if_streaming=False,
+                 if_antithetic=False, if_control_variate=False, if_occupancy=False, if_event_history=False):
         """ create a cohort of patients
         :param id: cohort ID
         :param pop_size: population size of this cohort
         :param parameters: parameters
+        :param engine: (Engines) engine to simulate the cohort with
+        :param if_streaming: set to True to update the summary statistics as patients are simulated
+                             instead of storing the outcomes of every patient (constant memory)
+        :param if_antithetic: set to True to simulate pairs of patients with antithetic random numbers
+                              (requires the vectorized engine and an even population size)
+        :param if_control_variate: set to True to estimate mean cost and utility with the discounted number of
+                                   COVID episodes and the discounted life years as control variates (their
+                                   expectations are calculated exactly; requires the vectorized engine)
+        :param if_occupancy: set to True to store the discounted time each patient spends in each state (so the
+                             outcomes can be re-priced with other costs and utilities, see CohortOutcomes.reprice)
+        :param if_event_history: set to True to store the times patients enter each state (to calculate the outcomes
+                                 over shorter horizons and with other discount rates, see EventHistory)
         """
+        if engine == Engines.EXPECTED_VALUE:
+            raise ValueError('Use ExpectedValueCohort to calculate the expected outcomes of a cohort.')
+        if (if_antithetic or if_control_variate) and (engine != Engines.VECTORIZED or if_streaming):
+            raise ValueError('Variance reduction is only supported by the vectorized engine without streaming.')
+        if if_antithetic and pop_size % 2 == 1:
+            raise ValueError('Antithetic variates require an even population size.')
+        if (if_occupancy or if_event_history) and if_streaming:
+            raise ValueError('Streaming outcomes do not store the outcomes of each patient.')
+
         self.id = id
         self.popSize = pop_size
         self.params = parameters
-        self.cohortOutcomes = CohortOutcomes()  # outcomes of the this simulated cohort
+        self.engine = engine
+        self.ifAntithetic = if_antithetic
+        self.ifControlVariate = if_control_variate
+        self.ifOccupancy = if_occupancy
+        self.ifEventHistory = if_event_history
+        self.nPatientsSimulated = 0     # number of patients simulated (less than pop_size if the target precision
+                                        # was reached first)
+        # outcomes of the this simulated cohort
+        if if_streaming:
+            self.cohortOutcomes = StreamingCohortOutcomes()
+        else:
+            self.cohortOutcomes = CohortOutcomes(pop_size=pop_size,
+                                                 if_antithetic=if_antithetic,
+                                                 if_control_variate=if_control_variate,
+                                                 if_occupancy=if_occupancy)
 
-    def simulate(self, sim_length):
+    def simulate(self, sim_length, cache=None, target_half_width=None, outcome=Outcomes.COST, alpha=Data.ALPHA,
+                 batch_size=1000):
         """ simulate the cohort of patients over the specified number of time-steps
         :param sim_length: simulation length
+        :param cache: (ResultCache) cache to look up the outcomes of this cohort in (and to store them in
+                      after the cohort is simulated)
+        :param target_half_width: if provided, patients are simulated in batches until the half-width of the
+                                  t-confidence interval of the mean of the outcome is not above this value
+                                  (or the population size is reached)
+        :param outcome: (Outcomes) outcome whose precision is targeted
+        :param alpha: significance level of the confidence interval
+        :param batch_size: number of patients simulated between checks of the precision
+        """
+
+        # use the outcomes of an identical cohort if already simulated
+        key = None
+        if cache is not None:
+            settings = {} if target_half_width is None else \
+                {'target': (target_half_width, outcome.name, alpha, batch_size)}
+            if self.engine == Engines.VECTORIZED:
+                settings['variance reduction'] = (self.ifAntithetic, self.ifControlVariate)
+            if self.ifOccupancy:
+                settings['occupancy'] = True
+            if self.ifEventHistory:
+                settings['event history'] = True
+            key = get_cache_key(parameters=self.params,
+                                cohort_id=self.id,
+                                pop_size=self.popSize,
+                                sim_length=sim_length,
+                                engine=self.engine.name,
+                                outcomes=type(self.cohortOutcomes).__name__,
+                                **settings)
+            cached_outcomes = cache.get(key=key)
+            if cached_outcomes is not None:
+                self.cohortOutcomes = cached_outcomes
+                self.nPatientsSimulated = cached_outcomes.nPatients
+                return
+
+        # simulate all patients together unless a target precision is provided
+        if target_half_width is None:
+            batch_size = self.popSize
+        elif self.ifAntithetic:
+            # pairs of patients are simulated in the same batch
+            batch_size += batch_size % 2
+
+        self.start_simulation(sim_length=sim_length)
+        while self.nPatientsSimulated < self.popSize:
+            self.simulate_batch(sim_length=sim_length,
+                                n_patients=min(batch_size, self.popSize - self.nPatientsSimulated))
+
+            # stop if the target precision is reached
+            if target_half_width is not None and \
+                    self.cohortOutcomes.get_t_half_length(outcome=outcome, alpha=alpha) <= target_half_width:
+                break
+
+        # calculate cohort outcomes
+        self.cohortOutcomes.calculate_cohort_outcomes(initial_pop_size=self.nPatientsSimulated)
+
+        if cache is not None:
+            cache.put(key=key, result=self.cohortOutcomes)
+
+    def start_simulation(self, sim_length):
+        """ prepares the cohort to simulate its patients in batches (see simulate_batch)
+        :param sim_length: simulation length
+        """
+
+        self.nPatientsSimulated = 0
+        if self.ifEventHistory:
+            self.cohortOutcomes.eventHistory = EventHistory(parameters=self.params, sim_length=sim_length)
+
+        # expectations of the control variates
+        if self.ifControlVariate:
+            self.cohortOutcomes.expectedControl = Analytic.get_expected_controls(parameters=self.params,
+                                                                                 sim_length=sim_length)
+
+    def simulate_batch(self, sim_length, n_patients):
+        """ simulates the next patients of this cohort (the outcomes of the cohort should be calculated
+        with cohortOutcomes.calculate_cohort_outcomes after the last batch)
+        :param sim_length: simulation length
+        :param n_patients: number of patients to simulate
+        """
+
+        if self.engine == Engines.VECTORIZED:
+            self._simulate_vectorized(sim_length=sim_length, first_index=self.nPatientsSimulated, n_patients=n_patients)
+        else:
+            self._simulate_patients(sim_length=sim_length, first_index=self.nPatientsSimulated, n_patients=n_patients)
+        self.nPatientsSimulated += n_patients
+
+    def _simulate_patients(self, sim_length, first_index, n_patients):
+        """ simulates patients of this cohort one at a time
+        :param sim_length: simulation length
+        :param first_index: index of the first patient to simulate
+        :param n_patients: number of patients to simulate
         """
 
         # populate and simulate the cohort
-        for i in range(self.popSize):
+        for i in range(first_index, first_index + n_patients):
             # create a new patient (use id * pop_size + n as patient id)
             patient = Patient(id=self.id * self.popSize + i,
                               parameters=self.params)
@@ -160,17 +567,234 @@ class Cohort:
             # store outputs of this simulation
             self.cohortOutcomes.extract_outcome(simulated_patient=patient)
 
-        # calculate cohort outcomes
-        self.cohortOutcomes.calculate_cohort_outcomes(initial_pop_size=self.popSize)
+    def _simulate_vectorized(self, sim_length, first_index, n_patients):
+        """ simulates patients of this cohort together
+        :param sim_length: simulation length
+        :param first_index: index of the first patient to simulate
+        :param n_patients: number of patients to simulate
+        """
 
+        # simulate the patients in batches
+        for start in range(first_index, first_index + n_patients, Vec.MAX_BATCH_SIZE):
+            # random number generator of this batch (depends only on the cohort id and the index of the first
+            # patient, so cohorts with the same id and batches use common random numbers)
+            rng = np.random.RandomState(seed=[self.id, start])
+            pop_size = min(Vec.MAX_BATCH_SIZE, first_index + n_patients - start)
+            occupancy = np.zeros((pop_size, len(HealthStates))) if self.ifOccupancy else None
+            events = [] if self.ifEventHistory else None
 
-class CohortOutcomes:
+            survival_times, n_covid, costs, utilities, controls = Vec.simulate_cohort(
+                parameters=self.params,
+                pop_size=pop_size,
+                sim_length=sim_length,
+                rng=rng,
+                if_antithetic=self.ifAntithetic,
+                occupancy=occupancy,
+                events=events)
+
+            # store outputs of this batch
+            self.cohortOutcomes.extract_outcomes(survival_times=survival_times,
+                                                 n_covid=n_covid,
+                                                 costs=costs,
+                                                 utilities=utilities,
+                                                 controls=controls,
+                                                 occupancy=occupancy)
+            if events is not None:
+                self.cohortOutcomes.eventHistory.append_batch(first_index=start, events=events)
+
+
+class PairedCohort:
+    """ simulates the same patients under two therapies with common random numbers (patient i of both arms
+    uses the same random number stream) to estimate the incremental outcomes of the new therapy """
+
+    def __init__(self, id, pop_size, parameters_ref, parameters, engine=Engines.PATIENT,
+                 if_antithetic=False, if_control_variate=False):
+        """
+        :param id: cohort ID (shared by both arms)
+        :param pop_size: population size of this cohort
+        :param parameters_ref: parameters under the reference therapy
+        :param parameters: parameters under the new therapy
+        :param engine: (Engines) engine to simulate the cohort with (Engines.PATIENT or Engines.VECTORIZED)
+        :param if_antithetic: set to True to use antithetic variates in both arms (see Cohort)
+        :param if_control_variate: set to True to use control variates in both arms (see Cohort)
+        """
+
+        self.id = id
+        self.popSize = pop_size
+        self.cohortRef = Cohort(id=id, pop_size=pop_size, parameters=parameters_ref, engine=engine,
+                                if_antithetic=if_antithetic, if_control_variate=if_control_variate)
+        self.cohort = Cohort(id=id, pop_size=pop_size, parameters=parameters, engine=engine,
+                             if_antithetic=if_antithetic, if_control_variate=if_control_variate)
+        self.nPatientsSimulated = 0
+        self.pairedOutcomes = None  # (PairedCohortOutcomes) incremental outcomes of the new therapy
+
+    def simulate(self, sim_length, cache=None, target_half_width=None, wtp=0, alpha=Data.ALPHA, batch_size=1000):
+        """ simulates both arms
+        :param sim_length: simulation length
+        :param cache: (ResultCache) cache for the outcomes of each arm (not used if a target precision is provided)
+        :param target_half_width: if provided, patients are simulated in batches (in both arms) until the half-width
+                                  of the t-confidence interval of the mean incremental net monetary benefit is
+                                  not above this value (or the population size is reached)
+        :param wtp: willingness-to-pay for one unit of utility (to calculate the net monetary benefit)
+        :param alpha: significance level of the confidence interval
+        :param batch_size: number of patients simulated between checks of the precision
+        """
+
+        if target_half_width is None:
+            self.cohortRef.simulate(sim_length=sim_length, cache=cache)
+            self.cohort.simulate(sim_length=sim_length, cache=cache)
+        else:
+            batch_size += batch_size % 2
+            self.cohortRef.start_simulation(sim_length=sim_length)
+            self.cohort.start_simulation(sim_length=sim_length)
+            while self.cohort.nPatientsSimulated < self.popSize:
+                n = min(batch_size, self.popSize - self.cohort.nPatientsSimulated)
+                self.cohortRef.simulate_batch(sim_length=sim_length, n_patients=n)
+                self.cohort.simulate_batch(sim_length=sim_length, n_patients=n)
+
+                # stop if the target precision is reached
+                paired_outcomes = PairedCohortOutcomes(outcomes_ref=self.cohortRef.cohortOutcomes,
+                                                       outcomes=self.cohort.cohortOutcomes)
+                if paired_outcomes.get_incremental_nmb_stat(wtp=wtp).get_t_half_length(alpha) <= target_half_width:
+                    break
+
+            for cohort in (self.cohortRef, self.cohort):
+                cohort.cohortOutcomes.calculate_cohort_outcomes(initial_pop_size=cohort.nPatientsSimulated)
+
+        self.nPatientsSimulated = self.cohort.nPatientsSimulated
+        self.pairedOutcomes = PairedCohortOutcomes(outcomes_ref=self.cohortRef.cohortOutcomes,
+                                                   outcomes=self.cohort.cohortOutcomes)
+
+
+class PairedCohortOutcomes:
+    """ incremental outcomes of patients simulated under two therapies with common random numbers """
+
+    def __init__(self, outcomes_ref, outcomes):
+        """
+        :param outcomes_ref: (CohortOutcomes) outcomes under the reference therapy
+        :param outcomes: (CohortOutcomes) outcomes of the same patients under the new therapy
+        """
+
+        # incremental outcomes of each patient (or of each antithetic pair, corrected by the control variates)
+        self.incrementalCosts = outcomes.get_estimator_samples(outcomes.costs) \
+            - outcomes_ref.get_estimator_samples(outcomes_ref.costs)
+        self.incrementalUtilities = outcomes.get_estimator_samples(outcomes.utilities) \
+            - outcomes_ref.get_estimator_samples(outcomes_ref.utilities)
+        self.incrementalNumOfCOVID = outcomes.nTotalCOVID - outcomes_ref.nTotalCOVID
+
+        self.statIncrementalCost = Stat.SummaryStat(name='Incremental discounted cost', data=self.incrementalCosts)
+        self.statIncrementalUtility = Stat.SummaryStat(name='Incremental discounted utility',
+                                                       data=self.incrementalUtilities)
+        self.statIncrementalNumOfCOVID = Stat.SummaryStat(name='Incremental times of COVID',
+                                                          data=self.incrementalNumOfCOVID)
+
+    def get_incremental_nmb_stat(self, wtp):
+        """
+        :param wtp: willingness-to-pay for one unit of utility
+        :return: summary statistics of the incremental net monetary benefit at this willingness-to-pay
+        """
+        return Stat.SummaryStat(name='Incremental net monetary benefit',
+                                data=wtp * self.incrementalUtilities - self.incrementalCosts)
+
+
+class ExpectedValueCohort:
+    def __init__(self, id, pop_size, parameters):
+        """ create a cohort whose expected outcomes are calculated from the transition rate matrix
+        (the outcomes are deterministic and do not depend on the cohort ID)
+        :param id: cohort ID
+        :param pop_size: population size of this cohort
+        :param parameters: parameters
+        """
+        self.id = id
+        self.popSize = pop_size
+        self.params = parameters
+        self.cohortOutcomes = ExpectedCohortOutcomes()  # expected outcomes of this cohort
+
+    def simulate(self, sim_length):
+        """ calculates the expected outcomes of the cohort over the specified simulation length
+        :param sim_length: simulation length
+        """
+
+        self.cohortOutcomes.calculate_cohort_outcomes(parameters=self.params,
+                                                      initial_pop_size=self.popSize,
+                                                      sim_length=sim_length)
+
+
+class ExpectedCohortOutcomes:
     def __init__(self):
 
-        self.survivalTimes = []         # patients' survival times
-        self.nTotalCOVID = []           # covid times
-        self.costs = []                 # patients' discounted costs
-        self.utilities =[]              # patients' discounted utilities
+        self.probSurvival = None        # probability of being alive at the end of the simulation
+        self.meanSurvivalTime = None    # expected survival time of patients who die during the simulation
+        self.meanLifeYears = None       # expected life years over the simulation length
+        self.meanNumOfCOVID = None      # expected numbers of COVID
+        self.meanCosts = None           # expected discounted cost
+        self.meanUtilities = None       # expected discounted utility
+        self.survivalCurveTimes = None  # times at which the probability of being alive is calculated
+        self.survivalCurveProbs = None  # probability of being alive at these times
+        self.nLivingPatients = None     # survival curve (expected number of alive patients over time)
+
+    def calculate_cohort_outcomes(self, parameters, initial_pop_size, sim_length):
+        """ calculates the expected cohort outcomes
+        :param parameters: parameters
+        :param initial_pop_size: initial population size
+        :param sim_length: simulation length
+        """
+
+        outcomes = Analytic.get_expected_outcomes(parameters=parameters, sim_length=sim_length)
+
+        self.probSurvival = outcomes['survival probability']
+        self.meanSurvivalTime = outcomes['mean survival time']
+        self.meanLifeYears = outcomes['life years']
+        self.meanNumOfCOVID = outcomes['number of COVID']
+        self.meanCosts = outcomes['cost']
+        self.meanUtilities = outcomes['utility']
+
+        # survival curve
+        self.survivalCurveTimes = Curves.get_time_grid(sim_length=sim_length)
+        self.survivalCurveProbs = Analytic.get_expected_survival_curve(parameters=parameters,
+                                                                       time_grid=self.survivalCurveTimes)
+        self.nLivingPatients = Path.PrevalencePathBatchUpdate(
+            name='# of living patients',
+            initial_size=initial_pop_size,
+            times_of_changes=self.survivalCurveTimes[1:],
+            increments=initial_pop_size * np.diff(self.survivalCurveProbs)
+        )
+
+
+class CohortOutcomes:
+    def __init__(self, pop_size, if_antithetic=False, if_control_variate=False, if_occupancy=False,
+                 buffer_size=10000):
+        """
+        :param pop_size: number of patients whose outcomes will be extracted
+        :param if_antithetic: set to True if patients 2j and 2j+1 are simulated with antithetic random numbers
+        :param if_control_variate: set to True to correct the estimates of mean cost and utility with control
+                                   variates (their expectations should be set in expectedControl)
+        :param if_occupancy: set to True to store the discounted time each patient spends in each state
+        :param buffer_size: number of patients extracted one at a time whose periods in states are buffered
+                            before their discounted cost and utility are calculated
+        """
+
+        # patients' outcomes (preallocated for all patients; the first nPatients entries are filled)
+        self.nPatients = 0                                  # number of patients extracted so far
+        self._survivalTimes = np.full(pop_size, np.nan)     # survival times (NaN if did not die)
+        self._ifDied = np.zeros(pop_size, dtype=bool)       # if died during the simulation
+        self._nTotalCOVID = np.zeros(pop_size, dtype=int)   # covid times
+        self._costs = np.zeros(pop_size)                    # discounted costs
+        self._utilities = np.zeros(pop_size)                # discounted utilities
+        self._sojourns = _SojournRecords()  # periods in states of patients whose cost/utility is not calculated yet
+        self._nDiscounted = 0               # number of patients whose cost/utility is calculated
+        self._bufferSize = buffer_size
+        self.ifOccupancy = if_occupancy
+        # discounted time spent in each state (patients x states)
+        self._occupancy = np.zeros((pop_size, len(HealthStates))) if if_occupancy else None
+        self.eventHistory = None    # (EventHistory) times patients enter each state (if stored)
+
+        # variance reduction
+        self.ifAntithetic = if_antithetic
+        self.ifControlVariate = if_control_variate
+        # control variates of patients (patients x number of control variates)
+        self._controls = np.zeros((pop_size, Vec.N_CONTROLS)) if if_control_variate else None
+        self.expectedControl = None     # (array) expectations of the control variates
         self.nLivingPatients = None     # survival curve (sample path of number of alive patients over time)
 
         self.statSurvivalTime = None    # summary statistics for survival time
@@ -181,48 +805,350 @@ class CohortOutcomes:
         self.meanSurvivalTime = None
         self.meanNumOfCOVID = None
         self.meanCosts = None
+        self.meanUtilities = None
+
+    @property
+    def survivalTimes(self):
+        """ (array) survival times of patients who died during the simulation """
+        return self._survivalTimes[:self.nPatients][self._ifDied[:self.nPatients]]
+
+    @property
+    def ifDied(self):
+        """ (array) mask of patients who died during the simulation """
+        return self._ifDied[:self.nPatients]
+
+    @property
+    def nTotalCOVID(self):
+        """ (array) patients' numbers of COVID """
+        return self._nTotalCOVID[:self.nPatients]
+
+    @property
+    def costs(self):
+        """ (array) patients' discounted costs (including the patients whose periods in states are buffered) """
+        self._add_sojourn_outcomes()
+        return self._costs[:self.nPatients]
+
+    @property
+    def utilities(self):
+        """ (array) patients' discounted utilities (including the patients whose periods in states are buffered) """
+        self._add_sojourn_outcomes()
+        return self._utilities[:self.nPatients]
+
+    @property
+    def occupancy(self):
+        """ (array) discounted time patients spent in each state (patients x states) """
+        if not self.ifOccupancy:
+            raise ValueError('The occupancy of states is only stored if the cohort is created with if_occupancy=True.')
+        self._add_sojourn_outcomes()
+        return self._occupancy[:self.nPatients]
+
+    def reprice(self, annual_state_costs, annual_state_utilities, annual_treatment_cost=0):
+        """ calculates the discounted cost and utility of the simulated patients with other costs and utilities
+        (the patients' paths and the discount rate stay the same)
+        :param annual_state_costs: (array) annual cost of each state (number of states), or of each state in
+                                   each scenario or parameter draw (number of draws x number of states)
+        :param annual_state_utilities: (array) annual utility of each state (the same shape as annual_state_costs)
+        :param annual_treatment_cost: annual treatment cost (a number, or an array of size number of draws)
+        :return: (costs, utilities) arrays of size number of patients (or number of patients x number of draws)
+        """
+
+        annual_costs = np.asarray(annual_state_costs, dtype=float)
+        annual_costs = annual_costs + np.reshape(annual_treatment_cost, (-1, 1) if annual_costs.ndim == 2 else ())
+        occupancy = self.occupancy
+
+        return occupancy @ annual_costs.T, occupancy @ np.asarray(annual_state_utilities, dtype=float).T
+
+    def reprice_means(self, annual_state_costs, annual_state_utilities, annual_treatment_cost=0):
+        """ calculates the mean discounted cost and utility of the simulated patients with other costs and utilities
+        (without antithetic or control variates)
+        :param annual_state_costs: (array) annual cost of each state (number of states), or of each state in
+                                   each scenario or parameter draw (number of draws x number of states)
+        :param annual_state_utilities: (array) annual utility of each state (the same shape as annual_state_costs)
+        :param annual_treatment_cost: annual treatment cost (a number, or an array of size number of draws)
+        :return: (mean costs, mean utilities) numbers (or arrays of size number of draws)
+        """
+
+        annual_costs = np.asarray(annual_state_costs, dtype=float)
+        annual_costs = annual_costs + np.reshape(annual_treatment_cost, (-1, 1) if annual_costs.ndim == 2 else ())
+        mean_occupancy = self.occupancy.mean(axis=0)
 
+        return mean_occupancy @ annual_costs.T, mean_occupancy @ np.asarray(annual_state_utilities, dtype=float).T
 
     def extract_outcome(self, simulated_patient):
         """ extracts outcomes of a simulated patient
         :param simulated_patient: a simulated patient"""
 
-        # record survival time and time until AIDS
-        if not (simulated_patient.stateMonitor.survivalTime is None):
-            self.survivalTimes.append(simulated_patient.stateMonitor.survivalTime)
-        #if simulated_patient.stateMonitor.nCOVID is not None:
-        self.nTotalCOVID.append(simulated_patient.stateMonitor.nCOVID)
+        i = self.nPatients
+        state_monitor = simulated_patient.stateMonitor
+
+        # record survival time and number of COVID
+        if state_monitor.survivalTime is not None:
+            self._survivalTimes[i] = state_monitor.survivalTime
+            self._ifDied[i] = True
+        self._nTotalCOVID[i] = state_monitor.nCOVID
+
+        # periods in states (discounted cost and utility are calculated for blocks of patients together)
+        self._sojourns.append(patient_index=i - self._nDiscounted, simulated_patient=simulated_patient)
+
+        self.nPatients += 1
+        if self.nPatients - self._nDiscounted == self._bufferSize:
+            self._add_sojourn_outcomes()
+
+    def extract_outcomes(self, survival_times, n_covid, costs, utilities, controls=None, occupancy=None):
+        """ extracts outcomes of a batch of simulated patients
+        :param survival_times: (array) survival times (NaN for patients who did not die)
+        :param n_covid: (array) numbers of COVID
+        :param costs: (array) discounted costs
+        :param utilities: (array) discounted utilities
+        :param controls: (array) control variates (used if the cohort outcomes use a control variate)
+        :param occupancy: (array) discounted time spent in each state (used if the occupancy of states is stored)
+        """
+
+        # (patients extracted one at a time before this batch are discounted first)
+        self._add_sojourn_outcomes()
+
+        batch = slice(self.nPatients, self.nPatients + len(costs))
+        if self.ifControlVariate:
+            self._controls[batch] = controls
+        if self.ifOccupancy:
+            self._occupancy[batch] = occupancy
+
+        self._survivalTimes[batch] = survival_times
+        self._ifDied[batch] = ~np.isnan(survival_times)
+        self._nTotalCOVID[batch] = n_covid
+        self._costs[batch] = costs
+        self._utilities[batch] = utilities
+
+        self.nPatients = batch.stop
+        self._nDiscounted = self.nPatients
 
-        # discounted cost and discounted utility
-        self.costs.append(simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedCost)
-        self.utilities.append(simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedUtility)
+    def _add_sojourn_outcomes(self):
+        """ adds the discounted cost and utility of the buffered patients extracted one at a time """
+
+        block = slice(self._nDiscounted, self.nPatients)
+        self._nDiscounted = self.nPatients
+        if block.start == block.stop:
+            return
+
+        if self.eventHistory is not None:
+            self.eventHistory.append_sojourns(first_index=block.start, sojourns=self._sojourns)
+        costs, utilities, occupancy = self._sojourns.pop_discounted_outcomes(n_patients=block.stop - block.start,
+                                                                            if_occupancy=self.ifOccupancy)
+        self._costs[block] += costs
+        self._utilities[block] += utilities
+        if self.ifOccupancy:
+            self._occupancy[block] += occupancy
+
+    def get_estimator_samples(self, values):
+        """ returns the samples whose mean is the (variance-reduced) estimate of the mean of patients' values
+        :param values: (array) values of the patients extracted so far (e.g. discounted costs)
+        :return: (array) the values averaged over antithetic pairs (if antithetic variates are used) and
+                 corrected by the control variates (if control variates are used)
+        """
+
+        controls = self._controls[:self.nPatients] if self.ifControlVariate else None
+
+        if self.ifAntithetic:
+            n_pairs = len(values) // 2
+            values = values[:2 * n_pairs].reshape(n_pairs, 2).mean(axis=1)
+            if controls is not None:
+                controls = controls[:2 * n_pairs].reshape(n_pairs, 2, -1).mean(axis=1)
+
+        if controls is not None and len(values) > 1:
+            # value - b.(controls - E[controls]) with b that minimizes the variance (the coefficients of the
+            # regression of the values on the controls; controls that do not vary get a coefficient of 0)
+            b = np.linalg.lstsq(controls - controls.mean(axis=0), values - values.mean(), rcond=None)[0]
+            values = values - (controls - self.expectedControl) @ b
+
+        return values
+
+    def get_t_half_length(self, outcome, alpha):
+        """
+        :param outcome: (Outcomes) outcome
+        :param alpha: significance level
+        :return: half-length of the t-confidence interval of the mean of the outcome of the patients extracted so far
+        """
+
+        self._add_sojourn_outcomes()
+
+        if outcome == Outcomes.SURVIVAL_TIME:
+            data = self.survivalTimes
+        elif outcome == Outcomes.NUM_OF_COVID:
+            data = self.nTotalCOVID
+        elif outcome == Outcomes.COST:
+            data = self.get_estimator_samples(self.costs)
+        else:
+            data = self.get_estimator_samples(self.utilities)
+
+        if len(data) < 2:
+            return np.inf
+        return Stat.SummaryStat(name=outcome.name, data=data).get_t_half_length(alpha=alpha)
 
     def calculate_cohort_outcomes(self, initial_pop_size):
         """ calculates the cohort outcomes
         :param initial_pop_size: initial population size
         """
 
-        # calculate mean survival time
-        self.meanSurvivalTime = sum(self.survivalTimes) / len(self.survivalTimes)
-        # calculate mean number of stokes
-        self.meanNumOfCOVID = sum(self.nTotalCOVID)/len(self.nTotalCOVID)
-        self.meanCosts = sum(self.costs)/len(self.costs)
+        start = Inst.get_time() if Inst.ENABLED else None
 
+        self._add_sojourn_outcomes()
+
+        survival_times = self.survivalTimes
 
         # summary statistics
-        self.statSurvivalTime = Stat.SummaryStat(name='Survival time', data=self.survivalTimes)
+        self.statSurvivalTime = Stat.SummaryStat(name='Survival time', data=survival_times)
         self.statNumOfCOVID = Stat.SummaryStat(name='Times of COVID', data=self.nTotalCOVID)
-        self.statCost = Stat.SummaryStat(name='Discounted cost', data=self.costs)
-        self.statUtility = Stat.SummaryStat(name='Discounted utility', data=self.utilities)
+        # (the statistics of cost and utility are calculated from the variance-reduced samples if
+        # antithetic or control variates are used)
+        self.statCost = Stat.SummaryStat(name='Discounted cost', data=self.get_estimator_samples(self.costs))
+        self.statUtility = Stat.SummaryStat(name='Discounted utility', data=self.get_estimator_samples(self.utilities))
+
+        # mean survival time, number of COVID, discounted cost and discounted utility
+        self.meanSurvivalTime = self.statSurvivalTime.get_mean()
+        self.meanNumOfCOVID = self.statNumOfCOVID.get_mean()
+        self.meanCosts = self.statCost.get_mean()
+        self.meanUtilities = self.statUtility.get_mean()
 
         # survival curve
         self.nLivingPatients = Path.PrevalencePathBatchUpdate(
             name='# of living patients',
             initial_size=initial_pop_size,
-            times_of_changes=self.survivalTimes,
-            increments=[-1] * len(self.survivalTimes)
+            times_of_changes=survival_times,
+            increments=np.full(len(survival_times), -1)
         )
 
+        if start is not None:
+            Inst.record_stage(name='CohortOutcomes.calculate_cohort_outcomes', start=start)
 
 
+class StreamingCohortOutcomes:
+    """ outcomes of a cohort that are summarized as patients are simulated (memory does not depend on
+    the population size) """
+
+    def __init__(self, buffer_size=10000, survival_time_bin_width=1):
+        """
+        :param buffer_size: number of patients whose outcomes are buffered before updating the statistics
+        :param survival_time_bin_width: width of the bins of the histogram of survival times
+        """
+
+        # outcomes of the patients that are not yet added to the statistics
+        self._nBuffered = 0
+        self._survivalTimes = np.full(buffer_size, np.nan)
+        self._nTotalCOVID = np.zeros(buffer_size, dtype=int)
+        self._sojourns = _SojournRecords()          # periods in states of the buffered patients
+
+        # histogram of survival times
+        self.survivalTimeHistogram = Streaming.StreamingHistogram(bin_width=survival_time_bin_width)
+        self.nLivingPatients = None     # survival curve (sample path of number of alive patients over time)
+
+        self.statSurvivalTime = Streaming.StreamingStat(name='Survival time')
+        self.statNumOfCOVID = Streaming.StreamingStat(name='Times of COVID')
+        self.statCost = Streaming.StreamingStat(name='Discounted cost')
+        self.statUtility = Streaming.StreamingStat(name='Discounted utility')
+        # covariance of discounted cost and utility (for the variance of net monetary benefits)
+        self.covCostUtility = Streaming.StreamingCovariance(name='Discounted cost and utility')
+
+        self.meanSurvivalTime = None
+        self.meanNumOfCOVID = None
+        self.meanCosts = None
+        self.meanUtilities = None
+
+    @property
+    def nPatients(self):
+        """ number of patients extracted so far """
+        return self.statCost.get_n() + self._nBuffered
+
+    def extract_outcome(self, simulated_patient):
+        """ extracts outcomes of a simulated patient
+        :param simulated_patient: a simulated patient"""
+
+        i = self._nBuffered
+        state_monitor = simulated_patient.stateMonitor
+
+        self._survivalTimes[i] = np.nan if state_monitor.survivalTime is None else state_monitor.survivalTime
+        self._nTotalCOVID[i] = state_monitor.nCOVID
+        self._sojourns.append(patient_index=i, simulated_patient=simulated_patient)
+
+        self._nBuffered += 1
+        if self._nBuffered == len(self._nTotalCOVID):
+            self._flush()
+
+    def extract_outcomes(self, survival_times, n_covid, costs, utilities, controls=None, occupancy=None):
+        """ updates the statistics with the outcomes of a batch of simulated patients
+        :param survival_times: (array) survival times (NaN for patients who did not die)
+        :param n_covid: (array) numbers of COVID
+        :param costs: (array) discounted costs
+        :param utilities: (array) discounted utilities
+        :param controls: (array) control variates (not used)
+        :param occupancy: (array) discounted time spent in each state (not used)
+        """
+
+        survival_times = survival_times[~np.isnan(survival_times)]
+
+        self.statSurvivalTime.record_batch(survival_times)
+        self.survivalTimeHistogram.record_batch(survival_times)
+        self.statNumOfCOVID.record_batch(n_covid)
+        self.statCost.record_batch(costs)
+        self.statUtility.record_batch(utilities)
+        self.covCostUtility.record_batch(costs, utilities)
+
+    def _flush(self):
+        """ adds the buffered outcomes to the statistics """
+
+        n = self._nBuffered
+        self._nBuffered = 0
+        costs, utilities, _ = self._sojourns.pop_discounted_outcomes(n_patients=n)
+        self.extract_outcomes(survival_times=self._survivalTimes[:n],
+                              n_covid=self._nTotalCOVID[:n],
+                              costs=costs,
+                              utilities=utilities)
+
+    def get_t_half_length(self, outcome, alpha):
+        """
+        :param outcome: (Outcomes) outcome
+        :param alpha: significance level
+        :return: half-length of the t-confidence interval of the mean of the outcome of the patients extracted so far
+        """
+
+        self._flush()
+
+        if outcome == Outcomes.SURVIVAL_TIME:
+            stat = self.statSurvivalTime
+        elif outcome == Outcomes.NUM_OF_COVID:
+            stat = self.statNumOfCOVID
+        elif outcome == Outcomes.COST:
+            stat = self.statCost
+        else:
+            stat = self.statUtility
+
+        if stat.get_n() < 2:
+            return np.inf
+        return stat.get_t_half_length(alpha=alpha)
+
+    def calculate_cohort_outcomes(self, initial_pop_size):
+        """ calculates the cohort outcomes
+        :param initial_pop_size: initial population size
+        """
+
+        start = Inst.get_time() if Inst.ENABLED else None
+
+        self._flush()
+
+        self.meanSurvivalTime = self.statSurvivalTime.get_mean()
+        self.meanNumOfCOVID = self.statNumOfCOVID.get_mean()
+        self.meanCosts = self.statCost.get_mean()
+        self.meanUtilities = self.statUtility.get_mean()
+
+        # survival curve (deaths are recorded at the start of the bin they occurred in)
+        counts = self.survivalTimeHistogram.counts
+        if_nonzero = counts > 0
+        self.nLivingPatients = Path.PrevalencePathBatchUpdate(
+            name='# of living patients',
+            initial_size=initial_pop_size,
+            times_of_changes=self.survivalTimeHistogram.get_bin_edges()[:-1][if_nonzero],
+            increments=-counts[if_nonzero]
+        )
+
+        if start is not None:
+            Inst.record_stage(name='StreamingCohortOutcomes.calculate_cohort_outcomes', start=start)
 
@@ -0,0 +1,357 @@
+import copy
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+import CostBenefitEngine as CBA
+import ValueOfInformation as VOI
+from InputData import HealthStates
+
+# scikit-learn is optional (GaussianProcessMetamodel has a numpy implementation) and is only imported when
+# a Gaussian process is fitted (so importing the model modules stays fast)
+_sklearn_gp = None
+
+
+def _get_sklearn_gp():
+    """
+    :return: the module sklearn.gaussian_process (None if scikit-learn is not installed)
+    """
+
+    global _sklearn_gp
+    if _sklearn_gp is None:
+        try:
+            import sklearn.gaussian_process
+            _sklearn_gp = sklearn.gaussian_process
+        except ImportError:
+            _sklearn_gp = False
+
+    return _sklearn_gp or None
+
+
+def get_parameter_names():
+    """
+    :return: (list) names of the columns of the parameter matrix (see get_parameter_matrix)
+    """
+
+    names = ['annual state cost[{}]'.format(s.value) for s in HealthStates]
+    names += ['annual state utility[{}]'.format(s.value) for s in HealthStates]
+    names += ['annual treatment cost']
+    names += ['transition rate[{}, {}]'.format(i.value, j.value) for i in HealthStates for j in HealthStates]
+    return names
+
+
+def get_parameter_matrix(param_sets):
+    """
+    :param param_sets: (list) parameter sets (e.g. MultiCohort.paramSets) or a ParameterBatch
+                       (see ParameterGenerator.get_new_parameter_batch)
+    :return: (array) values of the parameters of each set (parameter sets x parameters, see get_parameter_names)
+    """
+
+    if hasattr(param_sets, 'transRateMatrices'):
+        # a parameter batch stores the values in arrays
+        batch = param_sets
+        return np.column_stack((batch.annualStateCosts, batch.annualStateUtilities, batch.annualTreatmentCosts,
+                                batch.transRateMatrices.reshape(batch.nParamSets, -1)))
+
+    return np.array([np.concatenate((param.annualStateCosts, param.annualStateUtilities,
+                                     [param.annualTreatmentCost], np.ravel(param.transRateMatrix)))
+                     for param in param_sets], dtype=float)
+
+
+class _Metamodel(ABC):
+    """ regression of outcomes on parameter values (the parameters are standardized with the means and standard
+    deviations of the training draws; parameters that do not vary or repeat another parameter are not used) """
+
+    def __init__(self):
+        self.columns = None     # (array) indices of the parameters used
+        self.means = None       # means of the parameters used in the training draws
+        self.stDevs = None      # standard deviations of the parameters used in the training draws
+        self.nOutcomes = 0
+        self.cvRMSE = None      # (array) cross-validated root mean squared error of each outcome
+        self.cvR2 = None        # (array) cross-validated coefficient of determination of each outcome
+
+    def fit(self, params, outcomes, n_folds=5, seed=0):
+        """ fits the metamodel to the training draws (and calculates its cross-validated error)
+        :param params: (array) values of the parameters of each draw (draws x parameters)
+        :param outcomes: (array) outcomes of each draw (draws x outcomes, or a vector for one outcome)
+        :param n_folds: number of folds of the cross-validation (0 to not calculate the validation error)
+        :param seed: seed of the random assignment of draws to folds
+        :return: the fitted metamodel
+        """
+
+        params = np.asarray(params, dtype=float).reshape(len(params), -1)
+        outcomes = np.asarray(outcomes, dtype=float).reshape(len(params), -1)
+
+        if n_folds > 1:
+            self.cvRMSE, self.cvR2 = self.cross_validate(params=params, outcomes=outcomes,
+                                                         n_folds=n_folds, seed=seed)
+
+        # parameters that vary and do not repeat another parameter
+        if_used = np.ptp(params, axis=0) > 0
+        for j in range(params.shape[1]):
+            if if_used[j] and any(np.array_equal(params[:, j], params[:, k]) for k in np.flatnonzero(if_used[:j])):
+                if_used[j] = False
+        self.columns = np.flatnonzero(if_used)
+        self.means = params[:, self.columns].mean(axis=0)
+        self.stDevs = params[:, self.columns].std(axis=0)
+        self.nOutcomes = outcomes.shape[1]
+
+        self._fit(x=self._standardize(params), outcomes=outcomes)
+
+        return self
+
+    def predict(self, params):
+        """
+        :param params: (array) values of the parameters of each draw (draws x parameters, or a vector for one draw)
+        :return: (array) predicted outcomes of each draw (draws x outcomes, or a vector for one draw)
+        """
+
+        params = np.asarray(params, dtype=float)
+        predictions = self._predict(x=self._standardize(params.reshape(-1, params.shape[-1])))
+        return predictions[0] if params.ndim == 1 else predictions
+
+    def cross_validate(self, params, outcomes, n_folds=5, seed=0):
+        """ k-fold cross-validation of the metamodel
+        :param params: (array) values of the parameters of each draw (draws x parameters)
+        :param outcomes: (array) outcomes of each draw (draws x outcomes)
+        :param n_folds: number of folds
+        :param seed: seed of the random assignment of draws to folds
+        :return: (root mean squared error, coefficient of determination) arrays of the out-of-fold predictions
+                 of each outcome
+        """
+
+        params = np.asarray(params, dtype=float).reshape(len(params), -1)
+        outcomes = np.asarray(outcomes, dtype=float).reshape(len(params), -1)
+        if n_folds > len(params):
+            raise ValueError('The number of folds ({}) is larger than the number of draws ({}).'.format(
+                n_folds, len(params)))
+
+        folds = np.random.default_rng(seed=seed).permutation(len(params)) % n_folds
+        predictions = np.zeros(outcomes.shape)
+        for k in range(n_folds):
+            model = copy.copy(self).fit(params=params[folds != k], outcomes=outcomes[folds != k], n_folds=0)
+            predictions[folds == k] = model.predict(params[folds == k])
+
+        mse = np.mean((predictions - outcomes) ** 2, axis=0)
+        variances = outcomes.var(axis=0)
+        r2 = np.full(len(mse), np.nan)
+        r2[variances > 0] = 1 - mse[variances > 0] / variances[variances > 0]
+
+        return np.sqrt(mse), r2
+
+    def _standardize(self, params):
+        return (params[:, self.columns] - self.means) / self.stDevs
+
+    @abstractmethod
+    def _fit(self, x, outcomes):
+        """ fits the regression
+        :param x: (array) standardized values of the parameters used (draws x parameters used)
+        :param outcomes: (array) outcomes of each draw (draws x outcomes)
+        """
+        pass
+
+    @abstractmethod
+    def _predict(self, x):
+        """
+        :param x: (array) standardized values of the parameters used (draws x parameters used)
+        :return: (array) predicted outcomes of each draw (draws x outcomes)
+        """
+        pass
+
+
+class PolynomialMetamodel(_Metamodel):
+    """ polynomial regression (with interactions between parameters) fitted by least squares """
+
+    def __init__(self, degree=2, ridge=0):
+        """
+        :param degree: degree of the polynomial
+        :param ridge: ridge penalty of the coefficients (other than the intercept) relative to the number of draws
+        """
+        _Metamodel.__init__(self)
+        self.degree = degree
+        self.ridge = ridge
+        self.coefficients = None    # (array) coefficients of the terms (terms x outcomes)
+
+    def _fit(self, x, outcomes):
+
+        design = VOI.get_polynomial_terms(params=x, degree=self.degree)
+        if self.ridge > 0:
+            # the penalty is added as extra rows of the least squares problem
+            penalty = np.sqrt(self.ridge * len(x)) * np.eye(design.shape[1])[1:]
+            design = np.vstack((design, penalty))
+            outcomes = np.vstack((outcomes, np.zeros((len(penalty), outcomes.shape[1]))))
+
+        self.coefficients = np.linalg.lstsq(design, outcomes, rcond=None)[0]
+
+    def _predict(self, x):
+        return VOI.get_polynomial_terms(params=x, degree=self.degree) @ self.coefficients
+
+
+class GaussianProcessMetamodel(_Metamodel):
+    """ Gaussian process regression with a squared exponential kernel and a noise term (the Monte Carlo error of
+    the outcomes); scikit-learn's GaussianProcessRegressor is used if it is installed, otherwise a numpy
+    implementation with one length scale chosen by maximizing the marginal likelihood over a grid """
+
+    # grids of the length scale (relative to the square root of the number of parameters) and of the noise
+    # variance (relative to the variance of the outcomes) of the numpy implementation
+    LENGTH_SCALES = np.logspace(-1, 1, 9)
+    NOISE_RATIOS = np.logspace(-6, 0, 7)
+
+    def __init__(self, if_sklearn=True):
+        """
+        :param if_sklearn: set to False to use the numpy implementation even if scikit-learn is installed
+        """
+        _Metamodel.__init__(self)
+        self.ifSklearn = if_sklearn
+        self.regressor = None       # (GaussianProcessRegressor) fitted scikit-learn regressor (if used)
+        self.x = None               # standardized parameters of the training draws
+        self.weights = None         # weights of the kernel functions of the training draws (draws x outcomes)
+        self.lengthScale = None
+        self.yMeans = None          # means of the outcomes of the training draws
+        self.yStDevs = None         # standard deviations of the outcomes of the training draws
+
+    def _fit(self, x, outcomes):
+
+        gp = _get_sklearn_gp() if self.ifSklearn else None
+        if gp is not None:
+            kernel = gp.kernels.ConstantKernel() * gp.kernels.RBF(length_scale=np.ones(x.shape[1])) \
+                + gp.kernels.WhiteKernel(noise_level=1e-2)
+            self.regressor = gp.GaussianProcessRegressor(kernel=kernel, normalize_y=True, random_state=0)
+            self.regressor.fit(x, outcomes)
+            return
+        self.regressor = None
+
+        # standardized outcomes
+        self.yMeans = outcomes.mean(axis=0)
+        self.yStDevs = outcomes.std(axis=0)
+        self.yStDevs[self.yStDevs == 0] = 1
+        y = (outcomes - self.yMeans) / self.yStDevs
+
+        # squared distances between training draws
+        sq_norms = np.sum(x ** 2, axis=1)
+        sq_distances = np.maximum(sq_norms[:, None] + sq_norms[None, :] - 2 * x @ x.T, 0)
+
+        # the length scale and the noise with the largest marginal likelihood (summed over outcomes)
+        best_log_likelihood = -np.inf
+        for length_scale in self.LENGTH_SCALES * np.sqrt(max(x.shape[1], 1)):
+            kernel = np.exp(-0.5 * sq_distances / length_scale ** 2)
+            for noise_ratio in self.NOISE_RATIOS:
+                try:
+                    chol = np.linalg.cholesky(kernel + noise_ratio * np.eye(len(x)))
+                except np.linalg.LinAlgError:
+                    continue
+                weights = np.linalg.solve(chol.T, np.linalg.solve(chol, y))
+                log_likelihood = -0.5 * np.sum(y * weights) - y.shape[1] * np.sum(np.log(np.diag(chol)))
+                if log_likelihood > best_log_likelihood:
+                    best_log_likelihood = log_likelihood
+                    self.lengthScale = length_scale
+                    self.weights = weights
+
+        self.x = x
+
+    def _predict(self, x):
+
+        if self.regressor is not None:
+            return self.regressor.predict(x).reshape(len(x), -1)
+
+        sq_distances = np.maximum(np.sum(x ** 2, axis=1)[:, None] + np.sum(self.x ** 2, axis=1)[None, :]
+                                  - 2 * x @ self.x.T, 0)
+        kernel = np.exp(-0.5 * sq_distances / self.lengthScale ** 2)
+        return kernel @ self.weights * self.yStDevs + self.yMeans
+
+
+class CostEffectivenessMetamodel:
+    """ metamodel of the mean cost and QALY of each strategy as functions of the parameters of all strategies
+    (fitted to simulated multi-cohorts, it predicts the outcomes of new parameter sets without simulating them) """
+
+    def __init__(self, metamodel=None):
+        """
+        :param metamodel: an unfitted metamodel (PolynomialMetamodel of degree 2 if not provided)
+        """
+        self.metamodel = PolynomialMetamodel() if metamodel is None else metamodel
+        self.nStrategies = 0
+
+    @staticmethod
+    def from_multi_cohorts(multi_cohorts, metamodel=None, n_folds=5):
+        """
+        :param multi_cohorts: (list) simulated multi-cohorts (one for each strategy, with the same ids)
+        :param metamodel: an unfitted metamodel (PolynomialMetamodel of degree 2 if not provided)
+        :param n_folds: number of folds of the cross-validation (0 to not calculate the validation error)
+        :return: (CostEffectivenessMetamodel) metamodel fitted to the parameter sets and outcomes of the cohorts
+        """
+
+        costs, qalys = CBA.get_outcome_arrays([multi_cohort.multiCohortOutcomes for multi_cohort in multi_cohorts])
+        n_draws = len(costs)
+
+        return CostEffectivenessMetamodel(metamodel=metamodel).fit(
+            list_of_param_sets=[multi_cohort.paramSets[:n_draws] for multi_cohort in multi_cohorts],
+            costs=costs, qalys=qalys, n_folds=n_folds)
+
+    def fit(self, list_of_param_sets, costs, qalys, n_folds=5):
+        """
+        :param list_of_param_sets: (list) parameter sets (or ParameterBatch) of each strategy
+        :param costs: (array) mean cost of each draw under each strategy (draws x strategies)
+        :param qalys: (array) mean QALY of each draw under each strategy (draws x strategies)
+        :param n_folds: number of folds of the cross-validation (0 to not calculate the validation error)
+        :return: the fitted metamodel
+        """
+
+        self.nStrategies = len(list_of_param_sets)
+        self.metamodel.fit(params=self.get_parameter_matrix(list_of_param_sets),
+                           outcomes=np.column_stack((costs, qalys)), n_folds=n_folds)
+        return self
+
+    @staticmethod
+    def get_parameter_matrix(list_of_param_sets):
+        """
+        :param list_of_param_sets: (list) parameter sets (or ParameterBatch) of each strategy
+        :return: (array) values of the parameters of all strategies (draws x parameters)
+        """
+        return np.column_stack([get_parameter_matrix(param_sets) for param_sets in list_of_param_sets])
+
+    def predict(self, list_of_param_sets):
+        """
+        :param list_of_param_sets: (list) parameter sets (or ParameterBatch) of each strategy
+        :return: (costs, qalys) predicted mean costs and QALYs of each draw under each strategy (draws x strategies)
+        """
+        return self.predict_from_matrix(params=self.get_parameter_matrix(list_of_param_sets))
+
+    def predict_from_matrix(self, params):
+        """
+        :param params: (array) values of the parameters of all strategies (draws x parameters, see
+                       get_parameter_matrix); parameter sweeps can change columns of this matrix directly
+        :return: (costs, qalys) predicted mean costs and QALYs of each draw under each strategy (draws x strategies)
+        """
+        predictions = self.metamodel.predict(np.asarray(params, dtype=float).reshape(-1, np.shape(params)[-1]))
+        return predictions[:, :self.nStrategies], predictions[:, self.nStrategies:]
+
+    def get_cost_benefit_analysis(self, list_of_param_sets, strategy_names, wtps, ref_index=0):
+        """
+        :param list_of_param_sets: (list) parameter sets (or ParameterBatch) of each strategy
+        :param strategy_names: (list) names of the strategies
+        :param wtps: (array) willingness-to-pay values
+        :param ref_index: index of the reference strategy
+        :return: (CostBenefitEngine.CostBenefitAnalysis) cost-benefit analysis of the predicted outcomes
+        """
+
+        costs, qalys = self.predict(list_of_param_sets=list_of_param_sets)
+        return CBA.CostBenefitAnalysis(strategy_names=strategy_names, costs=costs, qalys=qalys, wtps=wtps,
+                                       ref_index=ref_index)
+
+    def get_validation_table(self, strategy_names):
+        """
+        :param strategy_names: (list) names of the strategies
+        :return: (list) of rows (dictionaries) with the cross-validated error of each outcome
+        """
+
+        if self.metamodel.cvRMSE is None:
+            raise ValueError('The metamodel was fitted without cross-validation.')
+
+        rows = []
+        for i, (outcome, name) in enumerate([(outcome, name) for outcome in ('cost', 'QALY')
+                                             for name in strategy_names]):
+            rows.append({'outcome': 'mean {} ({})'.format(outcome, name),
+                         'RMSE': float(self.metamodel.cvRMSE[i]),
+                         'R2': float(self.metamodel.cvR2[i])})
+
+        return rows
@@ -1,23 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
+import AnalyticEngine as Analytic
+import InputData as Data
+import Instrumentation as Inst
 import SimPy.Statistics as Stat
-from MarkovModelClasses import Cohort
-from ProbilisticParamClasses import ParameterGenerator
+import SurvivalCurveClasses as Curves
+from CheckpointClasses import CheckpointStore
+from MarkovModelClasses import Cohort, Engines, ExpectedValueCohort, ExpectedCohortOutcomes, Outcomes, \
+    StreamingCohortOutcomes
+from ProbilisticParamClasses import ParameterGenerator, Therapies
 
 
 class MultiCohort:
     """ simulates multiple cohorts with different parameters """
 
-    def __init__(self, ids, pop_size, therapy):
+    def __init__(self, ids, pop_size, therapy, engine=Engines.PATIENT, curve_time_step=1,
+                 if_batch_sampling=False):
         """
         :param ids: (list) of ids for cohorts to simulate
         :param pop_size: (int) population size of cohorts to simulate
         :param therapy: selected therapy
+        :param engine: (Engines) engine to simulate cohorts with (Engines.EXPECTED_VALUE calculates
+                       the expected outcomes of each parameter set without Monte Carlo)
+        :param curve_time_step: time step of the grid the survival curves are calculated on
+        :param if_batch_sampling: set to True to sample all parameter sets at once (from a single
+                                  random number stream rather than one stream per parameter set seeded by
+                                  the cohort id, so the parameter sets depend on the whole list of ids)
         """
         self.ids = ids
         self.popSize = pop_size
         self.therapy = therapy
+        self.engine = engine
+        self.curveTimeStep = curve_time_step
+        self.ifBatchSampling = if_batch_sampling
         self.paramSets = []  # list of parameter sets each of which corresponds to a cohort
+        self.nCohortsSimulated = 0  # number of cohorts simulated (less than the number of ids if the target
+                                    # precision was reached first)
         self.multiCohortOutcomes = MultiCohortOutcomes()
 
     def _populate_parameter_sets(self):
@@ -25,41 +45,310 @@ class MultiCohort:
         # create a parameter set generator
         param_generator = ParameterGenerator(therapy=self.therapy)
 
+        if self.ifBatchSampling:
+            # sample all parameter sets together
+            batch = param_generator.get_new_parameter_batch(n=len(self.ids), rng=np.random.default_rng(seed=0))
+            self.paramSets = [batch.get_parameters(i) for i in range(len(self.ids))]
+            return
+
         # create as many sets of parameters as the number of cohorts
-        for i in range(len(self.ids)):
-            # create a new random number generator for each parameter set
-            rng = np.random.RandomState(seed=i)
+        for cohort_id in self.ids:
+            # create a new random number generator for each parameter set (seeded by the cohort id, so the
+            # parameters of a cohort do not depend on the other ids)
+            rng = np.random.RandomState(seed=cohort_id)
             # get and store a new set of parameter
             self.paramSets.append(param_generator.get_new_parameters(rng=rng))
 
-    def simulate(self, sim_length):
+    def simulate(self, sim_length, n_workers=1, checkpoint_file=None,
+                 target_half_width=None, outcome=Outcomes.COST, alpha=Data.ALPHA, batch_size=10):
         """ simulates all cohorts
         :param sim_length: simulation length
+        :param n_workers: number of processes to simulate the cohorts with (1 to simulate them in
+                          this process); the outcomes do not depend on the number of processes
+        :param checkpoint_file: name of a file to store the summary of each cohort as soon as it is
+                                simulated; if the file exists, the cohorts stored in it are not simulated again
+        :param target_half_width: if provided, cohorts are simulated in batches (in the order of ids) until the
+                                  half-width of the t-confidence interval of the mean of the cohorts' average outcome
+                                  is not above this value (or all cohorts are simulated)
+        :param outcome: (Outcomes) outcome whose precision is targeted
+        :param alpha: significance level of the confidence interval
+        :param batch_size: number of cohorts simulated between checks of the precision
         """
 
+        start = Inst.get_time() if Inst.ENABLED else None
+
         # create parameter sets
         self._populate_parameter_sets()
 
-        for i in range(len(self.ids)):
-            # create a cohort
-            cohort = Cohort(id=self.ids[i],
-                            pop_size=self.popSize,
-                            parameters=self.paramSets[i])
+        if start is not None:
+            Inst.record_stage(name='MultiCohort._populate_parameter_sets', start=start)
+
+        # time grid of the survival curves
+        time_grid = Curves.get_time_grid(sim_length=sim_length, time_step=self.curveTimeStep)
 
-            # simulate the cohort
-            cohort.simulate(sim_length=sim_length)
+        # summaries of the cohorts simulated by earlier runs
+        store = None
+        stored_summaries = {}
+        if checkpoint_file is not None:
+            run_settings = {'therapy': self.therapy.name,
+                            'pop size': self.popSize,
+                            'engine': self.engine.name,
+                            'sim length': sim_length,
+                            'curve time step': self.curveTimeStep,
+                            'batch sampling': self.ifBatchSampling}
+            if self.ifBatchSampling:
+                # parameter sets sampled together depend on the position of the cohort in ids
+                run_settings['ids'] = [int(cohort_id) for cohort_id in self.ids]
+            store = CheckpointStore(file_name=checkpoint_file, run_settings=run_settings)
+            stored_ids = set(store.get_completed_ids())
+            completed_ids = [cohort_id for cohort_id in self.ids if cohort_id in stored_ids]
+            stored_summaries = dict(zip(completed_ids, store.load_summaries(ids=completed_ids)))
 
-            # extract the outcomes of this simulated cohort
-            self.multiCohortOutcomes.extract_outcomes(simulated_cohort=cohort)
+        # simulate all cohorts together unless a target precision is provided
+        if target_half_width is None:
+            batch_size = max(1, len(self.ids))
+
+        executor = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
+        try:
+            self.nCohortsSimulated = 0
+            while self.nCohortsSimulated < len(self.ids):
+                indices = range(self.nCohortsSimulated, min(self.nCohortsSimulated + batch_size, len(self.ids)))
+                self._simulate_batch(indices=indices, sim_length=sim_length, time_grid=time_grid,
+                                     executor=executor, n_workers=n_workers,
+                                     store=store, stored_summaries=stored_summaries)
+                self.nCohortsSimulated = indices.stop
+
+                # stop if the target precision is reached
+                if target_half_width is not None and \
+                        self.multiCohortOutcomes.get_t_half_length(outcome=outcome, alpha=alpha) <= target_half_width:
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if store is not None:
+                store.close()
 
         # calculate the summary statistics of outcomes from all cohorts
         self.multiCohortOutcomes.calculate_summary_stats()
 
+        if start is not None:
+            Inst.record_stage(name='MultiCohort.simulate', start=start)
+
+    def _simulate_batch(self, indices, sim_length, time_grid, executor, n_workers, store, stored_summaries):
+        """ simulates a batch of cohorts and extracts their summaries (in the order of ids)
+        :param indices: (range) indices of the cohorts
+        :param sim_length: simulation length
+        :param time_grid: (array) time points to calculate the survival curves at
+        :param executor: (ProcessPoolExecutor) pool of processes to simulate the cohorts with or None
+        :param n_workers: number of processes of the pool
+        :param store: (CheckpointStore) checkpoint store to save the summaries in or None
+        :param stored_summaries: (dictionary) summaries of cohorts simulated by earlier runs (by cohort id)
+        """
+
+        # cohorts not simulated by earlier runs
+        new_indices = [i for i in indices if self.ids[i] not in stored_summaries]
+        n_cohorts = len(new_indices)
+        args = ([self.ids[i] for i in new_indices], [self.popSize] * n_cohorts,
+                [self.paramSets[i] for i in new_indices],
+                [self.engine] * n_cohorts, [sim_length] * n_cohorts, [time_grid] * n_cohorts)
+
+        if executor is not None and n_cohorts > 0:
+            # simulate the cohorts in a pool of processes (the summaries are returned in the order of ids)
+            summaries = executor.map(simulate_cohort, *args,
+                                     chunksize=max(1, n_cohorts // (4 * n_workers)))
+        else:
+            summaries = map(simulate_cohort, *args)
+
+        new_summaries = {}
+        for i, summary in zip(new_indices, summaries):
+            # store each summary as soon as it is available
+            if store is not None:
+                store.save(cohort_summary=summary, parameters=self.paramSets[i])
+            new_summaries[i] = summary
+
+        for i in indices:
+            summary = new_summaries[i] if i in new_summaries else stored_summaries[self.ids[i]]
+            self.multiCohortOutcomes.extract_summary(cohort_summary=summary)
+
+
+class PairedMultiCohort:
+    """ simulates multiple cohorts under two therapies with common random numbers (cohort i of both arms has the
+    same id, and so the same patient random number streams, and the same sampled costs and utilities) """
+
+    def __init__(self, ids, pop_size, therapy_ref=Therapies.WITHOUT, therapy=Therapies.WITH,
+                 engine=Engines.PATIENT, curve_time_step=1):
+        """
+        :param ids: (list) of ids for cohorts to simulate (shared by both arms)
+        :param pop_size: (int) population size of cohorts to simulate
+        :param therapy_ref: reference therapy
+        :param therapy: new therapy
+        :param engine: (Engines) engine to simulate cohorts with
+        :param curve_time_step: time step of the grid the survival curves are calculated on
+        """
+        self.ids = ids
+        self.multiCohortRef = MultiCohort(ids=ids, pop_size=pop_size, therapy=therapy_ref, engine=engine,
+                                          curve_time_step=curve_time_step)
+        self.multiCohort = MultiCohort(ids=ids, pop_size=pop_size, therapy=therapy, engine=engine,
+                                       curve_time_step=curve_time_step)
+        self.nCohortsSimulated = 0
+        self.pairedOutcomes = None  # (PairedMultiCohortOutcomes) incremental outcomes of the new therapy
+
+    def simulate(self, sim_length, n_workers=1, target_half_width=None, wtp=0, alpha=Data.ALPHA, batch_size=10):
+        """ simulates the cohorts of both arms
+        :param sim_length: simulation length
+        :param n_workers: number of processes to simulate the cohorts with
+        :param target_half_width: if provided, cohorts are simulated in batches (in both arms) until the half-width
+                                  of the t-confidence interval of the mean incremental net monetary benefit is
+                                  not above this value (or all cohorts are simulated)
+        :param wtp: willingness-to-pay for one unit of utility (to calculate the net monetary benefit)
+        :param alpha: significance level of the confidence interval
+        :param batch_size: number of cohorts simulated between checks of the precision
+        """
+
+        arms = (self.multiCohortRef, self.multiCohort)
+        for multi_cohort in arms:
+            multi_cohort._populate_parameter_sets()
+
+        time_grid = Curves.get_time_grid(sim_length=sim_length, time_step=self.multiCohort.curveTimeStep)
+
+        # simulate all cohorts together unless a target precision is provided
+        if target_half_width is None:
+            batch_size = max(1, len(self.ids))
+
+        executor = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
+        try:
+            self.nCohortsSimulated = 0
+            while self.nCohortsSimulated < len(self.ids):
+                indices = range(self.nCohortsSimulated, min(self.nCohortsSimulated + batch_size, len(self.ids)))
+                for multi_cohort in arms:
+                    multi_cohort._simulate_batch(indices=indices, sim_length=sim_length, time_grid=time_grid,
+                                                 executor=executor, n_workers=n_workers,
+                                                 store=None, stored_summaries={})
+                    multi_cohort.nCohortsSimulated = indices.stop
+                self.nCohortsSimulated = indices.stop
+
+                # stop if the target precision is reached
+                if target_half_width is not None:
+                    paired_outcomes = PairedMultiCohortOutcomes(outcomes_ref=self.multiCohortRef.multiCohortOutcomes,
+                                                                outcomes=self.multiCohort.multiCohortOutcomes)
+                    nmb_stat = paired_outcomes.get_incremental_nmb_stat(wtp=wtp)
+                    if self.nCohortsSimulated > 1 and nmb_stat.get_t_half_length(alpha) <= target_half_width:
+                        break
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        for multi_cohort in arms:
+            multi_cohort.multiCohortOutcomes.calculate_summary_stats()
+
+        self.pairedOutcomes = PairedMultiCohortOutcomes(outcomes_ref=self.multiCohortRef.multiCohortOutcomes,
+                                                        outcomes=self.multiCohort.multiCohortOutcomes)
+
+
+class PairedMultiCohortOutcomes:
+    """ incremental outcomes of cohorts simulated under two therapies with common random numbers """
+
+    def __init__(self, outcomes_ref, outcomes):
+        """
+        :param outcomes_ref: (MultiCohortOutcomes) outcomes under the reference therapy
+        :param outcomes: (MultiCohortOutcomes) outcomes of the same cohorts under the new therapy
+        """
+
+        self.incrementalSurvivalTimes = np.array(outcomes.meanSurvivalTimes) - np.array(outcomes_ref.meanSurvivalTimes)
+        self.incrementalCosts = np.array(outcomes.meanCosts) - np.array(outcomes_ref.meanCosts)
+        self.incrementalQALYs = np.array(outcomes.meanQALYs) - np.array(outcomes_ref.meanQALYs)
+
+        self.statIncrementalSurvivalTime = Stat.SummaryStat(name='Increase in mean survival time',
+                                                            data=self.incrementalSurvivalTimes)
+        self.statIncrementalCost = Stat.SummaryStat(name='Increase in mean discounted cost',
+                                                    data=self.incrementalCosts)
+        self.statIncrementalQALY = Stat.SummaryStat(name='Increase in mean discounted QALY',
+                                                    data=self.incrementalQALYs)
+
+    def get_incremental_nmb_stat(self, wtp):
+        """
+        :param wtp: willingness-to-pay for one QALY
+        :return: summary statistics of the incremental net monetary benefit at this willingness-to-pay
+        """
+        return Stat.SummaryStat(name='Incremental net monetary benefit',
+                                data=wtp * self.incrementalQALYs - self.incrementalCosts)
+
+
+def simulate_cohort(cohort_id, pop_size, parameters, engine, sim_length, time_grid):
+    """ simulates a cohort (this is the task sent to the processes that simulate cohorts in parallel)
+    :param cohort_id: cohort ID
+    :param pop_size: population size of the cohort
+    :param parameters: parameters
+    :param engine: (Engines) engine to simulate the cohort with
+    :param sim_length: simulation length
+    :param time_grid: (array) time points to calculate the survival curve at
+    :return: (CohortSummary) summary of the outcomes of the simulated cohort
+    (when cohorts are simulated in a pool of processes, the instrumentation of the processes is not reported)
+    """
+
+    start = Inst.get_time() if Inst.ENABLED else None
+
+    # create a cohort
+    if engine == Engines.EXPECTED_VALUE:
+        cohort = ExpectedValueCohort(id=cohort_id,
+                                     pop_size=pop_size,
+                                     parameters=parameters)
+    else:
+        cohort = Cohort(id=cohort_id,
+                        pop_size=pop_size,
+                        parameters=parameters,
+                        engine=engine)
+
+    # simulate the cohort
+    cohort.simulate(sim_length=sim_length)
+    summary = CohortSummary(simulated_cohort=cohort, time_grid=time_grid)
+
+    if start is not None:
+        Inst.record_stage(name='MultiCohort cohort', start=start)
+
+    return summary
+
+
+class CohortSummary:
+    """ compact outcomes of a simulated cohort (means and the survival curve on a time grid) """
+
+    def __init__(self, simulated_cohort, time_grid):
+        """
+        :param simulated_cohort: a cohort after being simulated
+        :param time_grid: (array) time points to calculate the survival curve at
+        """
+
+        outcomes = simulated_cohort.cohortOutcomes
+
+        self.id = simulated_cohort.id
+        self.popSize = simulated_cohort.popSize
+        self.meanSurvivalTime = outcomes.meanSurvivalTime
+        self.meanNumOfCOVID = outcomes.meanNumOfCOVID
+        self.meanCost = outcomes.meanCosts
+        self.meanUtility = outcomes.meanUtilities
+
+        # survival curve
+        if isinstance(outcomes, ExpectedCohortOutcomes):
+            probs = Analytic.get_expected_survival_curve(parameters=simulated_cohort.params,
+                                                         time_grid=time_grid)
+            self.survivalCurve = Curves.SurvivalCurve(time_grid=time_grid, n_alive=self.popSize * probs)
+        elif isinstance(outcomes, StreamingCohortOutcomes):
+            self.survivalCurve = Curves.SurvivalCurve.from_histogram(
+                histogram=outcomes.survivalTimeHistogram,
+                initial_size=self.popSize,
+                time_grid=time_grid)
+        else:
+            self.survivalCurve = Curves.SurvivalCurve.from_death_times(
+                death_times=outcomes.survivalTimes,
+                initial_size=self.popSize,
+                time_grid=time_grid)
+
 
 class MultiCohortOutcomes:
     def __init__(self):
 
-        self.survivalCurves = []  # list of survival curves from all simulated cohorts
+        self.survivalCurves = []  # list of survival curves (on the same time grid) from all simulated cohorts
+        self.survivalCurveBands = None  # survival curves of all cohorts stacked in a 2D array
 
         self.meanSurvivalTimes = []  # list of average patient survival time from each simulated cohort
         self.meanNumOfCOVID = []     # list of average patient time until AIDS from each simulated cohort
@@ -71,27 +360,59 @@ class MultiCohortOutcomes:
         self.statMeanCost = None            # summary statistics of average cost
         self.statMeanQALY = None            # summary statistics of average QALY
 
-    def extract_outcomes(self, simulated_cohort):
+    def extract_outcomes(self, simulated_cohort, time_grid):
         """ extracts outcomes of a simulated cohort
-        :param simulated_cohort: a cohort after being simulated"""
+        :param simulated_cohort: a cohort after being simulated
+        :param time_grid: (array) time points to calculate the survival curve at"""
+
+        self.extract_summary(cohort_summary=CohortSummary(simulated_cohort=simulated_cohort,
+                                                          time_grid=time_grid))
+
+    def extract_summary(self, cohort_summary):
+        """ extracts outcomes from the summary of a simulated cohort
+        :param cohort_summary: (CohortSummary) summary of a simulated cohort"""
 
         # append the survival curve of this cohort
-        self.survivalCurves.append(simulated_cohort.cohortOutcomes.nLivingPatients)
+        self.survivalCurves.append(cohort_summary.survivalCurve)
 
         # store mean survival time from this cohort
-        self.meanSurvivalTimes.append(simulated_cohort.cohortOutcomes.statSurvivalTime.get_mean())
+        self.meanSurvivalTimes.append(cohort_summary.meanSurvivalTime)
         # store mean times of covid from this cohort
-        self.meanNumOfCOVID.append(simulated_cohort.cohortOutcomes.statNumOfCOVID.get_mean())
+        self.meanNumOfCOVID.append(cohort_summary.meanNumOfCOVID)
         # store mean cost from this cohort
-        self.meanCosts.append(simulated_cohort.cohortOutcomes.statCost.get_mean())
+        self.meanCosts.append(cohort_summary.meanCost)
         # store mean QALY from this cohort
-        self.meanQALYs.append(simulated_cohort.cohortOutcomes.statUtility.get_mean())
+        self.meanQALYs.append(cohort_summary.meanUtility)
+
+    def get_t_half_length(self, outcome, alpha):
+        """
+        :param outcome: (Outcomes) outcome
+        :param alpha: significance level
+        :return: half-length of the t-confidence interval of the mean of the average outcome of the cohorts
+                 extracted so far
+        """
+
+        if outcome == Outcomes.SURVIVAL_TIME:
+            data = self.meanSurvivalTimes
+        elif outcome == Outcomes.NUM_OF_COVID:
+            data = self.meanNumOfCOVID
+        elif outcome == Outcomes.COST:
+            data = self.meanCosts
+        else:
+            data = self.meanQALYs
+
+        if len(data) < 2:
+            return np.inf
+        return Stat.SummaryStat(name=outcome.name, data=np.array(data)).get_t_half_length(alpha=alpha)
 
     def calculate_summary_stats(self):
         """
         calculate the summary statistics
         """
 
+        # survival curves of all cohorts
+        self.survivalCurveBands = Curves.SurvivalCurveBands(survival_curves=self.survivalCurves)
+
         # summary statistics of mean survival time
         self.statMeanSurvivalTime = Stat.SummaryStat(name='Average survival time',
                                                      data=self.meanSurvivalTimes)
@@ -1,8 +1,11 @@
+import numpy as np
+
+import CostBenefitEngine as CBA
 import InputData as D
-import SimPy.EconEval as Econ
-import SimPy.Plots.Histogram as Hist
-import SimPy.Plots.SamplePaths as Path
+import MetamodelClasses as Meta
+import PlotSupport as Plots
 import SimPy.Statistics as Stat
+import ValueOfInformation as VOI
 
 
 def print_outcomes(multi_cohort_outcomes, therapy_name):
@@ -54,15 +57,13 @@ def plot_survival_curves_and_histograms(multi_cohort_outcomes_without, multi_coh
     :param multi_cohort_outcomes_combo: outcomes of a multi-cohort simulated under combination therapy
     """
 
-    # get survival curves of both treatments
-    sets_of_survival_curves = [
-        multi_cohort_outcomes_without.survivalCurves,
-        multi_cohort_outcomes_with.survivalCurves
-    ]
+    # no figures in headless mode
+    if not Plots.if_plotting():
+        return
 
-    # graph survival curve
-    Path.plot_sets_of_sample_paths(
-        sets_of_sample_paths=sets_of_survival_curves,
+    # graph the median and the uncertainty band of the survival curves of both treatments
+    plot_survival_curve_bands(
+        list_of_multi_cohort_outcomes=[multi_cohort_outcomes_without, multi_cohort_outcomes_with],
         title='Survival Curves',
         x_label='Simulation Time Step (year)',
         y_label='Number of Patients Alive',
@@ -78,6 +79,7 @@ def plot_survival_curves_and_histograms(multi_cohort_outcomes_without, multi_coh
     ]
 
     # graph histograms
+    Hist = Plots.import_module('SimPy.Plots.Histogram')
     Hist.plot_histograms(
         data_sets=set_of_survival_times,
         title='Histograms of Average Patient Survival Time',
@@ -89,6 +91,36 @@ def plot_survival_curves_and_histograms(multi_cohort_outcomes_without, multi_coh
         color_codes=['green', 'blue'],
         transparency=0.5
     )
+    Plots.save(title='Histograms of Average Patient Survival Time')
+
+
+def plot_survival_curve_bands(list_of_multi_cohort_outcomes, title, x_label, y_label,
+                              legends, color_codes, transparency=0.4):
+    """ plots the median survival curve and the {1-ALPHA} percentile band of the survival curves
+    of each multi-cohort
+    :param list_of_multi_cohort_outcomes: (list) of outcomes of simulated multi-cohorts
+    :param legends: (list) of legends (one for each multi-cohort)
+    :param color_codes: (list) of colors (one for each multi-cohort)
+    :param transparency: transparency of the percentile bands
+    """
+
+    # no figures in headless mode
+    if not Plots.if_plotting():
+        return
+
+    fig, ax = Plots.get_pyplot().subplots()
+    for outcomes, legend, color in zip(list_of_multi_cohort_outcomes, legends, color_codes):
+        bands = outcomes.survivalCurveBands
+        lower, upper = bands.get_percentile_interval(alpha=D.ALPHA)
+        ax.fill_between(bands.timeGrid, lower, upper, color=color, alpha=transparency, linewidth=0)
+        ax.plot(bands.timeGrid, bands.get_median(), color=color, label=legend)
+
+    ax.set_title(title)
+    ax.set_xlabel(x_label)
+    ax.set_ylabel(y_label)
+    ax.set_ylim(bottom=0)
+    ax.legend()
+    Plots.show(title=title)
 
 
 def print_comparative_outcomes(multi_cohort_outcomes_without, multi_cohort_outcomes_with):
@@ -142,12 +174,19 @@ def print_comparative_outcomes(multi_cohort_outcomes_without, multi_cohort_outco
           estimate_PI)
 
 
-def report_CEA_CBA(multi_cohort_outcomes_without, multi_cohort_outcomes_with):
+def report_CEA_CBA(multi_cohort_outcomes_without, multi_cohort_outcomes_with,
+                   wtp_range=(-10000, 10000), n_wtps=2001, file_name=None):
     """ performs cost-effectiveness and cost-benefit analyses
-    :param multi_cohort_outcomes_mono: outcomes of a multi-cohort simulated under mono therapy
-    :param multi_cohort_outcomes_combo: outcomes of a multi-cohort simulated under combination therapy
+    :param multi_cohort_outcomes_without: outcomes of a multi-cohort simulated without vaccine
+    :param multi_cohort_outcomes_with: outcomes of a multi-cohort simulated with vaccine (with the same ids)
+    :param wtp_range: range of willingness-to-pay values of the cost-benefit analysis
+    :param n_wtps: number of willingness-to-pay values of the cost-benefit analysis
+    :param file_name: csv file to export the results of the cost-benefit analysis to (None to not export them)
+    :return: (CostBenefitEngine.CostBenefitAnalysis) results of the cost-benefit analysis
     """
 
+    Econ = Plots.import_module('SimPy.EconEval')
+
     # define two strategies
     without_therapy_strategy = Econ.Strategy(
         name='Without Vaccine',
@@ -169,13 +208,15 @@ def report_CEA_CBA(multi_cohort_outcomes_without, multi_cohort_outcomes_with):
     )
 
     # show the cost-effectiveness plane
-    CEA.plot_CE_plane(
-        title='Cost-Effectiveness Analysis',
-        x_label='Additional Discounted QALY',
-        y_label='Additional Discounted Cost',
-        fig_size=(6, 5),
-        add_clouds=True,
-        transparency=0.2)
+    if Plots.if_plotting():
+        CEA.plot_CE_plane(
+            title='Cost-Effectiveness Analysis',
+            x_label='Additional Discounted QALY',
+            y_label='Additional Discounted Cost',
+            fig_size=(6, 5),
+            add_clouds=True,
+            transparency=0.2)
+        Plots.save(title='Cost-Effectiveness Analysis')
 
     # report the CE table
     CEA.build_CE_table(
@@ -186,20 +227,107 @@ def report_CEA_CBA(multi_cohort_outcomes_without, multi_cohort_outcomes_with):
         icer_digits=2,
         file_name='CETable.csv')
 
-    # CBA
-    NBA = Econ.CBA(
-        strategies=[without_therapy_strategy, with_therapy_strategy],
-        wtp_range=[-10000, 10000],
-        if_paired=True
-        # wtp_range=[0, 50000],
-        # if_paired=False
+    # CBA (the net monetary benefits of all cohorts, strategies and WTP values are calculated at once)
+    NBA = CBA.CostBenefitAnalysis.from_multi_cohort_outcomes(
+        list_of_multi_cohort_outcomes=[multi_cohort_outcomes_without, multi_cohort_outcomes_with],
+        strategy_names=[without_therapy_strategy.name, with_therapy_strategy.name],
+        wtps=np.linspace(wtp_range[0], wtp_range[1], n_wtps),
+        interval_type='p'
     )
-    # show the net monetary benefit figure
-    NBA.plot_incremental_nmbs(
-        title='Cost-Benefit Analysis',
-        x_label='Willingness-To-Pay for One Additional QALY ($)',
-        y_label='Incremental Net Monetary Benefit ($)',
-        interval_type='p',
-        show_legend=True,
-        figure_size=(6, 5),
-    )
\ No newline at end of file
+    if file_name is not None:
+        NBA.export_to_csv(file_name=file_name)
+
+    # show the incremental net monetary benefit and the acceptability curves
+    if Plots.if_plotting():
+        plot_incremental_nmbs_and_ceac(cost_benefit_analysis=NBA, color_codes=['green', 'blue'])
+
+    return NBA
+
+
+def plot_incremental_nmbs_and_ceac(cost_benefit_analysis, color_codes):
+    """ plots the incremental net monetary benefits (with respect to the reference strategy) and
+    the cost-effectiveness acceptability curves and frontier
+    :param cost_benefit_analysis: (CostBenefitEngine.CostBenefitAnalysis) results of a cost-benefit analysis
+    :param color_codes: (list) of colors (one for each strategy)
+    """
+
+    nba = cost_benefit_analysis
+    fig, (ax_nmb, ax_ceac) = Plots.get_pyplot().subplots(1, 2, figsize=(11, 5))
+
+    for i, (name, color) in enumerate(zip(nba.strategyNames, color_codes)):
+        # incremental net monetary benefit and its interval
+        if i != nba.refIndex:
+            ax_nmb.fill_between(nba.wtps, nba.incrementalNMBsLower[i], nba.incrementalNMBsUpper[i],
+                                color=color, alpha=0.2, linewidth=0)
+            ax_nmb.plot(nba.wtps, nba.incrementalNMBs[i], color=color, label=name)
+        # acceptability curve
+        ax_ceac.plot(nba.wtps, nba.ceac[i], color=color, label=name)
+
+    # acceptability frontier
+    ax_ceac.plot(nba.wtps, nba.ceaf, color='black', linestyle=':', linewidth=2.5, label='Frontier')
+
+    ax_nmb.axhline(0, color='black', linewidth=0.5)
+    ax_nmb.set_title('Cost-Benefit Analysis')
+    ax_nmb.set_xlabel('Willingness-To-Pay for One Additional QALY ($)')
+    ax_nmb.set_ylabel('Incremental Net Monetary Benefit ($)')
+    ax_nmb.legend()
+
+    ax_ceac.set_title('Cost-Effectiveness Acceptability')
+    ax_ceac.set_xlabel('Willingness-To-Pay for One Additional QALY ($)')
+    ax_ceac.set_ylabel('Probability of Being the Optimal Strategy')
+    ax_ceac.set_ylim(-0.02, 1.02)
+    ax_ceac.legend()
+
+    Plots.show(title='Cost-Benefit Analysis')
+
+
+def report_VOI(multi_cohort_without, multi_cohort_with, wtp_range=(0, 10000), n_wtps=201):
+    """ plots the expected value of perfect information and the expected value of partial perfect information
+    of each group of sampled parameters over a range of willingness-to-pay values
+    :param multi_cohort_without: multi-cohort simulated without vaccine
+    :param multi_cohort_with: multi-cohort simulated with vaccine (with the same ids)
+    :param wtp_range: range of willingness-to-pay values
+    :param n_wtps: number of willingness-to-pay values
+    :return: (wtps, evpi, evppis) arrays of the plotted curves
+    """
+
+    wtps = np.linspace(wtp_range[0], wtp_range[1], n_wtps)
+    evpi, evppis = VOI.get_multi_cohort_voi(multi_cohorts=[multi_cohort_without, multi_cohort_with], wtps=wtps)
+
+    # only the arrays are returned in headless mode
+    if not Plots.if_plotting():
+        return wtps, evpi, evppis
+
+    fig, ax = Plots.get_pyplot().subplots(figsize=(6, 5))
+    ax.plot(wtps, evpi, color='black', label='EVPI')
+    for name, evppi in evppis.items():
+        ax.plot(wtps, evppi, linestyle='--', label='EVPPI ({})'.format(name))
+    ax.set_title('Value of Information')
+    ax.set_xlabel('Willingness-To-Pay for One Additional QALY ($)')
+    ax.set_ylabel('Expected Value per Patient ($)')
+    ax.set_ylim(bottom=0)
+    ax.legend()
+    Plots.show(title='Value of Information')
+
+    return wtps, evpi, evppis
+
+
+def report_metamodel(multi_cohort_without, multi_cohort_with, metamodel=None, n_folds=5):
+    """ fits a metamodel of the mean cost and QALY of both strategies to the simulated cohorts and prints its
+    cross-validated error
+    :param multi_cohort_without: multi-cohort simulated without vaccine
+    :param multi_cohort_with: multi-cohort simulated with vaccine (with the same ids)
+    :param metamodel: an unfitted metamodel (see MetamodelClasses; a polynomial of degree 2 if not provided)
+    :param n_folds: number of folds of the cross-validation
+    :return: (MetamodelClasses.CostEffectivenessMetamodel) the fitted metamodel
+    """
+
+    ce_metamodel = Meta.CostEffectivenessMetamodel.from_multi_cohorts(
+        multi_cohorts=[multi_cohort_without, multi_cohort_with], metamodel=metamodel, n_folds=n_folds)
+
+    print('Cross-validated error of the metamodel ({}-fold):'.format(n_folds))
+    for row in ce_metamodel.get_validation_table(strategy_names=['Without vaccine', 'With vaccine']):
+        print('  {:<35} RMSE = {:,.4g}, R2 = {:.3f}'.format(row['outcome'], row['RMSE'], row['R2']))
+    print('')
+
+    return ce_metamodel
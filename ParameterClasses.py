@@ -1,8 +1,11 @@
+import hashlib
+from collections import namedtuple
 from enum import Enum
 import numpy as np
 import InputData as Data
 from InputData import HealthStates
 import SimPy.Markov as Markov
+from TransitionSampler import TransitionSampler
 
 class HealthStates(Enum):
     """ health states of patients """
@@ -18,8 +21,51 @@ class Therapies(Enum):
     WITH = 1
 
 
-class Parameters:
-    def __init__(self, therapy):
+class RateMatrixParameters:
+    """ base of parameter sets with a transition rate matrix (the compiled sampler of the matrix is built when
+    first needed and rebuilt after the matrix is replaced) """
+
+    def __init__(self):
+        self._transRateMatrix = []
+        self._sampler = None
+
+    @property
+    def transRateMatrix(self):
+        """ transition rate matrix (replace the whole matrix to change it, so the sampler is rebuilt) """
+        return self._transRateMatrix
+
+    @transRateMatrix.setter
+    def transRateMatrix(self, value):
+        self._transRateMatrix = value
+        self._sampler = None
+
+    def get_sampler(self):
+        """
+        :return: (TransitionSampler) sampler of the transition rate matrix shared by all patients
+        """
+        if self._sampler is None:
+            self._sampler = TransitionSampler(transition_rate_matrix=self._transRateMatrix)
+        return self._sampler
+
+    def freeze(self):
+        """
+        :return: (FrozenParameters) immutable copy of the parameter values
+        """
+        return freeze_parameters(parameters=self)
+
+
+class Parameters(RateMatrixParameters):
+    def __init__(self, therapy, inputs=None):
+        """
+        :param therapy: selected therapy
+        :param inputs: (dictionary) values of the model inputs to change (by name, see InputData.get_inputs);
+                       the values in InputData are used for the other inputs
+        """
+
+        RateMatrixParameters.__init__(self)
+
+        # values of the model inputs
+        inputs = Data.get_inputs(overrides=inputs)
 
         # selected therapy
         self.therapy = therapy
@@ -34,22 +80,47 @@ class Parameters:
 
         if therapy == Therapies.WITHOUT:
             # calculate transition rate matrix for the mono therapy
-            self.transRateMatrix = Data.get_trans_rate_matrix(with_treatment=False)
+            self.transRateMatrix = Data.get_trans_rate_matrix(with_treatment=False, inputs=inputs)
         else:
             # calculate transition probability matrix for the combination therapy
-            self.transRateMatrix = Data.get_trans_rate_matrix(with_treatment=True)
+            self.transRateMatrix = Data.get_trans_rate_matrix(with_treatment=True, inputs=inputs)
 
         # annual treatment cost
         if self.therapy == Therapies.WITHOUT:
             self.annualTreatmentCost = 0
         elif self.therapy == Therapies.WITH:
-            self.annualTreatmentCost = Data.VAX_COST
+            self.annualTreatmentCost = inputs['VAX_COST']
 
         # annual state costs and utilities
-        self.annualStateCosts = Data.ANNUAL_STATE_COST
-        self.annualStateUtilities = Data.ANNUAL_STATE_UTILITY
+        self.annualStateCosts = inputs['ANNUAL_STATE_COST']
+        self.annualStateUtilities = inputs['ANNUAL_STATE_UTILITY']
 
         # discount rate
-        self.discountRate = Data.DISCOUNT
+        self.discountRate = inputs['DISCOUNT']
+
+
+class FrozenParameters(namedtuple('FrozenParameters', ['initialHealthState', 'transRateMatrix', 'annualStateCosts',
+                                                       'annualStateUtilities', 'annualTreatmentCost', 'discountRate'])):
+    """ immutable (and hashable) values of a parameter set """
+    __slots__ = ()
+
+    def get_digest(self):
+        """
+        :return: (string) SHA-256 digest of the parameter values (the same in every Python session)
+        """
+        return hashlib.sha256(repr(tuple(self)).encode()).hexdigest()
+
 
+def freeze_parameters(parameters):
+    """
+    :param parameters: a parameter set
+    :return: (FrozenParameters) immutable copy of the values of the parameter set
+    """
+    return FrozenParameters(
+        initialHealthState=parameters.initialHealthState.value,
+        transRateMatrix=tuple(tuple(float(rate) for rate in row) for row in parameters.transRateMatrix),
+        annualStateCosts=tuple(float(cost) for cost in parameters.annualStateCosts),
+        annualStateUtilities=tuple(float(utility) for utility in parameters.annualStateUtilities),
+        annualTreatmentCost=float(parameters.annualTreatmentCost),
+        discountRate=float(parameters.discountRate))
 
@@ -0,0 +1,83 @@
+import importlib
+import os
+import re
+import warnings
+
+import InputData as D
+
+# matplotlib and the SimPy plotting modules are only imported when a figure is drawn
+# (so the model modules can be imported and run on machines without a display)
+_pyplot = None
+
+
+def if_plotting():
+    """
+    :return: True if figures are drawn (shown, or saved when InputData.FIGURE_DIR is set) and False in headless mode
+    """
+    return not D.HEADLESS or D.FIGURE_DIR is not None
+
+
+def if_saving():
+    """
+    :return: True if figures are saved to InputData.FIGURE_DIR instead of being shown
+    """
+    return D.FIGURE_DIR is not None
+
+
+def get_pyplot():
+    """
+    :return: matplotlib.pyplot (with a non-interactive backend in headless mode or when figures are saved)
+    """
+
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+        if D.HEADLESS or if_saving():
+            matplotlib.use('Agg')
+            # plotting functions of SimPy call show(), which does nothing with this backend
+            warnings.filterwarnings('ignore', message='.*non-interactive.*')
+        import matplotlib.pyplot
+        _pyplot = matplotlib.pyplot
+
+    return _pyplot
+
+
+def import_module(name):
+    """ imports a module that uses matplotlib (after the backend is selected)
+    :param name: name of the module (e.g. 'SimPy.Plots.Histogram')
+    :return: the module
+    """
+    get_pyplot()
+    return importlib.import_module(name)
+
+
+def _get_file_name(title):
+    """
+    :param title: title of the figure
+    :return: name of the file in InputData.FIGURE_DIR to save the figure in
+    """
+    name = re.sub(r'[^A-Za-z0-9]+', '_', title).strip('_')
+    return os.path.join(D.FIGURE_DIR, '{}.{}'.format(name, D.FIGURE_FORMAT))
+
+
+def save(title):
+    """ saves the current figure (drawn by a plotting function that shows it) if figures are saved
+    :param title: title of the figure (used as the file name)
+    """
+
+    if if_saving():
+        plt = get_pyplot()
+        os.makedirs(D.FIGURE_DIR, exist_ok=True)
+        plt.gcf().savefig(_get_file_name(title), bbox_inches='tight')
+        plt.close('all')
+
+
+def show(title):
+    """ shows the current figure or saves it if figures are saved
+    :param title: title of the figure (used as the file name)
+    """
+
+    if if_saving():
+        save(title)
+    else:
+        get_pyplot().show()
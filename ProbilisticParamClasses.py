@@ -6,11 +6,12 @@ import SimPy.RandomVariateGenerators as RVGs
 from ParameterClasses import *  # import everything from the ParameterClass module
 
 
-class Parameters:
+class Parameters(RateMatrixParameters):
     """ class to include parameter information to simulate the model """
 
     def __init__(self, therapy):
 
+        RateMatrixParameters.__init__(self)
         self.therapy = therapy              # selected therapy
         self.initialHealthState = HealthStates.WELL     # initial health state
         self.annualTreatmentCost = 0        # annual treatment cost
@@ -31,6 +32,9 @@ class ParameterGenerator:
         self.annualStateCostRVG = []  # list of gamma distributions for the annual cost of states
         self.annualStateUtilityRVG = []  # list of beta distributions for the annual utility of states
         self.annualTreatmentCostRVG = None   # gamma distribution for treatment cost
+        # parameters of the distributions of annual state costs and utilities (to sample them in batches)
+        self._annualStateCostDists = []
+        self._annualStateUtilityDists = []
 
         # create Dirichlet distributions for transition probabilities
         j = 0
@@ -68,9 +72,9 @@ class ParameterGenerator:
             # if cost is zero, add a constant 0, otherwise add a gamma distribution
             if cost == 0:
                 self.annualStateCostRVG.append(RVGs.Constant(value=0))
+                self._annualStateCostDists.append(('constant', 0))
 
             else:
-                self.annualStateCostRVG.append(RVGs.Constant(value=1))
                 # find shape and scale of the assumed gamma distribution
                 # no data available to estimate the standard deviation, so we assumed st_dev=cost / 5
                 fit_output = RVGs.Gamma.fit_mm(mean=cost, st_dev=cost / 5)
@@ -79,6 +83,7 @@ class ParameterGenerator:
                     RVGs.Gamma(a=fit_output["a"],
                                loc=0,
                                scale=fit_output["scale"]))
+                self._annualStateCostDists.append(('gamma', fit_output["a"], fit_output["scale"]))
 
         # # create a gamma distribution for annual treatment cost
         # if self.therapy == Therapies.WITHOUT:
@@ -96,8 +101,10 @@ class ParameterGenerator:
             # if utility is zero, add a constant 0, otherwise add a beta distribution
             if utility == 0:
                 self.annualStateUtilityRVG.append(RVGs.Constant(value=0))
+                self._annualStateUtilityDists.append(('constant', 0))
             elif utility == 1:
                 self.annualStateUtilityRVG.append(RVGs.Constant(value=1))
+                self._annualStateUtilityDists.append(('constant', 1))
             else:
                 # find alpha and beta of the assumed beta distribution
                 # no data available to estimate the standard deviation, so we assumed st_dev=cost / 4
@@ -105,6 +112,7 @@ class ParameterGenerator:
                 # append the distribution
                 self.annualStateUtilityRVG.append(
                     RVGs.Beta(a=fit_output["a"], b=fit_output["b"]))
+                self._annualStateUtilityDists.append(('beta', fit_output["a"], fit_output["b"]))
 
     def get_new_parameters(self, rng):
         """
@@ -150,3 +158,79 @@ class ParameterGenerator:
 
         # return the parameter set
         return param
+
+    def get_new_parameter_batch(self, n, rng):
+        """ samples many parameter sets at once (from the same distributions as get_new_parameters)
+        :param n: number of parameter sets
+        :param rng: (numpy.random.Generator) random number generator
+        :return: (ParameterBatch) the new parameter sets
+        """
+
+        batch = ParameterBatch(therapy=self.therapy, n=n)
+
+        # the transition rates do not depend on sampled values (as in get_new_parameters)
+        batch.transRateMatrices[:] = Data.get_trans_rate_matrix(with_treatment=(self.therapy == Therapies.WITH))
+
+        # sample annual state costs and utilities
+        for j, dist in enumerate(self._annualStateCostDists):
+            batch.annualStateCosts[:, j] = _sample_batch(dist=dist, n=n, rng=rng)
+        for j, dist in enumerate(self._annualStateUtilityDists):
+            batch.annualStateUtilities[:, j] = _sample_batch(dist=dist, n=n, rng=rng)
+
+        return batch
+
+
+class ParameterBatch:
+    """ many parameter sets stored in arrays (the first dimension is the parameter set) """
+
+    def __init__(self, therapy, n):
+        """
+        :param therapy: selected therapy
+        :param n: number of parameter sets
+        """
+
+        n_states = len(HealthStates)
+
+        self.therapy = therapy
+        self.nParamSets = n
+        self.initialHealthState = HealthStates.WELL
+        self.transRateMatrices = np.zeros((n, n_states, n_states))  # transition rate matrices
+        self.annualStateCosts = np.zeros((n, n_states))             # annual state costs
+        self.annualStateUtilities = np.zeros((n, n_states))         # annual state utilities
+        self.annualTreatmentCosts = np.zeros(n)                     # annual treatment costs
+        self.discountRate = Data.DISCOUNT                           # discount rate
+
+    def get_parameters(self, i):
+        """
+        :param i: index of the parameter set
+        :return: (Parameters) the i-th parameter set
+        """
+
+        param = Parameters(therapy=self.therapy)
+        param.initialHealthState = self.initialHealthState
+        param.transRateMatrix = self.transRateMatrices[i].tolist()
+        param.annualStateCosts = self.annualStateCosts[i].tolist()
+        param.annualStateUtilities = self.annualStateUtilities[i].tolist()
+        param.annualTreatmentCost = float(self.annualTreatmentCosts[i])
+        param.discountRate = self.discountRate
+
+        return param
+
+
+def _sample_batch(dist, n, rng):
+    """
+    :param dist: ('constant', value), ('gamma', a, scale) or ('beta', a, b)
+    :param n: number of samples
+    :param rng: (numpy.random.Generator) random number generator
+    :return: (array) n samples from the distribution
+    """
+
+    if dist[0] == 'constant':
+        return np.full(n, dist[1], dtype=float)
+    elif dist[0] == 'gamma':
+        return rng.gamma(shape=dist[1], scale=dist[2], size=n)
+    elif dist[0] == 'beta':
+        return rng.beta(a=dist[1], b=dist[2], size=n)
+    else:
+        raise ValueError('Unknown distribution {}.'.format(dist[0]))
+
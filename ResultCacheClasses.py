@@ -0,0 +1,106 @@
+import hashlib
+import os
+import pickle
+
+# version of the simulation output stored in the cache (part of every key, so results stored by earlier
+# versions are not returned); increase it whenever the same cohort would be simulated differently or the
+# stored outcome classes change
+#   1: outcomes keyed by frozen parameter values
+#   2: the vectorized engine draws the uniforms of each step for all patients (antithetic variates)
+#   3: chunks of the vectorized engine are seeded by [cohort id, first patient]
+#   4: streamed deaths are placed at the start of their histogram bin; sojourns are discounted in blocks
+#   5: streaming outcomes keep the covariance of discounted cost and utility
+#   6: event histories of the patient engine are built from the sojourn records
+#   7: parameter sets store their transition rate matrix behind a property
+#   8: the control variates are the discounted number of COVID episodes and the discounted life years
+CACHE_VERSION = 8
+
+
+def get_cache_key(parameters, cohort_id, pop_size, sim_length, **settings):
+    """
+    :param parameters: a parameter set (with a freeze method)
+    :param cohort_id: cohort ID
+    :param pop_size: population size of the cohort
+    :param sim_length: simulation length
+    :param settings: other settings the outcomes depend on (e.g. the engine)
+    :return: (string) key of the outcomes of this cohort in the result cache
+    """
+
+    fields = [CACHE_VERSION, parameters.freeze().get_digest(), cohort_id, pop_size, sim_length]
+    fields.extend('{}={}'.format(name, settings[name]) for name in sorted(settings))
+
+    return hashlib.sha256(repr(fields).encode()).hexdigest()
+
+
+class ResultCache:
+    """ results stored on disk (one file per key); when the total size of the files exceeds the maximum size,
+    the least recently used files are removed """
+
+    def __init__(self, directory, max_size=500 * 2 ** 20):
+        """
+        :param directory: directory to store the results in (created if it does not exist)
+        :param max_size: maximum total size (bytes) of the stored results
+        """
+        self.directory = directory
+        self.maxSize = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def _get_file_name(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key):
+        """
+        :param key: key of the result
+        :return: the stored result or None if there is no result with this key
+        """
+
+        file_name = self._get_file_name(key)
+        try:
+            with open(file_name, 'rb') as file:
+                result = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+        # mark the result as recently used
+        os.utime(file_name)
+        return result
+
+    def put(self, key, result):
+        """ stores a result (and removes the least recently used results if the cache is too large)
+        :param key: key of the result
+        :param result: result to store
+        """
+
+        # write to a temporary file first so that an interrupted write does not leave a broken result
+        file_name = self._get_file_name(key)
+        temp_file_name = '{}.{}.tmp'.format(file_name, os.getpid())
+        with open(temp_file_name, 'wb') as file:
+            pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file_name, file_name)
+
+        self._evict()
+
+    def _evict(self):
+        """ removes the least recently used results until the total size is not above the maximum size """
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def clear(self):
+        """ removes all stored results """
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                os.remove(entry.path)
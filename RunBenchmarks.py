@@ -0,0 +1,241 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import InputData as D
+import Instrumentation as Inst
+import MarkovModelClasses as Cls
+import MultiCohortClasses as MultiCls
+import MultiCohortSupport as MultiSupport
+import ParameterClasses as P
+import ProbilisticParamClasses as ProbP
+
+OUTPUT_FILE = 'benchmark_results.json'      # file to write the results to
+BASELINE_FILE = 'benchmark_baseline.json'   # results to compare against
+TOLERANCE = 0.25    # a benchmark regresses if its wall time exceeds the baseline by more than this fraction
+N_REPEATS = 3       # each benchmark is repeated and the fastest repeat is reported
+
+HORIZONS = [10, 50]                     # simulation lengths (years)
+PATIENT_COUNTS = [200, 1000]            # number of patients simulated one at a time
+POP_SIZES = [1000, 5000]                # cohort population sizes (patient engine)
+VECTORIZED_POP_SIZES = [10000, 100000]  # cohort population sizes (vectorized engine)
+COHORT_COUNTS = [10, 50]                # number of cohorts of multi-cohort simulations
+MULTI_COHORT_POP_SIZE = 200             # population size of each cohort of multi-cohort simulations
+PARAMETER_SET_COUNTS = [100, 1000]      # number of sampled parameter sets
+CEA_COHORT_COUNTS = [20, 100]           # number of cohorts of the cost-effectiveness reports
+
+# the benchmarks do not draw figures (so the reports are timed without creating figures)
+D.HEADLESS = True
+D.FIGURE_DIR = None
+
+
+def measure(func):
+    """ runs a function N_REPEATS times
+    :param func: function to run (returns the number of simulated patients or None)
+    :return: (dictionary) wall time (seconds) of the fastest repeat, peak memory (MB) and numbers of patients
+             and events (None if the function does not simulate patients or events)
+    """
+
+    wall_times = []
+    n_patients = None
+    for _ in range(N_REPEATS):
+        start = time.perf_counter()
+        n_patients = func()
+        wall_times.append(time.perf_counter() - start)
+
+    # measure peak memory in a separate run (tracing memory allocations slows the function down)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # count the events (transitions, including the ends of simulations) in another separate run
+    # (counting them also slows the function down)
+    Inst.enable()
+    try:
+        func()
+        n_events = sum(Inst.get_transition_counts().values())
+    finally:
+        Inst.disable()
+        Inst.reset()
+
+    return {'wall time': min(wall_times), 'peak memory (MB)': peak / 2 ** 20,
+            'patients': n_patients, 'events': n_events if n_events > 0 else None}
+
+
+def bench_patient_simulate(n_patients, sim_length):
+    parameters = P.Parameters(therapy=P.Therapies.WITHOUT)
+
+    def run():
+        for i in range(n_patients):
+            patient = Cls.Patient(id=i, parameters=parameters)
+            patient.simulate(sim_length=sim_length)
+        return n_patients
+
+    return run
+
+
+def bench_cohort_simulate(pop_size, sim_length, engine):
+    def run():
+        cohort = Cls.Cohort(id=1, pop_size=pop_size,
+                            parameters=P.Parameters(therapy=P.Therapies.WITHOUT),
+                            engine=engine)
+        cohort.simulate(sim_length=sim_length)
+        return cohort.nPatientsSimulated
+
+    return run
+
+
+def bench_multi_cohort_simulate(n_cohorts, sim_length, engine):
+    def run():
+        multi_cohort = MultiCls.MultiCohort(ids=range(n_cohorts), pop_size=MULTI_COHORT_POP_SIZE,
+                                            therapy=ProbP.Therapies.WITH, engine=engine)
+        multi_cohort.simulate(sim_length=sim_length)
+        # (the expected value engine does not simulate patients)
+        if engine == Cls.Engines.EXPECTED_VALUE:
+            return None
+        return multi_cohort.nCohortsSimulated * MULTI_COHORT_POP_SIZE
+
+    return run
+
+
+def bench_get_new_parameters(n_param_sets):
+    param_generator = ProbP.ParameterGenerator(therapy=ProbP.Therapies.WITH)
+
+    def run():
+        for i in range(n_param_sets):
+            param_generator.get_new_parameters(rng=np.random.RandomState(seed=i))
+
+    return run
+
+
+def bench_report_CEA_CBA(n_cohorts, sim_length):
+    # the multi-cohort outcomes are calculated once (the benchmark only measures the report)
+    outcomes = []
+    for therapy, first_id in ((ProbP.Therapies.WITHOUT, 0), (ProbP.Therapies.WITH, n_cohorts)):
+        multi_cohort = MultiCls.MultiCohort(ids=range(first_id, first_id + n_cohorts), pop_size=MULTI_COHORT_POP_SIZE,
+                                            therapy=therapy, engine=Cls.Engines.EXPECTED_VALUE)
+        multi_cohort.simulate(sim_length=sim_length)
+        outcomes.append(multi_cohort.multiCohortOutcomes)
+
+    def run():
+        # the report writes a csv file and prints, so it runs in a temporary directory with its output discarded
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+            os.chdir(directory)
+            try:
+                MultiSupport.report_CEA_CBA(multi_cohort_outcomes_without=outcomes[0],
+                                            multi_cohort_outcomes_with=outcomes[1])
+            finally:
+                os.chdir(cwd)
+
+    return run
+
+
+def get_benchmarks():
+    """
+    :return: (list) of (name, function to run)
+    """
+
+    benchmarks = []
+    for sim_length in HORIZONS:
+        for n in PATIENT_COUNTS:
+            benchmarks.append(('Patient.simulate n={} T={}'.format(n, sim_length),
+                               bench_patient_simulate(n_patients=n, sim_length=sim_length)))
+        for n in POP_SIZES:
+            benchmarks.append(('Cohort.simulate patient n={} T={}'.format(n, sim_length),
+                               bench_cohort_simulate(pop_size=n, sim_length=sim_length, engine=Cls.Engines.PATIENT)))
+        for n in VECTORIZED_POP_SIZES:
+            benchmarks.append(('Cohort.simulate vectorized n={} T={}'.format(n, sim_length),
+                               bench_cohort_simulate(pop_size=n, sim_length=sim_length,
+                                                     engine=Cls.Engines.VECTORIZED)))
+        for n in COHORT_COUNTS:
+            benchmarks.append(('MultiCohort.simulate patient cohorts={} T={}'.format(n, sim_length),
+                               bench_multi_cohort_simulate(n_cohorts=n, sim_length=sim_length,
+                                                           engine=Cls.Engines.PATIENT)))
+            benchmarks.append(('MultiCohort.simulate expected value cohorts={} T={}'.format(n, sim_length),
+                               bench_multi_cohort_simulate(n_cohorts=n, sim_length=sim_length,
+                                                           engine=Cls.Engines.EXPECTED_VALUE)))
+    for n in PARAMETER_SET_COUNTS:
+        benchmarks.append(('ParameterGenerator.get_new_parameters n={}'.format(n),
+                           bench_get_new_parameters(n_param_sets=n)))
+    for n in CEA_COHORT_COUNTS:
+        benchmarks.append(('MultiCohortSupport.report_CEA_CBA cohorts={}'.format(n),
+                           bench_report_CEA_CBA(n_cohorts=n, sim_length=HORIZONS[-1])))
+
+    return benchmarks
+
+
+def run_benchmarks(name_filter=None):
+    """
+    :param name_filter: (string) only runs the benchmarks whose name contains this string
+    :return: (dictionary) results of each benchmark
+    """
+
+    results = {}
+    for name, func in get_benchmarks():
+        if name_filter is not None and name_filter not in name:
+            continue
+
+        result = measure(func)
+        if result['patients'] is not None:
+            result['patients/sec'] = result['patients'] / result['wall time']
+        if result['events'] is not None:
+            result['events/sec'] = result['events'] / result['wall time']
+        results[name] = result
+
+        print('{:<60} {:>10.4f} s {:>10.1f} MB'.format(name, result['wall time'], result['peak memory (MB)']))
+
+    return results
+
+
+def compare(results, baseline):
+    """ prints the change in the wall time of each benchmark relative to the baseline
+    :param results: (dictionary) results of benchmarks
+    :param baseline: (dictionary) baseline results
+    :return: (list) names of the benchmarks that regressed
+    """
+
+    regressions = []
+    print('\nComparison with the baseline:')
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['wall time'] / baseline[name]['wall time']
+        if ratio > 1 + TOLERANCE:
+            regressions.append(name)
+        print('{:<60} {:>8.2f}x {}'.format(name, ratio, 'REGRESSION' if ratio > 1 + TOLERANCE else ''))
+
+    return regressions
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmarks of the simulation and reporting functions.')
+    parser.add_argument('--filter', default=None, help='only run the benchmarks whose name contains this string')
+    parser.add_argument('--output', default=OUTPUT_FILE, help='file to write the results to')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='results to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    args = parser.parse_args()
+
+    results = run_benchmarks(name_filter=args.filter)
+
+    with open(args.output, 'w') as file:
+        json.dump({'python': platform.python_version(), 'numpy': np.__version__, 'results': results}, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump({'results': results}, file, indent=2)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            regressed = compare(results=results, baseline=json.load(file)['results'])
+        if len(regressed) > 0:
+            raise SystemExit('{} benchmark(s) regressed.'.format(len(regressed)))
@@ -1,42 +1,53 @@
 import InputData as D
 import ParameterClasses as P
 import MarkovModelClasses as Cls
+import ResultCacheClasses as Cache
+import PlotSupport as Plots
 import Support as Support
-import SimPy.Plots.Histogram as Hist
-import SimPy.Plots.SamplePaths as Path
 
+# the plotting modules are only imported if figures are drawn (not in headless mode)
+if Plots.if_plotting():
+    Hist = Plots.import_module('SimPy.Plots.Histogram')
+    Path = Plots.import_module('SimPy.Plots.SamplePaths')
+
+# outcomes of cohorts simulated by earlier runs
+cache = Cache.ResultCache(directory=D.RESULT_CACHE_DIR)
 
 myCohort = Cls.Cohort(id=1, pop_size=D.POP_SIZE,
                                   parameters=P.Parameters(therapy=P.Therapies.WITHOUT))
 
 # simulate
-myCohort.simulate(sim_length=D.SIMULATION_LENGTH)
-
-
-# plot the sample path (survival curve)
-Path.plot_sample_path(
-    sample_path=myCohort.cohortOutcomes.nLivingPatients,
-    title='Survival Curve (Model without vaccine)',
-    x_label='Time-Step (Year)',
-    y_label='Number Survived')
-
-# plot the histogram of survival times
-Hist.plot_histogram(
-    data=myCohort.cohortOutcomes.survivalTimes,
-    title='Histogram of Patient Survival Time\n(Model without vaccine)',
-    x_label='Survival Time (Year)',
-    y_label='Count',
-    bin_width=1)
-
-# histogram of number of cvd
-Hist.plot_histogram(
-    data=myCohort.cohortOutcomes.nTotalCOVID,
-    title='Number of COVID (Without vaccine)',
-    x_label='Number of COVID',
-    y_label='Count',
-    bin_width=1,
-    x_range=[0, 7]
-)
+myCohort.simulate(sim_length=D.SIMULATION_LENGTH, cache=cache)
+
+
+if Plots.if_plotting():
+    # plot the sample path (survival curve)
+    Path.plot_sample_path(
+        sample_path=myCohort.cohortOutcomes.nLivingPatients,
+        title='Survival Curve (Model without vaccine)',
+        x_label='Time-Step (Year)',
+        y_label='Number Survived')
+    Plots.save(title='Survival Curve (Model without vaccine)')
+
+    # plot the histogram of survival times
+    Hist.plot_histogram(
+        data=myCohort.cohortOutcomes.survivalTimes,
+        title='Histogram of Patient Survival Time\n(Model without vaccine)',
+        x_label='Survival Time (Year)',
+        y_label='Count',
+        bin_width=1)
+    Plots.save(title='Histogram of Patient Survival Time (Model without vaccine)')
+
+    # histogram of number of cvd
+    Hist.plot_histogram(
+        data=myCohort.cohortOutcomes.nTotalCOVID,
+        title='Number of COVID (Without vaccine)',
+        x_label='Number of COVID',
+        y_label='Count',
+        bin_width=1,
+        x_range=[0, 7]
+    )
+    Plots.save(title='Number of COVID (Without vaccine)')
 
 
 # print the outcomes of this simulated cohort
@@ -59,34 +70,38 @@ myCohortWith = Cls.Cohort(id=1, pop_size=D.POP_SIZE,
                                   parameters=P.Parameters(therapy=P.Therapies.WITH))
 
 # simulate
-myCohortWith.simulate(sim_length=D.SIMULATION_LENGTH)
-
-# survival curve
-Path.plot_sample_path(
-    sample_path=myCohortWith.cohortOutcomes.nLivingPatients,
-    title='Survival Curve (Model with vaccine)',
-    x_label='Time Step (Year)',
-    y_label='Number of Surviving Patients'
-)
-
-# histograms of survival times
-Hist.plot_histogram(
-    data=myCohortWith.cohortOutcomes.survivalTimes,
-    title='Histogram of Patient Survival Time\n(Model with vaccine)',
-    x_label='Survival Time (Year)',
-    y_label='Count',
-    bin_width=1
-)
-
-# histogram of number of cvd
-Hist.plot_histogram(
-    data=myCohortWith.cohortOutcomes.nTotalCOVID,
-    title='Number of COVID (With vaccine)',
-    x_label='Number of COVID',
-    y_label='Count',
-    bin_width=1,
-    x_range=[0, 7]
-)
+myCohortWith.simulate(sim_length=D.SIMULATION_LENGTH, cache=cache)
+
+if Plots.if_plotting():
+    # survival curve
+    Path.plot_sample_path(
+        sample_path=myCohortWith.cohortOutcomes.nLivingPatients,
+        title='Survival Curve (Model with vaccine)',
+        x_label='Time Step (Year)',
+        y_label='Number of Surviving Patients'
+    )
+    Plots.save(title='Survival Curve (Model with vaccine)')
+
+    # histograms of survival times
+    Hist.plot_histogram(
+        data=myCohortWith.cohortOutcomes.survivalTimes,
+        title='Histogram of Patient Survival Time\n(Model with vaccine)',
+        x_label='Survival Time (Year)',
+        y_label='Count',
+        bin_width=1
+    )
+    Plots.save(title='Histogram of Patient Survival Time (Model with vaccine)')
+
+    # histogram of number of cvd
+    Hist.plot_histogram(
+        data=myCohortWith.cohortOutcomes.nTotalCOVID,
+        title='Number of COVID (With vaccine)',
+        x_label='Number of COVID',
+        y_label='Count',
+        bin_width=1,
+        x_range=[0, 7]
+    )
+    Plots.save(title='Number of COVID (With vaccine)')
 
 
 # print the outcomes of this simulated cohort
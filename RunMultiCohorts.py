@@ -1,9 +1,12 @@
 import InputData as D
 import MultiCohortClasses as Cls
 import MultiCohortSupport as Support
+import PlotSupport as Plots
 import ProbilisticParamClasses as P
-import SimPy.Plots.Histogram as Hist
-import SimPy.Plots.SamplePaths as Path
+
+# the plotting module is only imported if figures are drawn (not in headless mode)
+if Plots.if_plotting():
+    Hist = Plots.import_module('SimPy.Plots.Histogram')
 
 N_COHORTS = 20             # number of cohorts
 
@@ -18,20 +21,24 @@ multiCohort_WITHOUT = Cls.MultiCohort(
 
 multiCohort_WITHOUT.simulate(sim_length=D.SIMULATION_LENGTH)
 
-# plot the sample paths
-Path.plot_sample_paths(
-    sample_paths=multiCohort_WITHOUT.multiCohortOutcomes.survivalCurves,
+# plot the median survival curve and its uncertainty band
+Support.plot_survival_curve_bands(
+    list_of_multi_cohort_outcomes=[multiCohort_WITHOUT.multiCohortOutcomes],
     title='Survival Curves (without vaccine)',
     x_label='Time-Step (Year)',
     y_label='Number Survived',
+    legends=['Without vaccine'],
+    color_codes=['green'],
     transparency=0.5)
 
 # plot the histogram of average survival time
-Hist.plot_histogram(
-    data=multiCohort_WITHOUT.multiCohortOutcomes.meanSurvivalTimes,
-    title='Histogram of Mean Survival Time (without vaccine)',
-    x_label='Mean Survival Time (Year)',
-    y_label='Count')
+if Plots.if_plotting():
+    Hist.plot_histogram(
+        data=multiCohort_WITHOUT.multiCohortOutcomes.meanSurvivalTimes,
+        title='Histogram of Mean Survival Time (without vaccine)',
+        x_label='Mean Survival Time (Year)',
+        y_label='Count')
+    Plots.save(title='Histogram of Mean Survival Time (without vaccine)')
 
 # print the outcomes of this simulated cohort
 Support.print_outcomes(multi_cohort_outcomes=multiCohort_WITHOUT.multiCohortOutcomes,
@@ -47,20 +54,24 @@ multiCohort_WITH = Cls.MultiCohort(
 
 multiCohort_WITH.simulate(sim_length=D.SIMULATION_LENGTH)
 
-# plot the sample paths
-Path.plot_sample_paths(
-    sample_paths=multiCohort_WITH.multiCohortOutcomes.survivalCurves,
+# plot the median survival curve and its uncertainty band
+Support.plot_survival_curve_bands(
+    list_of_multi_cohort_outcomes=[multiCohort_WITH.multiCohortOutcomes],
     title='Survival Curves (with vaccine)',
     x_label='Time-Step (Year)',
     y_label='Number Survived',
+    legends=['With vaccine'],
+    color_codes=['blue'],
     transparency=0.5)
 
 # plot the histogram of average survival time
-Hist.plot_histogram(
-    data=multiCohort_WITH.multiCohortOutcomes.meanSurvivalTimes,
-    title='Histogram of Mean Survival Time (with vaccine)',
-    x_label='Mean Survival Time (Year)',
-    y_label='Count')
+if Plots.if_plotting():
+    Hist.plot_histogram(
+        data=multiCohort_WITH.multiCohortOutcomes.meanSurvivalTimes,
+        title='Histogram of Mean Survival Time (with vaccine)',
+        x_label='Mean Survival Time (Year)',
+        y_label='Count')
+    Plots.save(title='Histogram of Mean Survival Time (with vaccine)')
 
 # print the outcomes of this simulated cohort
 Support.print_outcomes(multi_cohort_outcomes=multiCohort_WITH.multiCohortOutcomes,
@@ -0,0 +1,221 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import tomllib
+except ImportError:     # Python < 3.11
+    tomllib = None
+
+import InputData as D
+import MarkovModelClasses as Cls
+import ParameterClasses as P
+import ResultCacheClasses as Cache
+
+OUTPUT_FILE = 'scenario_results.csv'    # file to write the results of all scenarios to
+N_WORKERS = os.cpu_count()              # number of processes to simulate the scenarios with
+
+# settings of scenarios (other than the model inputs) and their default values
+DEFAULT_SETTINGS = {
+    'pop_size': D.POP_SIZE,                 # population size of the cohort of each arm
+    'sim_length': D.SIMULATION_LENGTH,      # simulation length (years)
+    'engine': Cls.Engines.PATIENT.name,     # name of the engine (see MarkovModelClasses.Engines)
+    'cohort_id': 0,                         # cohort ID (seed of the random number streams)
+    'if_antithetic': False,                 # antithetic variates (vectorized engine only)
+    'if_control_variate': False,            # control variates (vectorized engine only)
+}
+
+EPILOG = '''
+The scenario file (.json or .toml) lists the scenarios under "scenarios". Each scenario has a "name", the
+model inputs it changes under "inputs" (names as in InputData.INPUT_NAMES) and, optionally, the settings
+{settings}. Inputs and settings under "defaults" apply to every scenario. Example (JSON):
+  {{"defaults": {{"pop_size": 2000, "engine": "VECTORIZED"}},
+   "scenarios": [{{"name": "base"}},
+                 {{"name": "cheaper vaccine", "inputs": {{"VAX_COST": 20}}}},
+                 {{"name": "weaker vaccine", "inputs": {{"VAX_COVID_REDUCTION": 0.6}}, "pop_size": 5000}}]}}
+'''.format(settings=', '.join(DEFAULT_SETTINGS))
+
+
+def read_scenarios(file_name):
+    """ reads and checks the scenarios of a scenario file
+    :param file_name: name of a .json or .toml scenario file
+    :return: (list) of scenarios (dictionaries with the keys 'name' and 'inputs' and the settings)
+    """
+
+    with open(file_name, 'rb') as file:
+        if file_name.endswith('.toml'):
+            if tomllib is None:
+                raise ValueError('Reading TOML scenario files requires Python 3.11 or later.')
+            config = tomllib.load(file)
+        else:
+            config = json.load(file)
+
+    defaults = config.get('defaults', {})
+    scenarios = []
+    for i, entry in enumerate(config['scenarios']):
+
+        # settings (from the defaults of this module, the defaults of the file and the scenario)
+        scenario = dict(DEFAULT_SETTINGS)
+        for source in (defaults, entry):
+            unknown_names = sorted(set(source) - set(DEFAULT_SETTINGS) - {'name', 'inputs'})
+            if len(unknown_names) > 0:
+                raise ValueError('Unknown scenario settings: {}.'.format(', '.join(unknown_names)))
+            scenario.update((name, value) for name, value in source.items() if name in DEFAULT_SETTINGS)
+        scenario['engine'] = scenario['engine'].upper()
+        if scenario['engine'] not in Cls.Engines.__members__:
+            raise ValueError("Unknown engine '{}'.".format(scenario['engine']))
+
+        # model inputs this scenario changes (checked here rather than in the processes simulating the scenarios)
+        scenario['name'] = entry.get('name', 'scenario {}'.format(i + 1))
+        scenario['inputs'] = dict(defaults.get('inputs', {}), **entry.get('inputs', {}))
+        D.get_inputs(overrides=scenario['inputs'])
+
+        scenarios.append(scenario)
+
+    names = [scenario['name'] for scenario in scenarios]
+    if len(set(names)) < len(names):
+        raise ValueError('Scenario names should be unique.')
+
+    return scenarios
+
+
+def simulate_scenario(scenario, cache_dir=None):
+    """ simulates a scenario without and with vaccine (this is the task sent to the processes that simulate
+    scenarios in parallel)
+    :param scenario: (dictionary) scenario (see read_scenarios)
+    :param cache_dir: directory of the result cache (None to not use the cache)
+    :return: (dictionary) outcomes of the scenario
+    """
+
+    start = time.perf_counter()
+    engine = Cls.Engines[scenario['engine']]
+
+    # parameters of both arms (InputData is not changed)
+    parameters_ref = P.Parameters(therapy=P.Therapies.WITHOUT, inputs=scenario['inputs'])
+    parameters = P.Parameters(therapy=P.Therapies.WITH, inputs=scenario['inputs'])
+
+    result = {'scenario': scenario['name'], 'engine': engine.name,
+              'pop size': scenario['pop_size'], 'sim length': scenario['sim_length']}
+
+    if engine == Cls.Engines.EXPECTED_VALUE:
+        cohorts = [Cls.ExpectedValueCohort(id=scenario['cohort_id'], pop_size=scenario['pop_size'], parameters=param)
+                   for param in (parameters_ref, parameters)]
+        for cohort in cohorts:
+            cohort.simulate(sim_length=scenario['sim_length'])
+        paired_outcomes = None
+    else:
+        # both arms are simulated with common random numbers
+        paired_cohort = Cls.PairedCohort(id=scenario['cohort_id'], pop_size=scenario['pop_size'],
+                                         parameters_ref=parameters_ref, parameters=parameters, engine=engine,
+                                         if_antithetic=scenario['if_antithetic'],
+                                         if_control_variate=scenario['if_control_variate'])
+        paired_cohort.simulate(sim_length=scenario['sim_length'],
+                               cache=None if cache_dir is None else Cache.ResultCache(directory=cache_dir))
+        cohorts = [paired_cohort.cohortRef, paired_cohort.cohort]
+        paired_outcomes = paired_cohort.pairedOutcomes
+
+    # outcomes of each arm
+    for arm, cohort in zip(('without vaccine', 'with vaccine'), cohorts):
+        outcomes = cohort.cohortOutcomes
+        result['{}: mean survival time'.format(arm)] = outcomes.meanSurvivalTime
+        result['{}: mean number of COVID'.format(arm)] = outcomes.meanNumOfCOVID
+        result['{}: mean cost'.format(arm)] = outcomes.meanCosts
+        result['{}: mean QALY'.format(arm)] = outcomes.meanUtilities
+
+    # incremental outcomes (and their confidence intervals if the outcomes are simulated)
+    incremental_cost = cohorts[1].cohortOutcomes.meanCosts - cohorts[0].cohortOutcomes.meanCosts
+    incremental_qaly = cohorts[1].cohortOutcomes.meanUtilities - cohorts[0].cohortOutcomes.meanUtilities
+    result['incremental cost'] = incremental_cost
+    result['incremental QALY'] = incremental_qaly
+    if paired_outcomes is None:
+        intervals = {'incremental cost': (None, None), 'incremental QALY': (None, None)}
+    else:
+        intervals = {'incremental cost': paired_outcomes.statIncrementalCost.get_t_CI(alpha=D.ALPHA),
+                     'incremental QALY': paired_outcomes.statIncrementalUtility.get_t_CI(alpha=D.ALPHA)}
+    for name, (lower, upper) in intervals.items():
+        result['{} CI lower'.format(name)] = lower
+        result['{} CI upper'.format(name)] = upper
+    result['ICER'] = incremental_cost / incremental_qaly if incremental_qaly != 0 else None
+
+    result['wall time (s)'] = time.perf_counter() - start
+
+    return result
+
+
+def run_scenarios(scenarios, n_workers=N_WORKERS, cache_dir=None, if_print=True):
+    """ simulates scenarios (in parallel if n_workers > 1)
+    :param scenarios: (list) of scenarios (see read_scenarios)
+    :param n_workers: number of processes to simulate the scenarios with
+    :param cache_dir: directory of the result cache (None to not use the cache)
+    :param if_print: set to True to print the name of each scenario when its simulation is done
+    :return: (list) outcomes of the scenarios (in the order of the scenarios)
+    """
+
+    results = [None] * len(scenarios)
+
+    if n_workers > 1 and len(scenarios) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(scenarios))) as executor:
+            futures = {executor.submit(simulate_scenario, scenario, cache_dir): i
+                       for i, scenario in enumerate(scenarios)}
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                if if_print:
+                    print('{:<50} done in {:.1f} s'.format(scenarios[i]['name'], results[i]['wall time (s)']))
+    else:
+        for i, scenario in enumerate(scenarios):
+            results[i] = simulate_scenario(scenario=scenario, cache_dir=cache_dir)
+            if if_print:
+                print('{:<50} done in {:.1f} s'.format(scenario['name'], results[i]['wall time (s)']))
+
+    return results
+
+
+def write_results(scenarios, results, file_name):
+    """ writes the results of all scenarios to a csv file (one row per scenario, with a column for each
+    model input that is changed by at least one scenario)
+    :param scenarios: (list) of scenarios
+    :param results: (list) outcomes of the scenarios
+    :param file_name: name of the csv file
+    """
+
+    changed_inputs = [name for name in D.INPUT_NAMES if any(name in scenario['inputs'] for scenario in scenarios)]
+
+    rows = []
+    for scenario, result in zip(scenarios, results):
+        inputs = D.get_inputs(overrides=scenario['inputs'])
+        row = {'scenario': result['scenario']}
+        row.update((name, json.dumps(inputs[name])) for name in changed_inputs)
+        row.update(result)
+        rows.append(row)
+
+    with open(file_name, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# the processes that simulate scenarios import this script, so the scenarios only run in the main process
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Simulates the scenarios of a scenario file and writes the '
+                                                 'outcomes of all scenarios to one csv file.',
+                                     epilog=EPILOG, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenario_file', help='.json or .toml file listing the scenarios')
+    parser.add_argument('--output', default=OUTPUT_FILE, help='csv file to write the results to')
+    parser.add_argument('--workers', type=int, default=N_WORKERS,
+                        help='number of processes to simulate the scenarios with')
+    parser.add_argument('--cache', action='store_true',
+                        help='reuse the outcomes of cohorts simulated by earlier runs (stored in {})'
+                        .format(D.RESULT_CACHE_DIR))
+    args = parser.parse_args()
+
+    scenarios = read_scenarios(file_name=args.scenario_file)
+    results = run_scenarios(scenarios=scenarios, n_workers=args.workers,
+                            cache_dir=D.RESULT_CACHE_DIR if args.cache else None)
+    write_results(scenarios=scenarios, results=results, file_name=args.output)
+
+    print('Results of {} scenarios written to {}.'.format(len(scenarios), args.output))
@@ -0,0 +1,20 @@
+import InputData as D
+import SensitivityAnalysis as DSA
+
+N_WORKERS = 1   # number of processes (the expected outcomes of each point are calculated exactly, so 1 is enough)
+
+# the processes that evaluate the points import this script, so the analysis only runs in the main process
+if __name__ == '__main__':
+
+    # vary each input of SensitivityAnalysis.DSA_INPUTS by 25% of its value
+    analysis = DSA.OneWaySensitivityAnalysis(ranges=DSA.get_default_ranges(), sim_length=D.SIMULATION_LENGTH)
+    analysis.run(n_workers=N_WORKERS)
+
+    # tornado tables of the incremental net monetary benefit and the ICER
+    for outcome in ('incremental NMB', 'ICER'):
+        print('Impact of inputs on the {} (largest first):'.format(outcome))
+        for row in analysis.get_tornado_table(outcome=outcome):
+            print('  {:<26} {:>12,.2f} to {:>12,.2f}'.format(
+                row['input'], row['{} at low value'.format(outcome)], row['{} at high value'.format(outcome)]))
+        analysis.export_to_csv(file_name='Tornado {}.csv'.format(outcome), outcome=outcome)
+        analysis.plot_tornado(outcome=outcome)
@@ -0,0 +1,196 @@
+import csv
+import re
+
+import numpy as np
+
+import InputData as D
+import MarkovModelClasses as Cls
+import PlotSupport as Plots
+import RunScenarios as Scenarios
+
+RELATIVE_CHANGE = 0.25  # inputs are varied by this fraction of their value (unless their range is provided)
+WTP = 1000              # willingness-to-pay for one QALY (to calculate the incremental net monetary benefit)
+
+# inputs varied by default (an element of a list input is written as NAME[index])
+DSA_INPUTS = ('ANNUAL_PROB_FIRST_COVID', 'PROB_RECURRENT_COVID', 'VAX_COVID_REDUCTION', 'VAX_COST', 'COVID_DURATION',
+              'ANNUAL_STATE_COST[1]', 'ANNUAL_STATE_UTILITY[0]', 'ANNUAL_STATE_UTILITY[1]', 'ANNUAL_STATE_UTILITY[2]')
+
+# inputs whose values are between 0 and 1 (probabilities, proportions and utilities)
+UNIT_INTERVAL_INPUTS = ('ANNUAL_PROB_ALL_CAUSE_MORT', 'ANNUAL_PROB_COVID_MORT', 'ANNUAL_PROB_FIRST_COVID',
+                        'PROB_SURVIVE_FIRST_COVID', 'PROB_SURVIVE_RECURRENT_COVID', 'PROB_RECURRENT_COVID',
+                        'VAX_COVID_REDUCTION', 'ANNUAL_STATE_UTILITY')
+
+OUTCOMES = ('incremental cost', 'incremental QALY', 'ICER', 'incremental NMB')
+
+
+def _parse_input(name):
+    """
+    :param name: name of an input or of an element of a list input (NAME[index])
+    :return: (name of the input, index of the element or None)
+    """
+    match = re.fullmatch(r'(\w+)\[(\d+)\]', name)
+    if match is None:
+        return name, None
+    return match.group(1), int(match.group(2))
+
+
+def get_base_value(name):
+    """
+    :param name: name of an input or of an element of a list input (NAME[index])
+    :return: value of the input in InputData
+    """
+    input_name, index = _parse_input(name)
+    value = D.get_inputs()[input_name]
+    return value if index is None else value[index]
+
+
+def get_overrides(name, value):
+    """
+    :param name: name of an input or of an element of a list input (NAME[index])
+    :param value: new value of the input
+    :return: (dictionary) model inputs to change (see InputData.get_inputs)
+    """
+
+    input_name, index = _parse_input(name)
+    if index is None:
+        return {input_name: value}
+
+    values = list(D.get_inputs()[input_name])
+    values[index] = value
+    return {input_name: values}
+
+
+def get_default_ranges(names=DSA_INPUTS, relative_change=RELATIVE_CHANGE):
+    """
+    :param names: names of the inputs to vary
+    :param relative_change: inputs are varied by this fraction of their value
+    :return: (dictionary) (low, high) values of each input (values of probabilities and utilities are kept in [0, 1])
+    """
+
+    ranges = {}
+    for name in names:
+        base = get_base_value(name)
+        low, high = base * (1 - relative_change), base * (1 + relative_change)
+        if _parse_input(name)[0] in UNIT_INTERVAL_INPUTS:
+            low, high = max(low, 0), min(high, 1)
+        ranges[name] = (low, high)
+
+    return ranges
+
+
+class OneWaySensitivityAnalysis:
+    """ one-way deterministic sensitivity analysis: each input is varied over its range while the other inputs
+    are kept at their values in InputData """
+
+    def __init__(self, ranges=None, n_points=2, engine=Cls.Engines.EXPECTED_VALUE,
+                 pop_size=D.POP_SIZE, sim_length=D.SIMULATION_LENGTH, wtp=WTP, cohort_id=0):
+        """
+        :param ranges: (dictionary) (low, high) values of each input to vary (see get_default_ranges, which is used
+                       if not provided)
+        :param n_points: number of values of each input (evenly spaced from low to high)
+        :param engine: (Engines) engine to evaluate each point with (Engines.EXPECTED_VALUE calculates the
+                       expected outcomes exactly; with the other engines, all points use the same random numbers)
+        :param pop_size: population size of the cohorts (not used by Engines.EXPECTED_VALUE)
+        :param sim_length: simulation length
+        :param wtp: willingness-to-pay for one QALY (to calculate the incremental net monetary benefit)
+        :param cohort_id: cohort ID (seed of the random number streams)
+        """
+
+        self.ranges = get_default_ranges() if ranges is None else ranges
+        self.wtp = wtp
+
+        # scenarios to evaluate: the base case and each value of each input
+        settings = dict(Scenarios.DEFAULT_SETTINGS, pop_size=pop_size, sim_length=sim_length,
+                        engine=engine.name, cohort_id=cohort_id)
+        self.points = [('base', None)]
+        self.scenarios = [dict(settings, name='base', inputs={})]
+        for name, (low, high) in self.ranges.items():
+            for value in np.linspace(low, high, n_points):
+                self.points.append((name, float(value)))
+                self.scenarios.append(dict(settings, name='{} = {:.6g}'.format(name, value),
+                                           inputs=get_overrides(name=name, value=float(value))))
+
+        self.results = None     # (list) outcomes of each point
+
+    def run(self, n_workers=1):
+        """ evaluates all points
+        :param n_workers: number of processes to evaluate the points with
+        """
+
+        self.results = Scenarios.run_scenarios(scenarios=self.scenarios, n_workers=n_workers, if_print=False)
+        for result in self.results:
+            result['incremental NMB'] = self.wtp * result['incremental QALY'] - result['incremental cost']
+
+    def get_one_way_results(self, name, outcome='incremental NMB'):
+        """
+        :param name: name of a varied input
+        :param outcome: name of the outcome (see OUTCOMES)
+        :return: (values, outcomes) arrays of the values of the input and the outcome at these values
+        """
+
+        values, outcomes = [], []
+        for (point_name, value), result in zip(self.points, self.results):
+            if point_name == name:
+                values.append(value)
+                outcomes.append(np.nan if result[outcome] is None else result[outcome])
+
+        return np.array(values), np.array(outcomes)
+
+    def get_tornado_table(self, outcome='incremental NMB'):
+        """
+        :param outcome: name of the outcome (see OUTCOMES)
+        :return: (list) of rows (dictionaries) for each varied input, sorted by the swing of the outcome
+                 (the difference between its largest and smallest value over the range of the input)
+        """
+
+        base_outcome = np.nan if self.results[0][outcome] is None else float(self.results[0][outcome])
+        rows = []
+        for name in self.ranges:
+            values, outcomes = self.get_one_way_results(name=name, outcome=outcome)
+            rows.append({'input': name,
+                         'base value': get_base_value(name),
+                         'low value': float(values[0]),
+                         'high value': float(values[-1]),
+                         'base {}'.format(outcome): base_outcome,
+                         '{} at low value'.format(outcome): float(outcomes[0]),
+                         '{} at high value'.format(outcome): float(outcomes[-1]),
+                         'swing': float(np.nanmax(outcomes) - np.nanmin(outcomes))})
+
+        return sorted(rows, key=lambda row: -row['swing'])
+
+    def export_to_csv(self, file_name, outcome='incremental NMB'):
+        """ saves the tornado table to a csv file
+        :param file_name: name of the file
+        :param outcome: name of the outcome (see OUTCOMES)
+        """
+
+        rows = self.get_tornado_table(outcome=outcome)
+        with open(file_name, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def plot_tornado(self, outcome='incremental NMB'):
+        """ plots the tornado diagram of an outcome (not drawn in headless mode)
+        :param outcome: name of the outcome (see OUTCOMES)
+        """
+
+        if not Plots.if_plotting():
+            return
+
+        rows = self.get_tornado_table(outcome=outcome)[::-1]    # the largest swing at the top
+        base = rows[0]['base {}'.format(outcome)]
+        y = np.arange(len(rows))
+
+        fig, ax = Plots.get_pyplot().subplots(figsize=(7, 0.5 * len(rows) + 1.5))
+        for key, color, label in (('{} at low value'.format(outcome), 'tab:blue', 'Low value'),
+                                  ('{} at high value'.format(outcome), 'tab:orange', 'High value')):
+            ax.barh(y, [row[key] - base for row in rows], left=base, color=color, label=label)
+        ax.axvline(base, color='black', linewidth=1)
+        ax.set_yticks(y)
+        ax.set_yticklabels([row['input'] for row in rows])
+        ax.set_title('One-Way Sensitivity Analysis')
+        ax.set_xlabel(outcome if outcome != 'incremental NMB'
+                      else 'Incremental Net Monetary Benefit at WTP = ${:,} ($)'.format(self.wtp))
+        ax.legend()
+        Plots.show(title='One-Way Sensitivity Analysis')
@@ -0,0 +1,288 @@
+import math
+
+import numpy as np
+import scipy.stats as stat
+
+
+class StreamingStat:
+    """ summary statistics of observations that are updated as observations arrive
+    (memory does not grow with the number of observations) """
+
+    def __init__(self, name, reservoir_size=10000, seed=0):
+        """
+        :param name: name of this statistics
+        :param reservoir_size: number of observations kept (uniformly at random) to approximate percentiles
+        :param seed: seed of the random number generator used to keep observations in the reservoir
+        """
+
+        self.name = name
+        self._n = 0             # number of observations
+        self._mean = 0          # sample mean
+        self._sumSqDev = 0      # sum of squared deviations from the sample mean
+        self._min = math.inf    # minimum
+        self._max = -math.inf   # maximum
+
+        # uniform random sample of observations (reservoir sampling)
+        self._reservoir = np.empty(reservoir_size)
+        self._rng = np.random.RandomState(seed=seed)
+
+    def record(self, obs):
+        """ records an observation
+        :param obs: observation
+        """
+        self.record_batch(np.array([obs], dtype=float))
+
+    def record_batch(self, obs):
+        """ records a batch of observations
+        :param obs: (array) observations
+        """
+
+        obs = np.asarray(obs, dtype=float)
+        n_batch = len(obs)
+        if n_batch == 0:
+            return
+
+        # merge the mean and sum of squared deviations of the batch with the current ones
+        batch_mean = obs.mean()
+        delta = batch_mean - self._mean
+        n = self._n + n_batch
+        self._sumSqDev += ((obs - batch_mean) ** 2).sum() + delta ** 2 * self._n * n_batch / n
+        self._mean += delta * n_batch / n
+
+        self._min = min(self._min, obs.min())
+        self._max = max(self._max, obs.max())
+
+        # fill the reservoir first, then replace its elements with probability size/(index+1)
+        size = len(self._reservoir)
+        n_fill = max(0, min(size - self._n, n_batch))
+        self._reservoir[self._n:self._n + n_fill] = obs[:n_fill]
+        if n_fill < n_batch:
+            indices = self._n + np.arange(n_fill, n_batch)
+            slots = (self._rng.random_sample(len(indices)) * (indices + 1)).astype(int)
+            if_kept = slots < size
+            self._reservoir[slots[if_kept]] = obs[n_fill:][if_kept]
+
+        self._n = n
+
+    def get_n(self):
+        return self._n
+
+    def get_mean(self):
+        return self._mean if self._n > 0 else math.nan
+
+    def get_stdev(self):
+        return math.sqrt(self._sumSqDev / (self._n - 1)) if self._n > 1 else math.nan
+
+    def get_min(self):
+        return self._min
+
+    def get_max(self):
+        return self._max
+
+    def get_sample(self):
+        """
+        :return: (array) observations kept in the reservoir (a uniform random sample of all observations)
+        """
+        return self._reservoir[:min(self._n, len(self._reservoir))]
+
+    def get_percentile(self, q):
+        """
+        :param q: percentile to compute (q in range [0, 100])
+        :return: approximate percentile (calculated from the observations kept in the reservoir)
+        """
+        return float(np.percentile(self.get_sample(), q))
+
+    def get_t_half_length(self, alpha):
+        """
+        :param alpha: significance level (between 0 and 1)
+        :return: half-length of 100(1-alpha)% t-confidence interval
+        """
+        if self._n > 1:
+            return stat.t.ppf(1 - alpha / 2, self._n - 1) * self.get_stdev() / math.sqrt(self._n)
+        else:
+            return math.nan
+
+    def get_t_CI(self, alpha):
+        """
+        :param alpha: significance level (between 0 and 1)
+        :return: t-based confidence interval for population mean in the format of list [l, u]
+        """
+        half_length = self.get_t_half_length(alpha)
+        return [self.get_mean() - half_length, self.get_mean() + half_length]
+
+    def get_PI(self, alpha):
+        """
+        :param alpha: significance level (between 0 and 1)
+        :return: approximate percentile interval in the format of list [l, u]
+        """
+        return [self.get_percentile(100 * alpha / 2), self.get_percentile(100 * (1 - alpha / 2))]
+
+    def get_interval(self, interval_type='c', alpha=0.05, multiplier=1):
+        """
+        :param interval_type: (string) 'c' for t-based confidence interval and 'p' for percentile interval
+        :param alpha: significance level
+        :param multiplier: to multiply the interval by the provided value
+        :return: a list [L, U]
+        """
+        if interval_type == 'c':
+            interval = self.get_t_CI(alpha)
+        elif interval_type == 'p':
+            interval = self.get_PI(alpha)
+        else:
+            raise ValueError("Invalid interval type '{}' (only 'c' and 'p' are supported).".format(interval_type))
+        return [multiplier * interval[0], multiplier * interval[1]]
+
+    def get_formatted_mean_and_interval(self, interval_type='c', alpha=0.05, deci=0, form=None, multiplier=1):
+        """
+        :param interval_type: (string) 'c' for t-based confidence interval and 'p' for percentile interval
+        :param alpha: significance level
+        :param deci: digits to round the numbers to
+        :param form: ',' to format number with thousands separator, '$' for currency, '%' for percentage
+        :param multiplier: to multiply the estimate and the interval by the provided value
+        :return: (string) estimate and interval formatted as 'mean (L, U)'
+        """
+        return format_estimate_interval(
+            estimate=multiplier * self.get_mean(),
+            interval=self.get_interval(interval_type=interval_type, alpha=alpha, multiplier=multiplier),
+            deci=deci, form=form)
+
+
+class DifferenceStreamingStatIndp:
+    """ summary statistics of the difference between the means of two independent streaming statistics """
+
+    def __init__(self, name, x, y_ref):
+        """
+        :param name: name of this statistics
+        :param x: (StreamingStat) statistics of the first sample
+        :param y_ref: (StreamingStat) statistics of the reference sample
+        """
+        self.name = name
+        self._x = x
+        self._yRef = y_ref
+
+    def get_mean(self):
+        return self._x.get_mean() - self._yRef.get_mean()
+
+    def get_t_CI(self, alpha):
+        """ Welch's t-based confidence interval for the difference of means
+        :param alpha: significance level (between 0 and 1)
+        :return: a list [l, u]
+        """
+
+        var_x = self._x.get_stdev() ** 2 / self._x.get_n()
+        var_y = self._yRef.get_stdev() ** 2 / self._yRef.get_n()
+        # Welch-Satterthwaite degrees of freedom
+        df = (var_x + var_y) ** 2 / (var_x ** 2 / (self._x.get_n() - 1) + var_y ** 2 / (self._yRef.get_n() - 1))
+        half_length = stat.t.ppf(1 - alpha / 2, df) * math.sqrt(var_x + var_y)
+
+        return [self.get_mean() - half_length, self.get_mean() + half_length]
+
+    def get_PI(self, alpha):
+        """ approximate percentile interval of the difference (from the observations kept in the reservoirs)
+        :param alpha: significance level (between 0 and 1)
+        :return: a list [l, u]
+        """
+
+        x = self._x.get_sample()
+        y = self._yRef.get_sample()
+        n = min(len(x), len(y))
+        diff = x[:n] - y[:n]
+
+        return [float(np.percentile(diff, 100 * alpha / 2)), float(np.percentile(diff, 100 * (1 - alpha / 2)))]
+
+    def get_interval(self, interval_type='c', alpha=0.05, multiplier=1):
+        return StreamingStat.get_interval(self, interval_type=interval_type, alpha=alpha, multiplier=multiplier)
+
+    def get_formatted_mean_and_interval(self, interval_type='c', alpha=0.05, deci=0, form=None, multiplier=1):
+        return StreamingStat.get_formatted_mean_and_interval(
+            self, interval_type=interval_type, alpha=alpha, deci=deci, form=form, multiplier=multiplier)
+
+
+class StreamingCovariance:
+    """ covariance of paired observations that is updated as observations arrive """
+
+    def __init__(self, name):
+        """
+        :param name: name of this statistics
+        """
+        self.name = name
+        self._n = 0             # number of pairs
+        self._meanX = 0         # sample mean of the first observations
+        self._meanY = 0         # sample mean of the second observations
+        self._sumCrossDev = 0   # sum of the products of the deviations from the sample means
+
+    def record_batch(self, x, y):
+        """ records a batch of paired observations
+        :param x: (array) first observations
+        :param y: (array) second observations (of the same size)
+        """
+
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        n_batch = len(x)
+        if n_batch == 0:
+            return
+
+        # merge the co-moment of the batch with the current one
+        mean_x, mean_y = x.mean(), y.mean()
+        delta_x, delta_y = mean_x - self._meanX, mean_y - self._meanY
+        n = self._n + n_batch
+        self._sumCrossDev += ((x - mean_x) * (y - mean_y)).sum() + delta_x * delta_y * self._n * n_batch / n
+        self._meanX += delta_x * n_batch / n
+        self._meanY += delta_y * n_batch / n
+        self._n = n
+
+    def get_n(self):
+        return self._n
+
+    def get_covariance(self):
+        return self._sumCrossDev / (self._n - 1) if self._n > 1 else math.nan
+
+
+class StreamingHistogram:
+    """ counts of observations in bins of fixed width starting at 0 """
+
+    def __init__(self, bin_width=1):
+        """
+        :param bin_width: width of bins
+        """
+        self.binWidth = bin_width
+        self.counts = np.zeros(0, dtype=int)    # counts[k] is the number of observations in [k*w, (k+1)*w)
+
+    def record_batch(self, obs):
+        """ records a batch of (non-negative) observations
+        :param obs: (array) observations
+        """
+
+        bins = np.floor(np.asarray(obs, dtype=float) / self.binWidth).astype(int)
+        counts = np.bincount(bins, minlength=len(self.counts))
+        counts[:len(self.counts)] += self.counts
+        self.counts = counts
+
+    def get_bin_edges(self):
+        """
+        :return: (array) edges of the bins
+        """
+        return self.binWidth * np.arange(len(self.counts) + 1)
+
+
+def format_estimate_interval(estimate, interval, deci, form=None):
+    """
+    :param estimate: estimate
+    :param interval: interval in the format of list [l, u]
+    :param deci: digits to round the numbers to
+    :param form: ',' to format number with thousands separator, '$' for currency, '%' for percentage
+    :return: (string) 'estimate (l, u)'
+    """
+
+    def format_number(number):
+        if form == ',':
+            return '{:,.{prec}f}'.format(number, prec=deci)
+        elif form == '$':
+            return '${:,.{prec}f}'.format(number, prec=deci)
+        elif form == '%':
+            return '{:.{prec}%}'.format(number, prec=deci)
+        else:
+            return '{:.{prec}f}'.format(number, prec=deci)
+
+    return '{} ({}, {})'.format(format_number(estimate), format_number(interval[0]), format_number(interval[1]))
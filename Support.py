@@ -1,8 +1,13 @@
+import csv
+
+import numpy as np
+import scipy.stats as stat
+
 import InputData as D
-import SimPy.EconEval as Econ
-import SimPy.Plots.Histogram as Hist
-import SimPy.Plots.SamplePaths as Path
+import PlotSupport as Plots
 import SimPy.Statistics as Stat
+import StreamingStatClasses as Streaming
+from MarkovModelClasses import StreamingCohortOutcomes
 
 
 def print_outcomes(sim_outcomes, therapy_name):
@@ -54,6 +59,12 @@ def plot_survival_curves_and_histograms(sim_outcomes_without, sim_outcomes_with)
     :param sim_outcomes_combo: outcomes of a cohort simulated under combination therapy
     """
 
+    # no figures in headless mode
+    if not Plots.if_plotting():
+        return
+    Hist = Plots.import_module('SimPy.Plots.Histogram')
+    Path = Plots.import_module('SimPy.Plots.SamplePaths')
+
     # get survival curves of both treatments
     survival_curves = [
         sim_outcomes_without.nLivingPatients,
@@ -69,8 +80,21 @@ def plot_survival_curves_and_histograms(sim_outcomes_without, sim_outcomes_with)
         legends=['Without Vaccine', 'With Vaccine'],
         color_codes=['green', 'blue']
     )
+    Plots.save(title='Survival curve')
+
+    # histograms of survival times (streaming outcomes only keep the histogram of survival times)
+    if isinstance(sim_outcomes_without, StreamingCohortOutcomes):
+        _plot_binned_histograms(
+            histograms=[sim_outcomes_without.survivalTimeHistogram, sim_outcomes_with.survivalTimeHistogram],
+            title='Histogram of patient survival time',
+            x_label='Survival time (year)',
+            y_label='Counts',
+            legends=['Without Vaccine', 'With Vaccine'],
+            color_codes=['green', 'blue'],
+            transparency=0.6
+        )
+        return
 
-    # histograms of survival times
     set_of_survival_times = [
         sim_outcomes_without.survivalTimes,
         sim_outcomes_with.survivalTimes
@@ -87,6 +111,7 @@ def plot_survival_curves_and_histograms(sim_outcomes_without, sim_outcomes_with)
         color_codes=['green', 'blue'],
         transparency=0.6
     )
+    Plots.save(title='Histogram of patient survival time')
 
 
 def print_comparative_outcomes(sim_outcomes_without, sim_outcomes_with):
@@ -97,10 +122,12 @@ def print_comparative_outcomes(sim_outcomes_without, sim_outcomes_with):
     """
 
     # increase in mean survival time under combination therapy with respect to mono therapy
-    increase_survival_time = Stat.DifferenceStatIndp(
+    increase_survival_time = _get_difference_stat_indp(
         name='Increase in mean survival time',
-        x=sim_outcomes_with.survivalTimes,
-        y_ref=sim_outcomes_without.survivalTimes)
+        sim_outcomes=sim_outcomes_with,
+        sim_outcomes_ref=sim_outcomes_without,
+        data_name='survivalTimes',
+        stat_name='statSurvivalTime')
 
     # estimate and CI
     estimate_CI = increase_survival_time.get_formatted_mean_and_interval(interval_type='c',
@@ -111,10 +138,12 @@ def print_comparative_outcomes(sim_outcomes_without, sim_outcomes_with):
           estimate_CI)
 
     # increase in mean discounted cost under combination therapy with respect to mono therapy
-    increase_discounted_cost = Stat.DifferenceStatIndp(
+    increase_discounted_cost = _get_difference_stat_indp(
         name='Increase in mean discounted cost',
-        x=sim_outcomes_with.costs,
-        y_ref=sim_outcomes_without.costs)
+        sim_outcomes=sim_outcomes_with,
+        sim_outcomes_ref=sim_outcomes_without,
+        data_name='costs',
+        stat_name='statCost')
 
     # estimate and CI
     estimate_CI = increase_discounted_cost.get_formatted_mean_and_interval(interval_type='c',
@@ -126,10 +155,12 @@ def print_comparative_outcomes(sim_outcomes_without, sim_outcomes_with):
           estimate_CI)
 
     # increase in mean discounted utility under combination therapy with respect to mono therapy
-    increase_discounted_utility = Stat.DifferenceStatIndp(
+    increase_discounted_utility = _get_difference_stat_indp(
         name='Increase in mean discounted utility',
-        x=sim_outcomes_with.utilities,
-        y_ref=sim_outcomes_without.utilities)
+        sim_outcomes=sim_outcomes_with,
+        sim_outcomes_ref=sim_outcomes_without,
+        data_name='utilities',
+        stat_name='statUtility')
 
     # estimate and CI
     estimate_CI = increase_discounted_utility.get_formatted_mean_and_interval(interval_type='c',
@@ -140,12 +171,63 @@ def print_comparative_outcomes(sim_outcomes_without, sim_outcomes_with):
           estimate_CI)
 
 
-def report_CEA_CBA(sim_outcomes_without, sim_outcomes_with):
+def _get_difference_stat_indp(name, sim_outcomes, sim_outcomes_ref, data_name, stat_name):
+    """
+    :param name: name of the statistics
+    :param sim_outcomes: outcomes of a simulated cohort
+    :param sim_outcomes_ref: outcomes of the simulated reference cohort
+    :param data_name: name of the patient-level outcomes (e.g. 'costs')
+    :param stat_name: name of the summary statistics of these outcomes (e.g. 'statCost')
+    :return: summary statistics of the difference between the means of these outcomes
+    """
+
+    # streaming outcomes only keep the summary statistics
+    if isinstance(sim_outcomes, StreamingCohortOutcomes):
+        return Streaming.DifferenceStreamingStatIndp(name=name,
+                                                     x=getattr(sim_outcomes, stat_name),
+                                                     y_ref=getattr(sim_outcomes_ref, stat_name))
+    else:
+        return Stat.DifferenceStatIndp(name=name,
+                                       x=getattr(sim_outcomes, data_name),
+                                       y_ref=getattr(sim_outcomes_ref, data_name))
+
+
+def _plot_binned_histograms(histograms, title, x_label, y_label, legends, color_codes, transparency):
+    """ plots histograms whose counts are already binned
+    :param histograms: (list) of StreamingHistogram
+    """
+
+    fig, ax = Plots.get_pyplot().subplots()
+    for histogram, legend, color in zip(histograms, legends, color_codes):
+        edges = histogram.get_bin_edges()
+        ax.hist(x=edges[:-1], bins=edges, weights=histogram.counts,
+                label=legend, color=color, alpha=transparency, edgecolor='black', linewidth=1)
+    ax.set_title(title)
+    ax.set_xlabel(x_label)
+    ax.set_ylabel(y_label)
+    ax.legend()
+    Plots.show(title=title)
+
+
+def report_CEA_CBA(sim_outcomes_without, sim_outcomes_with, if_paired=False):
     """ performs cost-effectiveness and cost-benefit analyses
-    :param sim_outcomes_mono: outcomes of a cohort simulated under mono therapy
-    :param sim_outcomes_combo: outcomes of a cohort simulated under combination therapy
+    :param sim_outcomes_without: outcomes of a cohort simulated without vaccine
+    :param sim_outcomes_with: outcomes of a cohort simulated with vaccine
+    :param if_paired: set to True if the same patients are simulated in both cohorts with common random
+                      numbers (see MarkovModelClasses.PairedCohort)
     """
 
+    # streaming outcomes only keep the summary statistics
+    if isinstance(sim_outcomes_without, StreamingCohortOutcomes) or \
+            isinstance(sim_outcomes_with, StreamingCohortOutcomes):
+        if if_paired:
+            raise ValueError('Paired analyses need the outcomes of each patient, which streaming outcomes '
+                             'do not store.')
+        _report_streaming_CEA_CBA(sim_outcomes_without=sim_outcomes_without, sim_outcomes_with=sim_outcomes_with)
+        return
+
+    Econ = Plots.import_module('SimPy.EconEval')
+
     # define two strategies
     nonvax_therapy_strategy = Econ.Strategy(
         name='NON VAX Therapy',
@@ -164,18 +246,20 @@ def report_CEA_CBA(sim_outcomes_without, sim_outcomes_with):
     # (the first strategy in the list of strategies is assumed to be the 'Base' strategy)
     CEA = Econ.CEA(
         strategies=[nonvax_therapy_strategy, vax_therapy_strategy],
-        if_paired=False
+        if_paired=if_paired
     )
 
     # plot cost-effectiveness figure
-    CEA.plot_CE_plane(
-        title='Cost-Effectiveness Analysis',
-        x_label='Additional QALYs',
-        y_label='Additional Cost',
-        x_range=(-1, 5),
-        y_range=(-1000, 5000),
-        interval_type='c'  # to show confidence intervals for cost and effect of each strategy
-    )
+    if Plots.if_plotting():
+        CEA.plot_CE_plane(
+            title='Cost-Effectiveness Analysis',
+            x_label='Additional QALYs',
+            y_label='Additional Cost',
+            x_range=(-1, 5),
+            y_range=(-1000, 5000),
+            interval_type='c'  # to show confidence intervals for cost and effect of each strategy
+        )
+        Plots.save(title='Cost-Effectiveness Analysis')
 
     # report the CE table
     CEA.build_CE_table(
@@ -186,11 +270,15 @@ def report_CEA_CBA(sim_outcomes_without, sim_outcomes_with):
         icer_digits=2,
         file_name='CETable.csv')
 
+    # the CBA only draws a figure
+    if not Plots.if_plotting():
+        return
+
     # CBA
     NBA = Econ.CBA(
         strategies=[nonvax_therapy_strategy, vax_therapy_strategy],
         wtp_range=[0, 1000],
-        if_paired=False
+        if_paired=if_paired
     )
     # show the net monetary benefit figure
     NBA.plot_incremental_nmbs(
@@ -200,4 +288,76 @@ def report_CEA_CBA(sim_outcomes_without, sim_outcomes_with):
         interval_type='c',
         show_legend=True,
         figure_size=(6, 5)
-    )
\ No newline at end of file
+    )
+    Plots.save(title='Cost-Benefit Analysis')
+
+
+def _report_streaming_CEA_CBA(sim_outcomes_without, sim_outcomes_with, wtp_range=(0, 1000), n_wtps=101,
+                              file_name='CETableStreaming.csv'):
+    """ performs cost-effectiveness and cost-benefit analyses of streaming outcomes (from the means, variances
+    and covariances of the discounted costs and utilities of the two independent cohorts)
+    :param sim_outcomes_without: (StreamingCohortOutcomes) outcomes of a cohort simulated without vaccine
+    :param sim_outcomes_with: (StreamingCohortOutcomes) outcomes of a cohort simulated with vaccine
+    :param wtp_range: range of willingness-to-pay values of the cost-benefit analysis
+    :param n_wtps: number of willingness-to-pay values
+    :param file_name: csv file to write the CE table to (the table of SimPy.EconEval needs the outcomes of each
+                      patient, so this table has its own layout and is not written to CETable.csv)
+    """
+
+    strategies = [('NON VAX Therapy', sim_outcomes_without), ('VAX Therapy', sim_outcomes_with)]
+
+    # CE table (the cheaper strategy is the base; the other is dominated if it is not more effective)
+    (base_name, base), (other_name, other) = sorted(strategies, key=lambda strategy: strategy[1].statCost.get_mean())
+    rows = []
+    for name, outcomes in ((base_name, base), (other_name, other)):
+        rows.append({'Strategy': name,
+                     'Cost': outcomes.statCost.get_formatted_mean_and_interval(
+                         interval_type='c', alpha=D.ALPHA, deci=0, form=','),
+                     'Effect': outcomes.statUtility.get_formatted_mean_and_interval(
+                         interval_type='c', alpha=D.ALPHA, deci=2),
+                     'Incremental Cost': '-', 'Incremental Effect': '-', 'ICER': '-'})
+
+    incremental_cost = Streaming.DifferenceStreamingStatIndp(
+        name='Incremental cost', x=other.statCost, y_ref=base.statCost)
+    incremental_effect = Streaming.DifferenceStreamingStatIndp(
+        name='Incremental effect', x=other.statUtility, y_ref=base.statUtility)
+    if incremental_effect.get_mean() <= 0:
+        rows[1]['ICER'] = 'Dominated'
+    else:
+        rows[1]['Incremental Cost'] = incremental_cost.get_formatted_mean_and_interval(
+            interval_type='c', alpha=D.ALPHA, deci=0, form=',')
+        rows[1]['Incremental Effect'] = incremental_effect.get_formatted_mean_and_interval(
+            interval_type='c', alpha=D.ALPHA, deci=2)
+        rows[1]['ICER'] = '{:,.2f}'.format(incremental_cost.get_mean() / incremental_effect.get_mean())
+
+    with open(file_name, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    # the CBA only draws a figure
+    if not Plots.if_plotting():
+        return
+
+    # incremental net monetary benefit of vaccination and its confidence interval at each willingness-to-pay
+    # (the variance of the mean NMB of each cohort is wtp^2 var(utility) + var(cost) - 2 wtp cov(cost, utility))
+    wtps = np.linspace(wtp_range[0], wtp_range[1], n_wtps)
+    means = np.zeros(n_wtps)
+    variances = np.zeros(n_wtps)
+    for sign, outcomes in ((-1, sim_outcomes_without), (1, sim_outcomes_with)):
+        n = outcomes.statCost.get_n()
+        means += sign * (wtps * outcomes.statUtility.get_mean() - outcomes.statCost.get_mean())
+        variances += (wtps ** 2 * outcomes.statUtility.get_stdev() ** 2 + outcomes.statCost.get_stdev() ** 2
+                      - 2 * wtps * outcomes.covCostUtility.get_covariance()) / n
+    df = sim_outcomes_without.statCost.get_n() + sim_outcomes_with.statCost.get_n() - 2
+    half_widths = stat.t.ppf(1 - D.ALPHA / 2, df) * np.sqrt(variances)
+
+    fig, ax = Plots.get_pyplot().subplots(figsize=(6, 5))
+    ax.plot(wtps, means, color='blue', label='VAX Therapy')
+    ax.fill_between(wtps, means - half_widths, means + half_widths, color='blue', alpha=0.2)
+    ax.axhline(0, color='black', linewidth=0.5)
+    ax.set_title('Cost-Benefit Analysis')
+    ax.set_xlabel('Willingness-to-pay per QALY ($)')
+    ax.set_ylabel('Incremental Net Monetary Benefit ($)')
+    ax.legend()
+    Plots.show(title='Cost-Benefit Analysis')
@@ -0,0 +1,102 @@
+import numpy as np
+
+
+def get_time_grid(sim_length, time_step=1):
+    """
+    :param sim_length: simulation length
+    :param time_step: (maximum) time between the points of the grid
+    :return: (array) equally spaced time points from 0 to the simulation length
+    """
+    return np.linspace(0, sim_length, int(np.ceil(sim_length / time_step)) + 1)
+
+
+class SurvivalCurve:
+    """ number of alive patients at the points of a fixed time grid """
+
+    def __init__(self, time_grid, n_alive):
+        """
+        :param time_grid: (array) time points
+        :param n_alive: (array) number of alive patients at these time points
+        """
+        self.timeGrid = np.asarray(time_grid, dtype=float)
+        self.nAlive = np.asarray(n_alive, dtype=float)
+
+    @staticmethod
+    def from_death_times(death_times, initial_size, time_grid, n_deaths=None):
+        """
+        :param death_times: (array) times of deaths
+        :param initial_size: number of patients alive at time 0
+        :param time_grid: (array) time points
+        :param n_deaths: (array) number of deaths at each time of death (1 if not provided)
+        :return: (SurvivalCurve) survival curve of these deaths on the time grid
+        """
+
+        # number of deaths between consecutive time points
+        counts, _ = np.histogram(death_times, bins=time_grid, weights=n_deaths)
+
+        return SurvivalCurve(time_grid=time_grid,
+                             n_alive=initial_size - np.concatenate(([0], np.cumsum(counts))))
+
+    @staticmethod
+    def from_histogram(histogram, initial_size, time_grid):
+        """
+        :param histogram: (StreamingHistogram) histogram of the times of deaths
+        :param initial_size: number of patients alive at time 0
+        :param time_grid: (array) time points
+        :return: (SurvivalCurve) survival curve of these deaths on the time grid (the same as the curve of the
+                 times of deaths if the time points are edges of the bins of the histogram)
+        """
+
+        time_grid = np.asarray(time_grid, dtype=float)
+        n_bins = len(time_grid) - 1
+        if not np.allclose(time_grid, histogram.binWidth * np.arange(len(time_grid))):
+            # deaths are placed at the start of the bin they occurred in
+            return SurvivalCurve.from_death_times(death_times=histogram.get_bin_edges()[:-1],
+                                                  n_deaths=histogram.counts,
+                                                  initial_size=initial_size,
+                                                  time_grid=time_grid)
+
+        # the bins of the histogram are the intervals of the grid (deaths at the last time point are
+        # counted in the last interval, as in from_death_times)
+        counts = np.bincount(np.minimum(np.arange(len(histogram.counts)), n_bins - 1),
+                             weights=histogram.counts, minlength=n_bins)
+
+        return SurvivalCurve(time_grid=time_grid,
+                             n_alive=initial_size - np.concatenate(([0], np.cumsum(counts))))
+
+    def get_times(self):
+        return self.timeGrid
+
+    def get_values(self):
+        return self.nAlive
+
+
+class SurvivalCurveBands:
+    """ survival curves of multiple cohorts (on the same time grid) stacked in a 2D array """
+
+    def __init__(self, survival_curves):
+        """
+        :param survival_curves: (list) of SurvivalCurve with the same time grid
+        """
+        self.timeGrid = survival_curves[0].timeGrid
+        self.nAlive = np.vstack([curve.nAlive for curve in survival_curves])  # cohorts x time points
+
+    def get_mean(self):
+        """
+        :return: (array) mean number of alive patients at each time point
+        """
+        return self.nAlive.mean(axis=0)
+
+    def get_median(self):
+        """
+        :return: (array) median number of alive patients at each time point
+        """
+        return np.median(self.nAlive, axis=0)
+
+    def get_percentile_interval(self, alpha):
+        """
+        :param alpha: significance level
+        :return: (lower, upper) arrays of the 100*alpha/2 and 100*(1-alpha/2) percentiles at each time point
+        """
+        lower, upper = np.percentile(self.nAlive, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+        return lower, upper
@@ -0,0 +1,152 @@
+import numpy as np
+from scipy.linalg import expm
+
+import InputData as Data
+from AnalyticEngine import get_generator
+from InputData import HealthStates
+
+
+def get_prob_matrices(rate_matrices, cycle_length=1):
+    """ converts transition rate matrices into the transition probability matrices of a cycle
+    :param rate_matrices: (array) a transition rate matrix or a stack of them (the diagonal elements are ignored)
+    :param cycle_length: length of a cycle (years)
+    :return: (array) transition probability matrices (of the same shape as rate_matrices)
+    """
+
+    rate_matrices = np.asarray(rate_matrices, dtype=float)
+    generators = np.array([get_generator(rates) for rates in rate_matrices.reshape((-1,) + rate_matrices.shape[-2:])])
+
+    return expm(generators * cycle_length).reshape(rate_matrices.shape)
+
+
+def get_observed_prob_matrix():
+    """
+    :return: (array) annual transition probability matrix estimated from data (InputData.TRANS_PROB_MATRIX)
+             note: the states of this matrix are Well, COVID (not hospitalized), COVID (hospitalized), COVID death
+             and natural death, which are not the states of the model (HealthStates has a post-COVID state instead
+             of the hospitalized COVID state), so this matrix can be traced with get_traces but get_outcomes
+             (which uses the costs and utilities of HealthStates) does not accept it
+    """
+    return np.array(Data.TRANS_PROB_MATRIX, dtype=float)
+
+
+def get_traces(prob_matrices, initial_state_index, n_cycles):
+    """ propagates the state distribution of cohorts through transition probability matrices
+    :param prob_matrices: (array) stack of transition probability matrices (n_cohorts x n_states x n_states)
+    :param initial_state_index: index of the initial state
+    :param n_cycles: number of cycles
+    :return: (array) traces (n_cohorts x (n_cycles+1) x n_states) where traces[k, t, i] is the proportion of
+             cohort k in state i at the beginning of cycle t
+    """
+
+    n_cohorts, n_states, _ = prob_matrices.shape
+    traces = np.zeros((n_cohorts, n_cycles + 1, n_states))
+    traces[:, 0, initial_state_index] = 1
+    for t in range(n_cycles):
+        traces[:, t + 1] = np.einsum('ki,kij->kj', traces[:, t], prob_matrices)
+
+    return traces
+
+
+def get_outcomes(rate_matrices, annual_state_costs, annual_state_utilities, sim_length,
+                 discount_rate=Data.DISCOUNT, annual_treatment_costs=0, initial_state_index=HealthStates.WELL.value,
+                 cycle_length=1, if_half_cycle_correction=True):
+    """ calculates the outcomes of cohorts from their Markov traces
+    :param rate_matrices: (array) transition rate matrix of the states of HealthStates or a stack of them
+                          (n_cohorts x n_states x n_states); the diagonal elements are ignored
+    :param annual_state_costs: (array) annual cost of each state (n_states or n_cohorts x n_states)
+    :param annual_state_utilities: (array) annual utility of each state (n_states or n_cohorts x n_states)
+    :param sim_length: simulation length (years)
+    :param discount_rate: annual discount rate
+    :param annual_treatment_costs: annual treatment cost (a number or an array of size n_cohorts)
+    :param initial_state_index: index of the initial state
+    :param cycle_length: length of a cycle (years)
+    :param if_half_cycle_correction: set to True to weight the first and the last time point by 1/2
+                                     (trapezoidal rule) instead of counting outcomes at the start of each cycle
+    :return: a dictionary of arrays of size n_cohorts with keys 'survival probability', 'life years',
+             'number of COVID', 'cost' and 'utility', and the traces under the key 'trace'
+    """
+
+    rate_matrices = np.asarray(rate_matrices, dtype=float)
+    if rate_matrices.shape[-2:] != (len(HealthStates), len(HealthStates)):
+        raise ValueError('The transition rate matrices should be {0} x {0} (one row and column for each state of '
+                         'HealthStates), but they are {1} x {2}.'.format(len(HealthStates), *rate_matrices.shape[-2:]))
+    # transition probability matrices (such as get_observed_prob_matrix()) have rows that sum to 1 and non-zero
+    # diagonals, while the diagonals of transition rate matrices are 0 (or ignored)
+    if np.any(np.all(np.isclose(rate_matrices.sum(axis=-1), 1), axis=-1)
+              & np.any(np.diagonal(rate_matrices, axis1=-2, axis2=-1) > 0, axis=-1)):
+        raise ValueError('get_outcomes takes transition rate matrices of the states of HealthStates, not transition '
+                         'probability matrices (the states of get_observed_prob_matrix() are not those of '
+                         'HealthStates).')
+    if_single = rate_matrices.ndim == 2
+    if if_single:
+        rate_matrices = rate_matrices[np.newaxis]
+
+    # rate matrices with zero diagonals
+    rates = rate_matrices.copy()
+    rates[:, range(len(HealthStates)), range(len(HealthStates))] = 0
+
+    n_cycles = int(round(sim_length / cycle_length))
+    prob_matrices = get_prob_matrices(rate_matrices=rates, cycle_length=cycle_length)
+    traces = get_traces(prob_matrices=prob_matrices, initial_state_index=initial_state_index, n_cycles=n_cycles)
+
+    # states patients never leave (costs and utilities do not accrue in these states)
+    if_absorbing = rates.sum(axis=2) == 0
+
+    # weight and discount factor of each time point
+    weights = np.ones(n_cycles + 1)
+    if if_half_cycle_correction:
+        weights[[0, -1]] = 0.5
+    else:
+        weights[-1] = 0
+    times = cycle_length * np.arange(n_cycles + 1)
+    discounted_weights = weights / (1 + discount_rate) ** times
+
+    # payments per cycle
+    cycle_costs = cycle_length * (np.asarray(annual_state_costs, dtype=float)
+                                  + np.reshape(annual_treatment_costs, (-1, 1)))
+    cycle_utilities = cycle_length * np.broadcast_to(np.asarray(annual_state_utilities, dtype=float), if_absorbing.shape)
+    cycle_costs = np.where(if_absorbing, 0, np.broadcast_to(cycle_costs, if_absorbing.shape))
+    cycle_utilities = np.where(if_absorbing, 0, cycle_utilities)
+
+    # expected (discounted) number of cycles spent in each state
+    occupancy = np.einsum('t,kti->ki', weights, traces)
+    discounted_occupancy = np.einsum('t,kti->ki', discounted_weights, traces)
+
+    # expected number of transitions into the COVID states (from the expected time spent in each state and the
+    # rates into the COVID states, as in AnalyticEngine; counting the transitions between the states at the end of
+    # consecutive cycles would miss the COVID episodes that start and end within a cycle)
+    covid_rates = rates[:, :, HealthStates.COVID.value] + rates[:, :, HealthStates.COVID_DEATH.value]
+    n_covid = cycle_length * (occupancy * covid_rates).sum(axis=1)
+
+    outcomes = {'survival probability': np.where(if_absorbing, 0, traces[:, -1]).sum(axis=1),
+                'life years': cycle_length * np.where(if_absorbing, 0, occupancy).sum(axis=1),
+                'number of COVID': n_covid,
+                'cost': (discounted_occupancy * cycle_costs).sum(axis=1),
+                'utility': (discounted_occupancy * cycle_utilities).sum(axis=1),
+                'trace': traces}
+
+    if if_single:
+        outcomes = {key: value[0] for key, value in outcomes.items()}
+
+    return outcomes
+
+
+def get_batch_outcomes(parameter_batch, sim_length, cycle_length=1, if_half_cycle_correction=True):
+    """ calculates the outcomes of the parameter sets of a batch from their Markov traces
+    :param parameter_batch: (ParameterBatch) parameter sets
+    :param sim_length: simulation length (years)
+    :param cycle_length: length of a cycle (years)
+    :param if_half_cycle_correction: set to True to use the half-cycle correction
+    :return: a dictionary of arrays (see get_outcomes)
+    """
+
+    return get_outcomes(rate_matrices=parameter_batch.transRateMatrices,
+                        annual_state_costs=parameter_batch.annualStateCosts,
+                        annual_state_utilities=parameter_batch.annualStateUtilities,
+                        sim_length=sim_length,
+                        discount_rate=parameter_batch.discountRate,
+                        annual_treatment_costs=parameter_batch.annualTreatmentCosts,
+                        initial_state_index=parameter_batch.initialHealthState.value,
+                        cycle_length=cycle_length,
+                        if_half_cycle_correction=if_half_cycle_correction)
@@ -0,0 +1,95 @@
+import numpy as np
+
+
+class TransitionSampler:
+    """ samples the time until the next event and the next state of a continuous-time Markov model
+    (a compiled version of the Gillespie algorithm that is built once and shared by all patients) """
+
+    def __init__(self, transition_rate_matrix):
+        """
+        :param transition_rate_matrix: transition rate matrix (the diagonal elements are ignored)
+        """
+
+        rates = np.array(transition_rate_matrix, dtype=float)
+        np.fill_diagonal(rates, 0)
+        self.nStates = len(rates)
+
+        # rate out of each state and whether the state is absorbing
+        self.exitRates = rates.sum(axis=1)
+        self.ifAbsorbing = self.exitRates == 0
+
+        # probabilities of jumping to each state (rows of absorbing states are all 0)
+        self.jumpProbs = rates / np.where(self.ifAbsorbing, 1, self.exitRates)[:, np.newaxis]
+        # cumulative probabilities of jumping to each state
+        self.jumpCDF = np.cumsum(self.jumpProbs, axis=1)
+        self.jumpCDF[~self.ifAbsorbing, -1] = 1
+
+        # alias tables for sampling the next state
+        self.aliasProbs = np.ones((self.nStates, self.nStates))
+        self.aliasIndices = np.tile(np.arange(self.nStates), (self.nStates, 1))
+        for i in np.flatnonzero(~self.ifAbsorbing):
+            self.aliasProbs[i], self.aliasIndices[i] = _build_alias_table(self.jumpProbs[i])
+
+        # python copies of the tables (indexing lists is faster than indexing arrays one element at a time)
+        self._scales = [None if a else 1 / r for a, r in zip(self.ifAbsorbing, self.exitRates)]
+        self._aliasProbs = self.aliasProbs.tolist()
+        self._aliasIndices = self.aliasIndices.tolist()
+
+    def get_next_state(self, current_state_index, rng):
+        """
+        :param current_state_index: index of the current state
+        :param rng: random number generator
+        :return: (dt, i) where dt is the time until next event, and i is the index of the next state
+                 (dt is None if the process is in an absorbing state)
+        """
+
+        scale = self._scales[current_state_index]
+
+        # the process stays in an absorbing state
+        if scale is None:
+            return None, current_state_index
+
+        # time until the next event
+        dt = rng.exponential(scale=scale)
+
+        # next state (alias method: pick a column uniformly, then the column or its alias)
+        u = rng.random_sample() * self.nStates
+        i = int(u)
+        if u - i >= self._aliasProbs[current_state_index][i]:
+            i = self._aliasIndices[current_state_index][i]
+
+        return dt, i
+
+
+def _build_alias_table(probs):
+    """ builds the alias table of a discrete distribution (Vose's method)
+    :param probs: probabilities of the outcomes
+    :return: (alias_probs, alias_indices) arrays
+    """
+
+    n = len(probs)
+    scaled = np.asarray(probs, dtype=float) * n
+    alias_probs = np.ones(n)
+    alias_indices = np.arange(n)
+
+    small = [i for i in range(n) if scaled[i] < 1]
+    large = [i for i in range(n) if scaled[i] >= 1]
+
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        # column s keeps outcome s with probability scaled[s] and otherwise returns l
+        alias_probs[s] = scaled[s]
+        alias_indices[s] = l
+        # move the excess of l into column s
+        scaled[l] -= 1 - scaled[s]
+        if scaled[l] < 1:
+            small.append(l)
+        else:
+            large.append(l)
+
+    # the remaining columns (only left due to rounding errors) always return their own outcome
+    for i in small + large:
+        alias_probs[i] = 1
+
+    return alias_probs, alias_indices
@@ -0,0 +1,114 @@
+import itertools
+
+import numpy as np
+
+import CostBenefitEngine as CBA
+
+
+def get_evpi(costs, qalys, wtps):
+    """ calculates the expected value of perfect information
+    :param costs: (array) costs of each draw under each strategy (draws x strategies)
+    :param qalys: (array) QALYs of each draw under each strategy (draws x strategies)
+    :param wtps: (array) willingness-to-pay values
+    :return: (array) EVPI at each willingness-to-pay value
+    """
+
+    nmbs = CBA.get_nmb_tensor(costs=costs, qalys=qalys, wtps=wtps)
+
+    # E[max over strategies] - max over strategies of E[NMB] (not negative apart from rounding errors)
+    return np.maximum(nmbs.max(axis=1).mean(axis=0) - nmbs.mean(axis=0).max(axis=0), 0)
+
+
+def get_evppi(costs, qalys, wtps, params, degree=2):
+    """ calculates the expected value of partial perfect information of a group of parameters with the
+    regression (non-nested) method: the expected NMB of each strategy given the parameters of the group is
+    estimated by a polynomial regression of the simulated NMBs on the sampled values of these parameters
+    :param costs: (array) costs of each draw under each strategy (draws x strategies)
+    :param qalys: (array) QALYs of each draw under each strategy (draws x strategies)
+    :param wtps: (array) willingness-to-pay values
+    :param params: (array) sampled values of the parameters of the group (draws x parameters)
+    :param degree: degree of the polynomial (with interactions between parameters)
+    :return: (array) EVPPI at each willingness-to-pay value
+    """
+
+    design = get_design_matrix(params=params, degree=degree)
+
+    # NMB is linear in costs and QALYs, so the regressions of costs and QALYs give the regression of NMB at
+    # every willingness-to-pay value
+    fitted_costs = design @ np.linalg.lstsq(design, costs, rcond=None)[0]
+    fitted_qalys = design @ np.linalg.lstsq(design, qalys, rcond=None)[0]
+    fitted_nmbs = CBA.get_nmb_tensor(costs=fitted_costs, qalys=fitted_qalys, wtps=wtps)
+
+    evppi = fitted_nmbs.max(axis=1).mean(axis=0) - fitted_nmbs.mean(axis=0).max(axis=0)
+
+    # EVPPI is not negative (small negative values are due to the regression error)
+    return np.maximum(evppi, 0)
+
+
+def get_design_matrix(params, degree=2):
+    """
+    :param params: (array) sampled values of parameters (draws x parameters)
+    :param degree: degree of the polynomial
+    :return: (array) design matrix with an intercept and all products of up to 'degree' standardized parameters
+             (parameters that do not vary are removed)
+    """
+
+    params = np.asarray(params, dtype=float).reshape(len(params), -1)
+
+    # remove parameters that do not vary (their standard deviation is not exactly 0 due to rounding errors, so
+    # they are found by their range) and standardize the others
+    params = params[:, np.ptp(params, axis=0) > 0]
+    params = (params - params.mean(axis=0)) / params.std(axis=0)
+
+    return get_polynomial_terms(params=params, degree=degree)
+
+
+def get_polynomial_terms(params, degree=2):
+    """
+    :param params: (array) values of parameters (draws x parameters)
+    :param degree: degree of the polynomial
+    :return: (array) an intercept and all products of up to 'degree' parameters (draws x terms)
+    """
+
+    # each term is the product of 'degree' columns of the parameters padded with a column of ones (so the
+    # terms of lower degrees, and the intercept, include the column of ones)
+    padded = np.column_stack((np.ones(len(params)), params))
+    indices = np.array(list(itertools.combinations_with_replacement(range(padded.shape[1]), degree)), dtype=int)
+
+    return np.prod(padded[:, indices], axis=2)
+
+
+def get_parameter_groups(param_sets):
+    """
+    :param param_sets: (list) sampled parameter sets (e.g. MultiCohort.paramSets)
+    :return: (dictionary) sampled values of each group of parameters (draws x parameters) with keys
+             'state costs' and 'state utilities' (the transition rates are not included because ParameterGenerator
+             does not sample them)
+    """
+    return {'state costs': np.array([param.annualStateCosts for param in param_sets], dtype=float),
+            'state utilities': np.array([param.annualStateUtilities for param in param_sets], dtype=float)}
+
+
+def get_multi_cohort_voi(multi_cohorts, wtps, degree=2):
+    """ calculates the EVPI and the EVPPI of each group of parameters from simulated multi-cohorts
+    :param multi_cohorts: (list) simulated multi-cohorts (one for each strategy, with the same ids)
+    :param wtps: (array) willingness-to-pay values
+    :param degree: degree of the polynomials of the EVPPI regressions
+    :return: (evpi, evppis) where evpi is an array and evppis is a dictionary of arrays (by group of parameters)
+    """
+
+    costs, qalys = CBA.get_outcome_arrays([multi_cohort.multiCohortOutcomes for multi_cohort in multi_cohorts])
+    n_draws = len(costs)
+
+    # parameters of all strategies (the parameters shared by the strategies are only included once)
+    groups = {}
+    for multi_cohort in multi_cohorts:
+        for name, values in get_parameter_groups(multi_cohort.paramSets[:n_draws]).items():
+            groups[name] = values if name not in groups else np.column_stack((groups[name], values))
+    groups = {name: np.unique(values, axis=1) for name, values in groups.items()}
+
+    evpi = get_evpi(costs=costs, qalys=qalys, wtps=wtps)
+    evppis = {name: get_evppi(costs=costs, qalys=qalys, wtps=wtps, params=values, degree=degree)
+              for name, values in groups.items()}
+
+    return evpi, evppis
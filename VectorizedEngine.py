@@ -0,0 +1,186 @@
+import numpy as np
+
+import Instrumentation as Inst
+
+from InputData import HealthStates
+
+# maximum number of patients that are advanced together (larger cohorts are simulated in batches)
+MAX_BATCH_SIZE = 100000
+# number of control variates returned for each patient (see simulate_cohort)
+N_CONTROLS = 2
+
+
+def get_pv_continuous_factors(t0, t1, discount_rate):
+    """ calculates the present value of a continuous payment of 1 per year received over [t0, t1]
+    (discounted continuously) for arrays of periods
+    :param t0: (array) start of the periods
+    :param t1: (array) end of the periods
+    :param discount_rate: discount rate
+    :return: (array) (exp(-discount_rate*t0) - exp(-discount_rate*t1))/discount_rate
+    """
+
+    if discount_rate == 0:
+        return t1 - t0
+    else:
+        return (np.exp(-discount_rate * t0) - np.exp(-discount_rate * t1)) / discount_rate
+
+
+def get_discounted_outcomes(parameters, patients, states, t0, t1, n_patients):
+    """ calculates the discounted cost and utility of patients from the periods they spent in each state
+    :param parameters: an instance of the parameters class
+    :param patients: (array) index of the patient of each period
+    :param states: (array) index of the state of each period
+    :param t0: (array) start of each period
+    :param t1: (array) end of each period
+    :param n_patients: number of patients
+    :return: (costs, utilities) arrays of size n_patients
+    """
+
+    pv_factors = get_pv_continuous_factors(t0=t0, t1=t1, discount_rate=parameters.discountRate)
+
+    annual_costs = np.array(parameters.annualStateCosts, dtype=float) + parameters.annualTreatmentCost
+    annual_utilities = np.array(parameters.annualStateUtilities, dtype=float)
+
+    costs = np.bincount(patients, weights=pv_factors * annual_costs[states], minlength=n_patients)
+    utilities = np.bincount(patients, weights=pv_factors * annual_utilities[states], minlength=n_patients)
+
+    return costs, utilities
+
+
+def get_discounted_occupancy(patients, states, t0, t1, n_patients, n_states, discount_rate):
+    """ calculates the discounted time each patient spends in each state from the periods they spent in each state
+    :param patients: (array) index of the patient of each period
+    :param states: (array) index of the state of each period
+    :param t0: (array) start of each period
+    :param t1: (array) end of each period
+    :param n_patients: number of patients
+    :param n_states: number of states
+    :param discount_rate: discount rate
+    :return: (array) discounted time spent in each state (n_patients x n_states)
+    """
+
+    pv_factors = get_pv_continuous_factors(t0=t0, t1=t1, discount_rate=discount_rate)
+
+    return np.bincount(patients * n_states + states, weights=pv_factors,
+                       minlength=n_patients * n_states).reshape(n_patients, n_states)
+
+
+def simulate_cohort(parameters, pop_size, sim_length, rng, if_antithetic=False, occupancy=None, events=None):
+    """ simulates a cohort by advancing all living patients together (Gillespie algorithm on NumPy arrays)
+    :param parameters: an instance of the parameters class
+    :param pop_size: population size of the cohort
+    :param sim_length: simulation length
+    :param rng: random number generator
+    :param if_antithetic: set to True to pair patients 2j and 2j+1 (patient 2j+1 uses 1-u wherever
+                          patient 2j uses the uniform random number u)
+    :param occupancy: (array) if provided, the discounted time each patient spends in each state is added to this
+                      array (pop_size x number of states)
+    :param events: (list) if provided, (patients, times, states) arrays of the patients who enter a new state, the
+                   times they enter it and the new states are appended to this list (starting with the initial states
+                   at time 0)
+    :return: (survival_times, n_covid, costs, utilities, controls) where survival_times is NaN for patients who
+             are alive at the end of the simulation, the first four are arrays of size pop_size and controls
+             (pop_size x N_CONTROLS) has the discounted number of COVID episodes and the discounted life years of
+             each patient (their expectations are calculated exactly by AnalyticEngine.get_expected_controls)
+    """
+
+    # rates out of each state and cumulative probabilities of jumping to each state
+    sampler = parameters.get_sampler()
+    exit_rates = sampler.exitRates
+    if_absorbing = sampler.ifAbsorbing
+    jump_cdf = sampler.jumpCDF
+
+    # annual payments in each state
+    annual_costs = np.array(parameters.annualStateCosts, dtype=float) + parameters.annualTreatmentCost
+    annual_utilities = np.array(parameters.annualStateUtilities, dtype=float)
+
+    # states that are counted as a COVID episode when entered
+    if_covid = np.zeros(sampler.nStates, dtype=bool)
+    if_covid[[HealthStates.COVID.value, HealthStates.COVID_DEATH.value]] = True
+
+    # state and clock of each patient
+    initial_state = parameters.initialHealthState.value
+    states = np.full(pop_size, initial_state)
+    times = np.zeros(pop_size)
+
+    # outcomes
+    survival_times = np.full(pop_size, np.nan)
+    n_covid = np.zeros(pop_size, dtype=int)
+    costs = np.zeros(pop_size)
+    utilities = np.zeros(pop_size)
+    controls = np.zeros((pop_size, N_CONTROLS))
+
+    if events is not None:
+        events.append((np.arange(pop_size), times.copy(), states.copy()))
+
+    # indices of patients who are not in an absorbing state and have not reached the end of the simulation
+    active = np.flatnonzero(~if_absorbing[states])
+
+    while active.size > 0:
+        current_states = states[active]
+
+        # uniform random numbers of all patients for their next event (the k-th event of a patient always
+        # uses the k-th numbers of its stream, so the stream of a patient does not depend on other patients)
+        u_time, u_jump = get_uniforms(rng=rng, size=pop_size, if_antithetic=if_antithetic)[:, active]
+
+        # time until next event (inverse of the exponential distribution)
+        t0 = times[active]
+        t1 = t0 - np.log1p(-u_time) / exit_rates[current_states]
+        # next states
+        new_states = (jump_cdf[current_states] <= u_jump[:, np.newaxis]).sum(axis=1)
+
+        # patients whose next event occurs beyond the simulation length stay in their current state
+        if_censored = t1 > sim_length
+        t1[if_censored] = sim_length
+
+        if Inst.ENABLED:
+            # (patients who stay in their current state are counted as transitions to the same state)
+            Inst.count_transitions(from_states=current_states,
+                                   to_states=np.where(if_censored, current_states, new_states),
+                                   state_names=[state.name for state in HealthStates])
+
+        # discounted cost and utility accumulated since the last event
+        pv_factors = get_pv_continuous_factors(t0=t0, t1=t1, discount_rate=parameters.discountRate)
+        costs[active] += pv_factors * annual_costs[current_states]
+        utilities[active] += pv_factors * annual_utilities[current_states]
+        controls[active, 1] += pv_factors
+        if occupancy is not None:
+            occupancy[active, current_states] += pv_factors
+
+        # move the patients who experience an event to their new states
+        moved = active[~if_censored]
+        new_states = new_states[~if_censored]
+        times[moved] = t1[~if_censored]
+        states[moved] = new_states
+        if events is not None:
+            events.append((moved, times[moved], new_states))
+
+        # update survival times and covid counts
+        if_died = if_absorbing[new_states]
+        survival_times[moved[if_died]] = times[moved[if_died]]
+        n_covid[moved] += if_covid[new_states]
+        controls[moved, 0] += if_covid[new_states] * np.exp(-parameters.discountRate * times[moved])
+
+        # patients who remain active
+        active = moved[~if_died]
+
+    return survival_times, n_covid, costs, utilities, controls
+
+
+def get_uniforms(rng, size, if_antithetic=False):
+    """
+    :param rng: random number generator
+    :param size: number of patients
+    :param if_antithetic: set to True to return 1-u for patient 2j+1 where u is the number of patient 2j
+    :return: (array) 2 x size uniform random numbers in [0, 1) (one for the time and one for the next state)
+    """
+
+    if not if_antithetic:
+        return rng.random_sample(size=(2, size))
+
+    u = rng.random_sample(size=(2, (size + 1) // 2))
+    uniforms = np.empty((2, size))
+    uniforms[:, 0::2] = u
+    # (1-u is in (0, 1], so it is kept below 1)
+    uniforms[:, 1::2] = np.minimum(1 - u[:, :size // 2], np.nextafter(1, 0))
+    return uniforms
@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+
+import AnalyticEngine as Analytic
+import MarkovModelClasses as Cls
+import TraceEngine as Trace
+from ParameterClasses import Parameters, Therapies
+
+SIM_LENGTH = 50     # simulation length (years)
+N_SE = 4            # simulated means should be within this many standard errors of the expected values
+
+
+def simulate_cohort(therapy, pop_size, engine, sim_length=SIM_LENGTH, cohort_id=1, parameters=None, **options):
+    """
+    :return: (Cohort) a simulated cohort
+    """
+    cohort = Cls.Cohort(id=cohort_id, pop_size=pop_size, parameters=parameters or Parameters(therapy=therapy),
+                        engine=engine, **options)
+    cohort.simulate(sim_length=sim_length)
+    return cohort
+
+
+def assert_mean_close(values, expected, n_se=N_SE):
+    values = np.asarray(values, dtype=float)
+    se = values.std(ddof=1) / np.sqrt(len(values))
+    assert abs(values.mean() - expected) <= n_se * se, (values.mean(), expected, se)
+
+
+@pytest.mark.parametrize('therapy', list(Therapies))
+@pytest.mark.parametrize('engine, pop_size', [(Cls.Engines.PATIENT, 2000), (Cls.Engines.VECTORIZED, 20000)])
+def test_simulated_means_agree_with_analytic(therapy, engine, pop_size):
+    expected = Analytic.get_expected_outcomes(parameters=Parameters(therapy=therapy), sim_length=SIM_LENGTH)
+    outcomes = simulate_cohort(therapy=therapy, pop_size=pop_size, engine=engine).cohortOutcomes
+
+    assert_mean_close(outcomes.costs, expected['cost'])
+    assert_mean_close(outcomes.utilities, expected['utility'])
+    assert_mean_close(outcomes.nTotalCOVID, expected['number of COVID'])
+    assert_mean_close(~outcomes.ifDied, expected['survival probability'])
+
+
+@pytest.mark.parametrize('therapy', list(Therapies))
+def test_trace_agrees_with_analytic(therapy):
+    params = Parameters(therapy=therapy)
+    expected = Analytic.get_expected_outcomes(parameters=params, sim_length=SIM_LENGTH)
+    outcomes = Trace.get_outcomes(rate_matrices=params.transRateMatrix,
+                                  annual_state_costs=params.annualStateCosts,
+                                  annual_state_utilities=params.annualStateUtilities,
+                                  sim_length=SIM_LENGTH,
+                                  discount_rate=params.discountRate,
+                                  annual_treatment_costs=params.annualTreatmentCost,
+                                  cycle_length=1 / 12)
+
+    assert outcomes['survival probability'] == pytest.approx(expected['survival probability'], rel=1e-9)
+    assert outcomes['life years'] == pytest.approx(expected['life years'], rel=1e-4)
+    assert outcomes['number of COVID'] == pytest.approx(expected['number of COVID'], rel=1e-3)
+    # (the trace discounts once per cycle and the analytic engine continuously)
+    assert outcomes['cost'] == pytest.approx(expected['cost'], rel=0.01)
+    assert outcomes['utility'] == pytest.approx(expected['utility'], rel=0.01)
+
+
+def test_trace_rejects_observed_prob_matrix():
+    params = Parameters(therapy=Therapies.WITHOUT)
+    with pytest.raises(ValueError):
+        Trace.get_outcomes(rate_matrices=Trace.get_observed_prob_matrix(),
+                           annual_state_costs=params.annualStateCosts,
+                           annual_state_utilities=params.annualStateUtilities,
+                           sim_length=SIM_LENGTH)
+
+
+@pytest.mark.parametrize('therapy', list(Therapies))
+def test_variance_reduction_is_unbiased_and_reduces_variance(therapy):
+    expected = Analytic.get_expected_outcomes(parameters=Parameters(therapy=therapy), sim_length=SIM_LENGTH)
+    outcomes = simulate_cohort(therapy=therapy, pop_size=10000, engine=Cls.Engines.VECTORIZED,
+                               if_antithetic=True, if_control_variate=True).cohortOutcomes
+
+    for samples, raw_values, expected_mean in ((outcomes.get_estimator_samples(outcomes.costs), outcomes.costs,
+                                                expected['cost']),
+                                               (outcomes.get_estimator_samples(outcomes.utilities),
+                                                outcomes.utilities, expected['utility'])):
+        assert_mean_close(samples, expected_mean)
+        # standard error of the variance-reduced estimate vs. the standard error of the raw mean
+        assert samples.std(ddof=1) / np.sqrt(len(samples)) < raw_values.std(ddof=1) / np.sqrt(len(raw_values))
+
+
+@pytest.mark.parametrize('engine', [Cls.Engines.PATIENT, Cls.Engines.VECTORIZED])
+def test_paired_cohort_matches_separate_cohorts(engine):
+    paired_cohort = Cls.PairedCohort(id=3, pop_size=500, parameters_ref=Parameters(therapy=Therapies.WITHOUT),
+                                     parameters=Parameters(therapy=Therapies.WITH), engine=engine)
+    paired_cohort.simulate(sim_length=SIM_LENGTH)
+    outcomes_ref = simulate_cohort(therapy=Therapies.WITHOUT, pop_size=500, engine=engine, cohort_id=3).cohortOutcomes
+    outcomes = simulate_cohort(therapy=Therapies.WITH, pop_size=500, engine=engine, cohort_id=3).cohortOutcomes
+
+    np.testing.assert_array_equal(paired_cohort.pairedOutcomes.incrementalCosts, outcomes.costs - outcomes_ref.costs)
+    np.testing.assert_array_equal(paired_cohort.pairedOutcomes.incrementalUtilities,
+                                  outcomes.utilities - outcomes_ref.utilities)
+
+
+@pytest.mark.parametrize('engine', [Cls.Engines.PATIENT, Cls.Engines.VECTORIZED])
+def test_reprice_reproduces_simulation(engine):
+    params = Parameters(therapy=Therapies.WITH)
+    outcomes = simulate_cohort(therapy=Therapies.WITH, pop_size=500, engine=engine, parameters=params,
+                               if_occupancy=True).cohortOutcomes
+
+    # with the same prices
+    costs, utilities = outcomes.reprice(annual_state_costs=params.annualStateCosts,
+                                        annual_state_utilities=params.annualStateUtilities,
+                                        annual_treatment_cost=params.annualTreatmentCost)
+    np.testing.assert_allclose(costs, outcomes.costs, rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(utilities, outcomes.utilities, rtol=1e-12, atol=1e-9)
+
+    # with other prices (the patients' paths do not depend on them)
+    new_params = Parameters(therapy=Therapies.WITH)
+    new_params.annualStateCosts = [100, 5000, 300, 0, 0]
+    new_params.annualStateUtilities = [0.95, 0.5, 0.8, 0, 0]
+    new_params.annualTreatmentCost = 70
+    new_outcomes = simulate_cohort(therapy=Therapies.WITH, pop_size=500, engine=engine,
+                                   parameters=new_params).cohortOutcomes
+    costs, utilities = outcomes.reprice(annual_state_costs=new_params.annualStateCosts,
+                                        annual_state_utilities=new_params.annualStateUtilities,
+                                        annual_treatment_cost=new_params.annualTreatmentCost)
+    np.testing.assert_allclose(costs, new_outcomes.costs, rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(utilities, new_outcomes.utilities, rtol=1e-12, atol=1e-9)
+
+
+@pytest.mark.parametrize('engine', [Cls.Engines.PATIENT, Cls.Engines.VECTORIZED])
+def test_event_history_matches_shorter_simulation(engine):
+    horizon, discount_rate = 20, 0.05
+    history = simulate_cohort(therapy=Therapies.WITH, pop_size=500, engine=engine,
+                              if_event_history=True).cohortOutcomes.eventHistory
+    patient_outcomes = history.get_patient_outcomes(horizon=horizon, discount_rate=discount_rate)
+
+    params = Parameters(therapy=Therapies.WITH)
+    params.discountRate = discount_rate
+    outcomes = simulate_cohort(therapy=Therapies.WITH, pop_size=500, engine=engine, sim_length=horizon,
+                               parameters=params).cohortOutcomes
+
+    np.testing.assert_array_equal(~np.isnan(patient_outcomes['survival times']), outcomes.ifDied)
+    np.testing.assert_allclose(patient_outcomes['survival times'][outcomes.ifDied], outcomes.survivalTimes,
+                               rtol=1e-12)
+    np.testing.assert_array_equal(patient_outcomes['number of COVID'], outcomes.nTotalCOVID)
+    np.testing.assert_allclose(patient_outcomes['costs'], outcomes.costs, rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(patient_outcomes['utilities'], outcomes.utilities, rtol=1e-12, atol=1e-9)